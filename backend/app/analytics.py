@@ -0,0 +1,272 @@
+"""
+Statistiques des notes: distributions par devoir, par enseignant et bilans par étudiant
+
+Les notes minées sont rangées en colonnes (array.array: note, devoir,
+enseignant, étudiant), alimentées bloc par bloc. Les agrégats sont calculés
+d'un seul tenant sur ces colonnes avec NumPy (regroupement par tri, bincount)
+lorsqu'il est installé, sinon en Python pur avec les mêmes résultats. L'ordre
+trié des notes est conservé d'un bloc à l'autre: les nouvelles notes y sont
+fusionnées au lieu de tout retrier.
+"""
+import bisect
+import math
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Dépendance facultative: repli en Python pur
+    np = None
+
+from app.blockchain import Block, Blockchain
+
+GRADE_SCALE = 20.0
+HISTOGRAM_BINS = 10  # Intervalles de 2 points sur 20
+HISTOGRAM_EDGES = [GRADE_SCALE * i / HISTOGRAM_BINS for i in range(HISTOGRAM_BINS + 1)]
+PERCENTILES = (10, 25, 50, 75, 90)
+PERCENTILE_LABELS = tuple(f"p{q}" for q in PERCENTILES)
+DIMENSIONS = ("assignment", "teacher", "student")
+
+
+class GradeAnalytics:
+    """Colonnes des notes et agrégats mis en cache jusqu'au prochain bloc"""
+
+    def __init__(self):
+        self.grades = array("d")
+        self.codes = {dimension: array("l") for dimension in DIMENSIONS}
+        self.keys: Dict[str, List[str]] = {dimension: [] for dimension in DIMENSIONS}
+        self._key_codes: Dict[str, Dict[str, int]] = {dimension: {} for dimension in DIMENSIONS}
+        self._cache: Dict[str, Dict] = {}
+        self._sorted = None  # (notes, permutation qui les trie, notes triées), partagé par toutes les dimensions
+        self._lock = threading.Lock()
+
+    # --- Alimentation ---
+
+    def load(self, blockchain: Blockchain):
+        """Charge les notes existantes (état élagué puis blocs complets)"""
+        with self._lock:
+            for grade in blockchain.pruned_state["grades"]:
+                self._add(grade, blockchain)
+            for block in blockchain.chain[blockchain.first_unpruned_index():]:
+                for tx in block.transactions:
+                    if tx["type"] == "GRADE":
+                        self._add(tx, blockchain)
+            self._cache.clear()
+            self._sorted = None
+
+    def apply_block(self, block: Block, blockchain: Blockchain):
+        """Ajoute les notes d'un bloc"""
+        grades = [tx for tx in block.transactions if tx["type"] == "GRADE"]
+        if not grades:
+            return
+        with self._lock:
+            for tx in grades:
+                self._add(tx, blockchain)
+            self._cache.clear()  # L'ordre trié est complété à la prochaine requête
+
+    def listener(self, blockchain: Blockchain):
+        """Écouteur à brancher sur Blockchain.add_listener"""
+        def on_event(event_type: str, payload):
+            if event_type == "block":
+                self.apply_block(payload, blockchain)
+        return on_event
+
+    def _add(self, tx: Dict, blockchain: Blockchain):
+        try:
+            grade = float(tx["data"].get("grade"))
+        except (TypeError, ValueError):
+            return
+        self.grades.append(grade)
+        self.codes["assignment"].append(self._code("assignment", blockchain.get_grade_assignment_id(tx)))
+        self.codes["teacher"].append(self._code("teacher", tx["sender"]))
+        self.codes["student"].append(self._code("student", tx["receiver"]))
+
+    def _code(self, dimension: str, key: Optional[str]) -> int:
+        codes = self._key_codes[dimension]
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(self.keys[dimension])
+            self.keys[dimension].append(key)
+        return code
+
+    # --- Requêtes ---
+
+    def distributions(self, dimension: str) -> Dict[str, Dict]:
+        """Distribution des notes (effectif, moyenne, écart-type, extrêmes, centiles, histogramme) par clé"""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        with self._lock:
+            result = self._cache.get(dimension)
+            if result is None:
+                groups = len(self.keys[dimension])
+                if np is None:
+                    rows = _describe_python(self.grades, self.codes[dimension], groups)
+                elif not len(self.grades):
+                    rows = [_empty_row() for _ in range(groups)]
+                else:
+                    values, value_order, _ = self._sorted_grades()
+                    rows = _describe_numpy(values, value_order, self.codes[dimension], groups)
+                result = self._cache[dimension] = {
+                    key: row for key, row in zip(self.keys[dimension], rows) if row["count"]
+                }
+            return result
+
+    def _sorted_grades(self):
+        """Notes, permutation qui les trie et notes triées, complétées des notes ajoutées depuis"""
+        known = 0 if self._sorted is None else len(self._sorted[0])
+        if known == len(self.grades):
+            return self._sorted
+        # Copie (memcpy) pour ne pas bloquer l'agrandissement de la colonne
+        added = np.frombuffer(self.grades, dtype=np.float64)[known:].copy()
+        added_order = np.argsort(added, kind="stable")
+        if self._sorted is None:
+            self._sorted = (added, added_order, added[added_order])
+        else:
+            # Fusion: chaque nouvelle note se place après les notes égales déjà triées (tri stable)
+            values, value_order, ordered = self._sorted
+            positions = np.searchsorted(ordered, added[added_order], side="right")
+            self._sorted = (
+                np.concatenate((values, added)),
+                np.insert(value_order, positions, added_order + known),
+                np.insert(ordered, positions, added[added_order])
+            )
+        return self._sorted
+
+    def distribution(self, dimension: str, key: str) -> Optional[Dict]:
+        """Distribution des notes d'un devoir, d'un enseignant ou d'un étudiant"""
+        return self.distributions(dimension).get(key)
+
+    def student_summary(self, student_address: str) -> Optional[Dict]:
+        """Bilan d'un étudiant: distribution de ses notes, moyenne générale et rang"""
+        students = self.distributions("student")
+        summary = students.get(student_address)
+        if summary is None:
+            return None
+
+        averages = sorted(row["mean"] for row in students.values())
+        below = bisect.bisect_left(averages, summary["mean"])
+        return {
+            **summary,
+            "average": summary["mean"],
+            "average_scale": GRADE_SCALE,
+            "rank": len(averages) - bisect.bisect_right(averages, summary["mean"]) + 1,
+            "students": len(averages),
+            "percentile": round(100.0 * below / len(averages), 1)
+        }
+
+    def get_stats(self) -> Dict:
+        """Taille des colonnes"""
+        return {
+            "grades": len(self.grades),
+            "assignments": len(self.keys["assignment"]),
+            "teachers": len(self.keys["teacher"]),
+            "students": len(self.keys["student"]),
+            "engine": "numpy" if np is not None else "python"
+        }
+
+
+def _bin_index(grade: float) -> int:
+    return min(HISTOGRAM_BINS - 1, max(0, int(grade * HISTOGRAM_BINS // GRADE_SCALE)))
+
+
+def _describe_numpy(values, value_order, codes: array, groups: int) -> List[Dict]:
+    """Agrégats de tous les groupes en un passage: tri par (groupe, note) puis calculs vectoriels
+
+    value_order trie les notes; un tri stable par groupe (tri par base sur
+    16 bits lorsque c'est possible) donne l'ordre (groupe, note).
+    """
+    keys = np.frombuffer(codes, dtype=f"i{codes.itemsize}").astype(np.int64)
+
+    counts = np.bincount(keys, minlength=groups)
+    sums = np.bincount(keys, weights=values, minlength=groups)
+    squares = np.bincount(keys, weights=values * values, minlength=groups)
+    safe = np.maximum(counts, 1)
+    means = sums / safe
+    stds = np.sqrt(np.maximum(squares / safe - means * means, 0.0))
+
+    # Centiles: une fois trié par (groupe, note), chaque groupe occupe une tranche contiguë
+    group_keys = keys[value_order]
+    if groups <= 1 << 16:
+        group_keys = group_keys.astype(np.uint16)
+    ordered = values[value_order[np.argsort(group_keys, kind="stable")]]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    last = np.maximum(counts - 1, 0)
+    minimums = ordered[np.minimum(starts, len(ordered) - 1)]
+    maximums = ordered[np.minimum(starts + last, len(ordered) - 1)]
+    percentiles = {}
+    for q in PERCENTILES:
+        position = last * (q / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        low_values = ordered[np.minimum(starts + lower, len(ordered) - 1)]
+        high_values = ordered[np.minimum(starts + upper, len(ordered) - 1)]
+        percentiles[q] = low_values + (high_values - low_values) * (position - lower)
+
+    bins = np.clip((values * HISTOGRAM_BINS // GRADE_SCALE).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+    histograms = np.bincount(keys * HISTOGRAM_BINS + bins, minlength=groups * HISTOGRAM_BINS)
+    histograms = histograms.reshape(groups, HISTOGRAM_BINS)
+
+    # Conversion en listes Python d'un seul tenant, puis une ligne par groupe
+    columns = zip(
+        counts.tolist(), np.round(means, 3).tolist(), np.round(stds, 3).tolist(),
+        minimums.tolist(), maximums.tolist(),
+        zip(*(np.round(percentiles[q], 3).tolist() for q in PERCENTILES)), histograms.tolist()
+    )
+    return [
+        _row(count, mean, std, minimum, maximum, dict(zip(PERCENTILE_LABELS, quantiles)), histogram)
+        if count else _empty_row()
+        for count, mean, std, minimum, maximum, quantiles, histogram in columns
+    ]
+
+
+def _describe_python(grades: array, codes: array, groups: int) -> List[Dict]:
+    """Même calcul que _describe_numpy, groupe par groupe"""
+    values_by_group: List[List[float]] = [[] for _ in range(groups)]
+    for grade, code in zip(grades, codes):
+        values_by_group[code].append(grade)
+
+    rows = []
+    for values in values_by_group:
+        if not values:
+            rows.append(_empty_row())
+            continue
+        values.sort()
+        count = len(values)
+        mean = math.fsum(values) / count
+        variance = max(math.fsum(v * v for v in values) / count - mean * mean, 0.0)
+        histogram = [0] * HISTOGRAM_BINS
+        for value in values:
+            histogram[_bin_index(value)] += 1
+        rows.append(_row(
+            count, round(mean, 3), round(math.sqrt(variance), 3), values[0], values[-1],
+            {label: round(_percentile(values, q), 3) for label, q in zip(PERCENTILE_LABELS, PERCENTILES)},
+            histogram
+        ))
+    return rows
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Centile par interpolation linéaire (méthode par défaut de NumPy)"""
+    position = (len(ordered) - 1) * q / 100.0
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _row(count: int, mean: float, std: float, minimum: float, maximum: float,
+         percentiles: Dict[str, float], histogram: List[int]) -> Dict:
+    return {
+        "count": count,
+        "mean": mean,
+        "std": std,
+        "min": minimum,
+        "max": maximum,
+        "percentiles": percentiles,
+        "histogram": histogram  # Effectifs par intervalle de HISTOGRAM_EDGES
+    }
+
+
+def _empty_row() -> Dict:
+    return {"count": 0}
+
@@ -0,0 +1,384 @@
+"""
+Audit d'intégrité de la chaîne: revérification complète et rapport détaillé
+
+Contrairement à is_chain_valid (un booléen), l'audit dit où et quoi: pour
+chaque bloc, hash de l'en-tête, liaison au bloc précédent, preuve de travail
+et racine de Merkle; pour chaque transaction, identifiant (empreinte de son
+contenu) et signature, vérifiée avec la clé et le type de clé enregistrés du
+participant. Sur une chaîne en service, les index dérivés (hauteurs des blocs,
+emplacements des transactions, participants, devoirs, soumissions) sont
+ensuite confrontés à la chaîne.
+
+La chaîne est découpée en tranches de blocs vérifiées en parallèle dans le
+pool de processus: chaque tranche reçoit le hash du bloc qui la précède, la
+liaison est donc vérifiée d'une tranche à l'autre. Dans l'API, les tranches
+passent par la voie "audit" (concurrence bornée): un audit ne prive pas les
+requêtes des processus de calcul.
+
+Usage (depuis backend/), sur une chaîne exportée (synthetic, tenant, /chain):
+    python -m app.audit chain.json.gz --workers 4 --output report.json
+"""
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.blockchain import Block, Blockchain, Transaction, compute_merkle_root, hash_transaction
+from app.crypto import DEFAULT_KEY_TYPE, verify_transaction_id
+
+DEFAULT_CHUNK_SIZE = 200  # Blocs par tranche
+MAX_CHUNK_ERRORS = 100  # Erreurs détaillées renvoyées par tranche
+MAX_REPORTED_ERRORS = 500
+MAX_REPORTS = 20  # Rapports conservés en mémoire par l'API
+COUNTERS = ("blocks", "transactions", "signatures", "unsigned", "pruned_blocks", "header_only_blocks")
+
+Chunk = Tuple[List[Dict], str, Dict[str, Tuple[str, str]]]  # (blocs, hash précédent, clés des émetteurs)
+
+
+class AuditAlreadyRunning(Exception):
+    """Un audit de ce tenant est déjà en cours (converti en 409)"""
+
+
+def _error(height: int, check: str, detail: str, transaction_id: Optional[str] = None) -> Dict:
+    return {"height": height, "check": check, "transaction_id": transaction_id, "detail": detail}
+
+
+# --- Vérification d'une tranche (pool de processus) ---
+
+def verify_chunk(blocks: List[Dict], previous_hash: str, difficulty: int,
+                 keys: Dict[str, Tuple[str, str]]) -> Dict:
+    """Revérifie une suite de blocs exportés (to_dict) à partir des données enregistrées
+
+    previous_hash est le hash enregistré du bloc qui précède la tranche, keys
+    associe chaque émetteur à (clé publique, type de clé). Fonction de module
+    pour pouvoir être exécutée dans un pool de processus.
+    """
+    started = time.perf_counter()
+    target = "0" * difficulty
+    counts = dict.fromkeys(COUNTERS, 0)
+    errors = []
+
+    for block in blocks:
+        height = block["index"]
+        counts["blocks"] += 1
+
+        if Block.from_header(block).hash != block["hash"]:
+            errors.append(_error(height, "hash", "Recorded hash does not match the block header"))
+        if block["previous_hash"] != previous_hash:
+            errors.append(_error(height, "link", "previous_hash does not match the preceding block"))
+        if height > 0 and not block["hash"].startswith(target):
+            errors.append(_error(height, "proof_of_work", f"Hash does not start with {difficulty} zeros"))
+        previous_hash = block["hash"]
+
+        if block.get("pruned"):
+            # Bloc élagué: seuls les hash des transactions restent (rien du tout après un amorçage)
+            if block.get("tx_hashes") is None:
+                counts["header_only_blocks"] += 1
+                continue
+            counts["pruned_blocks"] += 1
+            if compute_merkle_root(block["tx_hashes"]) != block["merkle_root"]:
+                errors.append(_error(height, "merkle_root", "Transaction hashes do not match the Merkle root"))
+            continue
+
+        transactions = block["transactions"]
+        if compute_merkle_root([hash_transaction(tx) for tx in transactions]) != block["merkle_root"]:
+            errors.append(_error(height, "merkle_root", "Transactions do not match the Merkle root"))
+
+        for tx in transactions:
+            counts["transactions"] += 1
+            transaction_id = tx.get("transaction_id")
+            if Transaction.from_dict(tx).generate_id() != transaction_id:
+                errors.append(_error(height, "transaction_id", "Transaction id does not match its content",
+                                     transaction_id))
+            if not tx.get("signature"):
+                if tx["sender"] != "SYSTEM":
+                    counts["unsigned"] += 1
+                continue
+            key = keys.get(tx["sender"])
+            if key is None:
+                errors.append(_error(height, "signature", "Signed by an unknown participant", transaction_id))
+                continue
+            counts["signatures"] += 1
+            if not verify_transaction_id(transaction_id, tx["signature"], *key):
+                errors.append(_error(height, "signature", "Invalid signature", transaction_id))
+
+    return {
+        "counts": counts,
+        "errors": errors[:MAX_CHUNK_ERRORS],
+        "error_count": len(errors),
+        "elapsed": time.perf_counter() - started
+    }
+
+
+def participant_keys(participants: Dict[str, Dict], blocks: Iterable[Dict] = ()) -> Dict[str, Tuple[str, str]]:
+    """Clé publique et type de clé de chaque participant
+
+    Les transactions REGISTRATION des blocs complètent les participants connus
+    (chaîne exportée sans table des participants).
+    """
+    keys = {}
+    for block in blocks:
+        for tx in block.get("transactions") or []:
+            if tx["type"] == "REGISTRATION" and tx["data"].get("public_key"):
+                keys[tx["receiver"]] = (tx["data"]["public_key"], tx["data"].get("key_type", DEFAULT_KEY_TYPE))
+    for address, participant in participants.items():
+        if participant.get("public_key"):
+            keys[address] = (participant["public_key"], participant.get("key_type", DEFAULT_KEY_TYPE))
+    return keys
+
+
+def make_chunks(blocks: List[Dict], keys: Dict[str, Tuple[str, str]],
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Chunk]:
+    """Découpe la chaîne en tranches, chacune avec le hash qui la précède et les clés de ses émetteurs"""
+    chunks = []
+    for start in range(0, len(blocks), chunk_size):
+        part = blocks[start:start + chunk_size]
+        senders = {tx["sender"] for block in part for tx in block.get("transactions") or []}
+        chunk_keys = {address: keys[address] for address in senders if address in keys}
+        chunks.append((part, blocks[start - 1]["hash"] if start else "0", chunk_keys))
+    return chunks
+
+
+# --- Index dérivés (chaîne en service) ---
+
+def check_indexes(blockchain: Blockchain, height: int) -> List[Dict]:
+    """Confronte les index dérivés aux blocs [0, height) de la chaîne"""
+    errors = []
+    for block in blockchain.chain[:height]:
+        if blockchain.block_heights.get(block.hash) != block.index:
+            errors.append(_error(block.index, "index", "Block missing from block_heights"))
+        for position, tx in enumerate(block.transactions):
+            transaction_id = tx["transaction_id"]
+            location = blockchain.transaction_locations.get(transaction_id)
+            if location is None or location[0] != block.index or location[1] not in (position, None):
+                errors.append(_error(block.index, "index", "Wrong or missing transaction location", transaction_id))
+            if transaction_id in blockchain.pending_ids:
+                errors.append(_error(block.index, "index", "Mined transaction still pending", transaction_id))
+            if tx["type"] == "REGISTRATION" and tx["receiver"] not in blockchain.participants:
+                errors.append(_error(block.index, "index", "Registered participant missing", transaction_id))
+            elif tx["type"] == "ASSIGNMENT" and transaction_id not in blockchain.assignments_by_id:
+                errors.append(_error(block.index, "index", "Assignment missing from the deadline index",
+                                     transaction_id))
+            elif tx["type"] == "SUBMISSION" and transaction_id not in blockchain.submissions_by_id:
+                errors.append(_error(block.index, "index", "Submission missing from the index", transaction_id))
+    return errors
+
+
+# --- Rapport ---
+
+def build_report(results: List[Dict], difficulty: int, height: int, chunk_size: int, workers: int,
+                 started_at: float, verification_seconds: float,
+                 index_errors: Optional[List[Dict]] = None, index_seconds: float = 0.0) -> Dict:
+    """Assemble les résultats des tranches (et des index) en un rapport"""
+    counts = dict.fromkeys(COUNTERS, 0)
+    errors = []
+    error_count = 0
+    for result in results:
+        for name, value in result["counts"].items():
+            counts[name] += value
+        errors.extend(result["errors"])
+        error_count += result["error_count"]
+    if index_errors is not None:
+        errors.extend(index_errors)
+        error_count += len(index_errors)
+    errors.sort(key=lambda error: error["height"])
+
+    failing = list(dict.fromkeys(error["transaction_id"] for error in errors if error["transaction_id"]))
+    by_check: Dict[str, int] = {}
+    for error in errors:
+        by_check[error["check"]] = by_check.get(error["check"], 0) + 1
+    return {
+        "valid": error_count == 0,
+        "height": height,
+        "difficulty": difficulty,
+        "first_bad_height": errors[0]["height"] if errors else None,
+        "error_count": error_count,
+        "errors_by_check": by_check,
+        "errors": errors[:MAX_REPORTED_ERRORS],
+        "failing_transactions": failing[:MAX_REPORTED_ERRORS],
+        "checked": counts,
+        "indexes_checked": index_errors is not None,
+        "timings": {
+            "total_seconds": round(time.time() - started_at, 3),
+            "verification_seconds": round(verification_seconds, 3),
+            "worker_seconds": round(sum(result["elapsed"] for result in results), 3),
+            "index_seconds": round(index_seconds, 3),
+            "chunks": len(results),
+            "chunk_size": chunk_size,
+            "workers": workers
+        },
+        "started_at": started_at,
+        "finished_at": time.time()
+    }
+
+
+# --- Audit d'une chaîne en service (API) ---
+
+async def audit_blockchain(blockchain: Blockchain,
+                           run_chunk: Callable[..., Awaitable[Dict]],
+                           run_scan: Callable[..., Awaitable],
+                           concurrency: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """Audite les blocs présents au lancement, au plus concurrency tranches à la fois
+
+    run_chunk(verify_chunk, *args) exécute une tranche (pool de processus),
+    run_scan(func, *args) un parcours de la chaîne (pool de threads).
+    """
+    started_at = time.time()
+    height = len(blockchain.chain)
+
+    def prepare():
+        blocks = [block.to_dict() for block in blockchain.chain[:height]]
+        return make_chunks(blocks, participant_keys(blockchain.participants, blocks), chunk_size)
+
+    chunks = await run_scan(prepare)
+    started = time.perf_counter()
+    results: List[Optional[Dict]] = [None] * len(chunks)
+    remaining = iter(enumerate(chunks))
+
+    async def worker():
+        for position, (blocks, previous_hash, keys) in remaining:
+            results[position] = await run_chunk(verify_chunk, blocks, previous_hash, blockchain.difficulty, keys)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(chunks))))))
+    verification_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index_errors = await run_scan(check_indexes, blockchain, height)
+    return build_report(results, blockchain.difficulty, height, chunk_size, concurrency, started_at,
+                        verification_seconds, index_errors, time.perf_counter() - started)
+
+
+class AuditJobs:
+    """Audits lancés par l'API: exécution en tâche de fond et derniers rapports"""
+
+    def __init__(self, max_reports: int = MAX_REPORTS):
+        self.max_reports = max_reports
+        self.jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._running: Dict[str, str] = {}  # tenant_id -> audit_id en cours
+        self._tasks = set()
+        self._lock = threading.Lock()
+
+    def start(self, tenant_id: str, run: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Lance run() en tâche de fond; AuditAlreadyRunning si ce tenant est déjà audité"""
+        with self._lock:
+            if tenant_id in self._running:
+                raise AuditAlreadyRunning(f"An audit of {tenant_id} is already running "
+                                          f"({self._running[tenant_id]})")
+            audit_id = uuid.uuid4().hex[:12]
+            job = {"audit_id": audit_id, "tenant_id": tenant_id, "status": "running",
+                   "started_at": time.time(), "report": None, "error": None}
+            self.jobs[audit_id] = job
+            self._running[tenant_id] = audit_id
+            while len(self.jobs) > self.max_reports:
+                oldest = next(iter(self.jobs))
+                if self.jobs[oldest]["status"] == "running":
+                    break
+                del self.jobs[oldest]
+
+        task = asyncio.ensure_future(self._run(job, run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: Dict, run: Callable[[], Awaitable[Dict]]):
+        try:
+            job["report"] = await run()
+            job["status"] = "completed"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            with self._lock:
+                self._running.pop(job["tenant_id"], None)
+
+    def get(self, audit_id: str) -> Optional[Dict]:
+        return self.jobs.get(audit_id)
+
+    def list(self) -> List[Dict]:
+        """Audits du plus récent au plus ancien, sans le détail des rapports"""
+        return [
+            {key: value for key, value in job.items() if key != "report"}
+            | {"valid": job["report"]["valid"] if job["report"] else None}
+            for job in reversed(self.jobs.values())
+        ]
+
+    def cancel(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+
+# --- Ligne de commande ---
+
+def load_chain_file(path: str) -> Dict:
+    """Chaîne exportée: {"chain": [...], "difficulty"?, "participants"?} (gzip si .gz)"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        payload = json.load(f)
+    if isinstance(payload, list):
+        payload = {"chain": payload}
+    if not isinstance(payload.get("chain"), list):
+        raise ValueError("Expected an exported chain ({\"chain\": [...]})")
+    return payload
+
+
+def audit_blocks(blocks: List[Dict], difficulty: int, participants: Optional[Dict] = None,
+                 workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """Audite une chaîne exportée, en parallèle sur workers processus (sans les index dérivés)"""
+    started_at = time.time()
+    chunks = make_chunks(blocks, participant_keys(participants or {}, blocks), chunk_size)
+    started = time.perf_counter()
+    if workers <= 1:
+        results = [verify_chunk(part, previous_hash, difficulty, keys) for part, previous_hash, keys in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                verify_chunk,
+                *zip(*((part, previous_hash, difficulty, keys) for part, previous_hash, keys in chunks))
+            )) if chunks else []
+    return build_report(results, difficulty, len(blocks), chunk_size, workers, started_at,
+                        time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit d'intégrité d'une chaîne exportée")
+    parser.add_argument("path", help="Chaîne exportée (.json ou .json.gz): synthetic, tenant ou /chain")
+    parser.add_argument("--difficulty", type=int, default=None,
+                        help="Difficulté de la preuve de travail (par défaut celle du fichier, sinon 4)")
+    parser.add_argument("--workers", type=int, default=None, help="Processus de vérification (défaut: nombre de CPU)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--output", help="Écrire le rapport JSON complet dans ce fichier")
+    args = parser.parse_args(argv)
+
+    payload = load_chain_file(args.path)
+    difficulty = args.difficulty if args.difficulty is not None else payload.get("difficulty", 4)
+    workers = args.workers or os.cpu_count() or 1
+    report = audit_blocks(payload["chain"], difficulty, payload.get("participants"), workers, args.chunk_size)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    timings = report["timings"]
+    print(f"{report['height']} blocks, {report['checked']['transactions']} transactions, "
+          f"{report['checked']['signatures']} signatures checked in {timings['total_seconds']}s "
+          f"({timings['chunks']} chunks, {workers} workers)")
+    if report["valid"]:
+        print("Chain is valid")
+        return 0
+    print(f"Chain is corrupted: {report['error_count']} errors, first bad height {report['first_bad_height']}")
+    for error in itertools.islice(report["errors"], 20):
+        suffix = f" [{error['transaction_id']}]" if error["transaction_id"] else ""
+        print(f"  block {error['height']}: {error['check']}: {error['detail']}{suffix}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,225 @@
 """
 Blockchain Core Module - Système de Gestion des Contrôles Éducatifs
 """
+import gzip
 import hashlib
 import json
+import os
 import time
-from typing import List, Dict, Optional
-from datetime import datetime
+import heapq
+import bisect
+import threading
+from typing import List, Dict, Optional, Callable, Tuple
+from datetime import date, datetime, timedelta, timezone
+
+from app.compression import check_codec, dumps_block, loads_block
+from app.metrics import (
+    timed, QUERY_LATENCY, MINING_DURATION, MINING_HASHES, BLOCK_TRANSACTIONS,
+    BLOCKS_MINED
+)
+
+
+def get_recipients(tx: Dict) -> Optional[List[str]]:
+    """Retourne la liste des destinataires d'une transaction, ou None si elle vise "ALL"
+
+    Les annonces ciblées stockent leurs destinataires dans data["recipients"];
+    les anciennes transactions encodaient la liste dans receiver, séparée par des virgules.
+    """
+    recipients = tx["data"].get("recipients")
+    if recipients is not None:
+        return recipients
+    if tx["receiver"] == "ALL":
+        return None
+    return tx["receiver"].split(",")
+
+
+def is_announcement_recipient(tx: Dict, address: str) -> bool:
+    """Vérifie si une annonce ciblée (et non diffusée à "ALL") vise une adresse"""
+    if tx["type"] != "ANNOUNCEMENT":
+        return False
+    recipients = get_recipients(tx)
+    return recipients is not None and address in recipients
+
+
+def hash_transaction(tx: Dict) -> str:
+    """Hash SHA-256 canonique d'une transaction (feuille de l'arbre de Merkle)"""
+    return hashlib.sha256(json.dumps(tx, sort_keys=True).encode()).hexdigest()
+
+
+def compute_merkle_root(tx_hashes: List[str]) -> str:
+    """Calcule la racine de Merkle d'une liste de hash de transactions"""
+    if not tx_hashes:
+        return "0" * 64
+    
+    level = tx_hashes
+    while len(level) > 1:
+        if len(level) % 2:
+            level = level + [level[-1]]
+        level = [
+            hashlib.sha256((level[i] + level[i + 1]).encode()).hexdigest()
+            for i in range(0, len(level), 2)
+        ]
+    return level[0]
+
+
+def submission_metadata(tx: Dict, block_index: int) -> Dict:
+    """Soumission sans son contenu chiffré (conservée après élagage)"""
+    metadata = tx.copy()
+    metadata["data"] = {k: v for k, v in tx["data"].items() if k != "encrypted_content"}
+    metadata["block_index"] = block_index
+    metadata["pruned"] = True
+    return metadata
+
+
+def empty_state() -> Dict:
+    """État dérivé vide (devoirs, métadonnées des soumissions, notes)"""
+    return {
+        "assignments": [],
+        "submissions": [],
+        "grades": [],
+        "submitted": set(),  # (étudiant, assignment_id)
+        "transaction_counts": {}
+    }
+
+
+def apply_transactions_to_state(state: Dict, transactions: List[Dict], block_index: int):
+    """Ajoute les transactions d'un bloc à un état dérivé"""
+    counts = state["transaction_counts"]
+    for tx in transactions:
+        counts[tx["type"]] = counts.get(tx["type"], 0) + 1
+        
+        if tx["type"] == "ASSIGNMENT":
+            assignment = tx.copy()
+            assignment["block_index"] = block_index
+            state["assignments"].append(assignment)
+        elif tx["type"] == "SUBMISSION":
+            state["submissions"].append(submission_metadata(tx, block_index))
+            state["submitted"].add((tx["sender"], tx["data"].get("assignment_id")))
+        elif tx["type"] == "GRADE":
+            grade = tx.copy()
+            grade["block_index"] = block_index
+            state["grades"].append(grade)
+
+
+def parse_due_date(value) -> Optional[float]:
+    """Convertit une date limite en timestamp; None si elle est illisible
+    
+    Formats ISO 8601 ("2026-06-30", "2026-06-30T18:00", avec ou sans fuseau) ou
+    timestamp numérique. Sans fuseau, la date est en UTC; une date seule désigne
+    la fin de la journée.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    
+    text = value.strip()
+    try:
+        day = date.fromisoformat(text)
+    except ValueError:
+        pass
+    else:  # Date seule: fin de la journée (minuit suivant, UTC)
+        return (datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(days=1)).timestamp()
+    try:
+        moment = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def proof_of_work(header: Dict, difficulty: int) -> int:
+    """Cherche, à partir du nonce de l'en-tête, le premier nonce dont le hash a la difficulté voulue
+    
+    Fonction de module pour pouvoir être exécutée dans un pool de processus.
+    """
+    target = "0" * difficulty
+    fields = {key: header[key] for key in ("index", "timestamp", "merkle_root", "previous_hash")}
+    nonce = header["nonce"]
+    while True:
+        fields["nonce"] = nonce
+        block_hash = hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+        if block_hash[:difficulty] == target:
+            return nonce
+        nonce += 1
 
 
 class Block:
-    """Classe représentant un bloc dans la blockchain"""
+    """Classe représentant un bloc dans la blockchain
+    
+    Le hash du bloc couvre l'en-tête, dont la racine de Merkle des transactions:
+    un bloc élagué (pruned) ne garde que les hash de ses transactions et reste vérifiable.
+    """
     
     def __init__(self, index: int, timestamp: float, transactions: List[Dict], 
-                 previous_hash: str, nonce: int = 0):
+                 previous_hash: str, nonce: int = 0, tx_hashes: Optional[List[str]] = None):
         self.index = index
         self.timestamp = timestamp
         self.transactions = transactions
         self.previous_hash = previous_hash
         self.nonce = nonce
+        self.tx_hashes = tx_hashes  # Conservés uniquement lorsque le bloc est élagué
+        self.pruned = tx_hashes is not None
+        self.merkle_root = compute_merkle_root(self.get_transaction_hashes())
         self.hash = self.calculate_hash()
     
+    @classmethod
+    def from_header(cls, header: Dict) -> "Block":
+        """Reconstruit un bloc à partir de son seul en-tête (corps et hash de transactions absents)"""
+        block = cls.__new__(cls)
+        block.index = header["index"]
+        block.timestamp = header["timestamp"]
+        block.transactions = []
+        block.previous_hash = header["previous_hash"]
+        block.nonce = header["nonce"]
+        block.tx_hashes = None
+        block.pruned = True
+        block.merkle_root = header["merkle_root"]
+        block.hash = block.calculate_hash()
+        return block
+    
+    def to_header(self) -> Dict:
+        """Retourne l'en-tête du bloc (sans transactions)"""
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "merkle_root": self.merkle_root,
+            "previous_hash": self.previous_hash,
+            "nonce": self.nonce,
+            "hash": self.hash
+        }
+    
+    def attach_transaction_hashes(self, tx_hashes: List[str]) -> bool:
+        """Complète un en-tête avec les hash de ses transactions s'ils correspondent à la racine"""
+        if compute_merkle_root(tx_hashes) != self.merkle_root:
+            return False
+        self.tx_hashes = tx_hashes
+        return True
+    
+    def get_transaction_hashes(self) -> List[str]:
+        """Retourne les hash des transactions du bloc"""
+        if self.pruned:
+            return self.tx_hashes
+        return [hash_transaction(tx) for tx in self.transactions]
+    
+    def verify_merkle_root(self) -> bool:
+        """Vérifie que les transactions (ou leurs hash) correspondent à la racine de Merkle
+        
+        Un bloc réduit à son en-tête (amorçage depuis un snapshot) n'a rien à vérifier.
+        """
+        if self.pruned and self.tx_hashes is None:
+            return True
+        return compute_merkle_root(self.get_transaction_hashes()) == self.merkle_root
+    
     def calculate_hash(self) -> str:
         """Calcule le hash SHA-256 du bloc"""
         block_string = json.dumps({
             "index": self.index,
             "timestamp": self.timestamp,
-            "transactions": self.transactions,
+            "merkle_root": self.merkle_root,
             "previous_hash": self.previous_hash,
             "nonce": self.nonce
         }, sort_keys=True)
@@ -33,45 +227,130 @@ class Block:
     
     def mine_block(self, difficulty: int):
         """Mine le bloc avec la difficulté spécifiée (Proof of Work)"""
-        target = "0" * difficulty
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
+        self.nonce = proof_of_work(self.to_header(), difficulty)
+        self.hash = self.calculate_hash()
+    
+    def prune(self) -> List[Dict]:
+        """Supprime le corps du bloc en conservant les hash; retourne les transactions retirées"""
+        if self.pruned:
+            return []
+        transactions = self.transactions
+        self.tx_hashes = self.get_transaction_hashes()
+        self.transactions = []
+        self.pruned = True
+        return transactions
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Block":
+        """Reconstruit un bloc exporté par to_dict (le hash est recalculé)"""
+        if data.get("pruned") and data.get("tx_hashes") is None:
+            return cls.from_header(data)
+        return cls(
+            data["index"],
+            data["timestamp"],
+            data["transactions"],
+            data["previous_hash"],
+            data["nonce"],
+            data.get("tx_hashes") if data.get("pruned") else None
+        )
     
     def to_dict(self) -> Dict:
         """Convertit le bloc en dictionnaire"""
-        return {
+        block = {
             "index": self.index,
             "timestamp": self.timestamp,
             "transactions": self.transactions,
+            "merkle_root": self.merkle_root,
             "previous_hash": self.previous_hash,
             "nonce": self.nonce,
             "hash": self.hash
         }
+        if self.pruned:
+            block["pruned"] = True
+            block["tx_hashes"] = self.tx_hashes
+        return block
+
+
+# Genesis déterministe: tous les nœuds partagent le même premier bloc
+GENESIS_TIMESTAMP = 1704067200.0  # 2024-01-01T00:00:00Z
+
+# Nonces précalculés pour GENESIS_TIMESTAMP (premier nonce valide par difficulté)
+GENESIS_NONCES = {1: 10, 2: 283, 3: 15592, 4: 161663, 5: 553415, 6: 1893734}
+
+_mined_genesis_nonces: Dict[Tuple[float, int], int] = {}
+
+
+def make_genesis_block(difficulty: int, timestamp: float = GENESIS_TIMESTAMP,
+                       nonce: Optional[int] = None) -> Block:
+    """Construit le bloc genesis sans preuve de travail lorsque le nonce est connu
+    
+    Le nonce fourni, précalculé ou déjà miné dans ce processus est vérifié;
+    à défaut, le bloc est miné une fois (résultat déterministe) puis mis en cache.
+    """
+    if nonce is None:
+        nonce = _mined_genesis_nonces.get((timestamp, difficulty))
+    if nonce is None and timestamp == GENESIS_TIMESTAMP:
+        nonce = GENESIS_NONCES.get(difficulty)
+    
+    genesis_block = Block(0, timestamp, [], "0", nonce or 0)
+    if not genesis_block.hash.startswith("0" * difficulty):
+        genesis_block = Block(0, timestamp, [], "0")
+        genesis_block.mine_block(difficulty)
+    
+    _mined_genesis_nonces[(timestamp, difficulty)] = genesis_block.nonce
+    return genesis_block
 
 
 class Transaction:
     """Classe représentant une transaction dans la blockchain"""
     
     def __init__(self, sender: str, receiver: str, transaction_type: str, 
-                 data: Dict, signature: Optional[str] = None):
+                 data: Dict, signature: Optional[str] = None, timestamp: Optional[float] = None):
         self.sender = sender
         self.receiver = receiver
         self.transaction_type = transaction_type  # ASSIGNMENT, SUBMISSION, GRADE, ANNOUNCEMENT
         self.data = data
-        self.timestamp = time.time()
+        self.timestamp = time.time() if timestamp is None else timestamp  # Imposé: horloge simulée
         self.signature = signature
         self.transaction_id = self.generate_id()
     
     def generate_id(self) -> str:
-        """Génère un ID unique pour la transaction"""
-        transaction_string = json.dumps({
+        """Génère l'ID de la transaction: SHA-256 de son contenu canonique (hors signature)
+        
+        Ce hash est aussi l'empreinte signée par le WalletManager (sign_transaction_id):
+        le contenu n'est haché qu'une fois, et deux transactions différentes créées
+        dans le même tic d'horloge n'ont pas le même ID.
+        """
+        return hashlib.sha256(self.canonical_content().encode()).hexdigest()
+    
+    def canonical_content(self) -> str:
+        """Sérialisation canonique du contenu couvert par l'ID"""
+        return json.dumps({
             "sender": self.sender,
             "receiver": self.receiver,
             "type": self.transaction_type,
+            "data": self.data,
             "timestamp": self.timestamp
         }, sort_keys=True)
-        return hashlib.sha256(transaction_string.encode()).hexdigest()
+    
+    @staticmethod
+    def compute_id(tx: Dict) -> str:
+        """Recalcule l'ID d'une transaction exportée par to_dict"""
+        return hashlib.sha256(json.dumps({
+            "sender": tx["sender"],
+            "receiver": tx["receiver"],
+            "type": tx["type"],
+            "data": tx["data"],
+            "timestamp": tx["timestamp"]
+        }, sort_keys=True).encode()).hexdigest()
+    
+    @classmethod
+    def from_dict(cls, tx: Dict) -> "Transaction":
+        """Reconstruit une transaction exportée par to_dict (horodatage et ID conservés)"""
+        transaction = cls(tx["sender"], tx["receiver"], tx["type"], tx["data"], tx.get("signature"))
+        transaction.timestamp = tx["timestamp"]
+        transaction.transaction_id = tx["transaction_id"]
+        return transaction
     
     def to_dict(self) -> Dict:
         """Convertit la transaction en dictionnaire"""
@@ -89,69 +368,472 @@ class Transaction:
 class Blockchain:
     """Classe principale de la blockchain"""
     
-    def __init__(self, difficulty: int = 4):
+    def __init__(self, difficulty: int = 4, retention_blocks: Optional[int] = None,
+                 archive_dir: Optional[str] = None, genesis_block: Optional[Block] = None,
+                 block_codec: Optional[str] = None):
         self.chain: List[Block] = []
         self.pending_transactions: List[Transaction] = []
         self.difficulty = difficulty
         self.mining_reward = 10
         self.participants: Dict[str, Dict] = {}  # Stocke les participants (étudiants et enseignants)
+        self.participants_version = 0  # Incrémenté à chaque enregistrement (invalidation des caches)
         
-        # Créer le bloc genesis
-        self.create_genesis_block()
+        # Écouteurs notifiés à l'ajout d'un bloc ou d'une transaction en attente
+        self.listeners: List[Callable[[str, object], None]] = []
+        
+        # Index des annonces, maintenus à l'ajout de chaque bloc
+        self.announcements: List[Dict] = []  # Annonces minées, dans l'ordre de la chaîne
+        self.broadcast_announcements: List[int] = []  # Positions des annonces destinées à "ALL"
+        self.announcement_index: Dict[str, List[int]] = {}  # Adresse étudiant -> positions des annonces ciblées
+        
+        # Identifiants connus (doublons refusés) et emplacements dans la chaîne
+        self.block_heights: Dict[str, int] = {}  # Hash de bloc -> hauteur
+        self.transaction_locations: Dict[str, Tuple[int, Optional[int]]] = {}  # ID miné -> (hauteur, position)
+        self.pending_ids: set = set()  # Transactions en attente
+        
+        # Index des soumissions et des notes
+        self.submissions_by_id: Dict[str, Dict] = {}  # transaction_id -> soumission (avec block_index)
+        self.graded: set = set()  # (enseignant, étudiant, assignment_id) déjà notés
+        
+        # Index des dates limites
+        self.deadlines: List[Tuple[float, str]] = []  # (échéance, assignment_id), trié par échéance
+        self.assignments_by_id: Dict[str, Dict] = {}  # assignment_id -> résumé du devoir
+        self.assignment_submitters: Dict[str, Dict[str, Dict]] = {}  # assignment_id -> étudiant -> soumission
+        self.late_submissions: Dict[str, List[Dict]] = {}  # assignment_id -> soumissions en retard
+        
+        # Élagage: les blocs [1, pruned_height) n'ont plus que leurs en-têtes et hash de transactions
+        self.retention_blocks = retention_blocks  # None = pas d'élagage automatique
+        self.archive_dir = archive_dir  # None = corps des blocs élagués supprimés
+        if block_codec is not None:
+            check_codec(block_codec)
+        self.block_codec = block_codec  # zlib/zstd avec dictionnaire partagé; None = un fichier gzip par bloc
+        self.pruned_height = 0
+        self.pruned_state = empty_state()  # État dérivé des blocs élagués
+        self.body_revision = 0  # Incrémenté quand des corps de blocs sont élagués ou rattachés (invalidation des caches)
+        self._prune_lock = threading.Lock()  # Élagage manuel (thread) et automatique (append_block)
+        
+        # Créer le bloc genesis (ou reprendre celui fourni, par exemple lors d'un amorçage)
+        if genesis_block is not None:
+            self.append_block(genesis_block)
+        else:
+            self.create_genesis_block()
     
     def create_genesis_block(self):
-        """Crée le premier bloc de la chaîne"""
-        genesis_block = Block(0, time.time(), [], "0")
-        genesis_block.mine_block(self.difficulty)
-        self.chain.append(genesis_block)
+        """Crée le premier bloc de la chaîne (déterministe, voir make_genesis_block)"""
+        self.append_block(make_genesis_block(self.difficulty))
+    
+    def append_block(self, block: Block):
+        """Ajoute un bloc à la chaîne et met à jour les index dérivés"""
+        self.chain.append(block)
+        self.index_block(block)
+        self.notify("block", block)
+        
+        # Élaguer par lots (un dixième de la fenêtre) pour amortir le coût
+        if self.retention_blocks is not None:
+            batch = max(1, self.retention_blocks // 10)
+            if len(self.chain) - max(self.pruned_height, 1) >= self.retention_blocks + batch:
+                self.prune(len(self.chain) - self.retention_blocks)
+    
+    def add_listener(self, listener: Callable[[str, object], None]):
+        """Abonne un écouteur aux événements de la chaîne ("block", "pending_transaction")"""
+        self.listeners.append(listener)
+    
+    def notify(self, event_type: str, payload):
+        """Notifie les écouteurs d'un événement"""
+        for listener in self.listeners:
+            listener(event_type, payload)
+    
+    def index_block(self, block: Block):
+        """Met à jour les index dérivés à partir des transactions d'un bloc"""
+        self.block_heights[block.hash] = block.index
+        for position, tx in enumerate(block.transactions):
+            self.transaction_locations[tx["transaction_id"]] = (block.index, position)
+            self.pending_ids.discard(tx["transaction_id"])
+            
+            if tx["type"] == "ANNOUNCEMENT":
+                self._index_announcement(tx, block.index)
+            elif tx["type"] == "ASSIGNMENT":
+                self._index_assignment(tx, block.index)
+            elif tx["type"] == "SUBMISSION":
+                submission = tx.copy()
+                submission["block_index"] = block.index
+                self.submissions_by_id[tx["transaction_id"]] = submission
+                self._index_submission(tx, block.index)
+            elif tx["type"] == "GRADE":
+                assignment_id = self.get_grade_assignment_id(tx)
+                if assignment_id is not None:
+                    self.graded.add((tx["sender"], tx["receiver"], assignment_id))
+    
+    def _index_announcement(self, tx: Dict, block_index: int):
+        """Indexe une annonce par destinataire"""
+        announcement = tx.copy()
+        announcement["block_index"] = block_index
+        position = len(self.announcements)
+        self.announcements.append(announcement)
+        
+        recipients = get_recipients(tx)
+        if recipients is None:
+            self.broadcast_announcements.append(position)
+            return
+        
+        for address in recipients:
+            self.announcement_index.setdefault(address, []).append(position)
+    
+    def _index_assignment(self, tx: Dict, block_index: int):
+        """Indexe un devoir par date limite"""
+        assignment_id = tx["transaction_id"]
+        due_timestamp = parse_due_date(tx["data"].get("due_date"))
+        self.assignments_by_id[assignment_id] = {
+            "assignment_id": assignment_id,
+            "title": tx["data"].get("title"),
+            "teacher_address": tx["sender"],
+            "receiver": tx["receiver"],
+            "due_date": tx["data"].get("due_date"),
+            "due_timestamp": due_timestamp,
+            "block_index": block_index
+        }
+        if due_timestamp is None:
+            return
+        bisect.insort(self.deadlines, (due_timestamp, assignment_id))
+        
+        # Soumissions indexées avant le devoir (devoir inconnu au moment de l'ajout)
+        for submission in self.assignment_submitters.get(assignment_id, {}).values():
+            self._check_late(assignment_id, submission, due_timestamp)
+    
+    def _index_submission(self, tx: Dict, block_index: int):
+        """Indexe une soumission par devoir et la compare à la date limite"""
+        assignment_id = tx["data"].get("assignment_id")
+        submission = {
+            "submission_id": tx["transaction_id"],
+            "student_address": tx["sender"],
+            "student_name": tx["data"].get("student_name"),
+            "submitted_at": tx["timestamp"],
+            "block_index": block_index
+        }
+        self.assignment_submitters.setdefault(assignment_id, {})[tx["sender"]] = submission
+        
+        assignment = self.assignments_by_id.get(assignment_id)
+        if assignment and assignment["due_timestamp"] is not None:
+            self._check_late(assignment_id, submission, assignment["due_timestamp"])
+    
+    def _check_late(self, assignment_id: str, submission: Dict, due_timestamp: float):
+        if submission["submitted_at"] > due_timestamp:
+            late = dict(submission, late_by=submission["submitted_at"] - due_timestamp)
+            self.late_submissions.setdefault(assignment_id, []).append(late)
+    
+    def _reset_deadline_index(self):
+        self.deadlines = []
+        self.assignments_by_id = {}
+        self.assignment_submitters = {}
+        self.late_submissions = {}
+    
+    
+    def first_unpruned_index(self) -> int:
+        """Index du premier bloc (hors genesis) dont le corps est conservé"""
+        return max(1, self.pruned_height)
+    
+    def create_snapshot(self, height: Optional[int] = None) -> Dict:
+        """Capture l'état dérivé (participants, devoirs, soumissions, notes) à une hauteur donnée"""
+        if height is None:
+            height = len(self.chain) - 1
+        if height < self.first_unpruned_index() - 1 or height >= len(self.chain):
+            raise ValueError(f"Snapshot height must be between {self.first_unpruned_index() - 1} "
+                             f"and {len(self.chain) - 1}")
+        
+        state = {
+            "assignments": list(self.pruned_state["assignments"]),
+            "submissions": list(self.pruned_state["submissions"]),
+            "grades": list(self.pruned_state["grades"]),
+            "submitted": set(self.pruned_state["submitted"]),
+            "transaction_counts": dict(self.pruned_state["transaction_counts"])
+        }
+        for block in self.chain[self.first_unpruned_index():height + 1]:
+            apply_transactions_to_state(state, block.transactions, block.index)
+        
+        return {
+            "height": height,
+            "block_hash": self.chain[height].hash,
+            "created_at": time.time(),
+            "participants": dict(self.participants),
+            "assignments": state["assignments"],
+            "submissions": state["submissions"],
+            "grades": state["grades"],
+            "announcements": [a for a in self.announcements if a["block_index"] <= height],
+            "transaction_counts": state["transaction_counts"]
+        }
+    
+    def restore_snapshot(self, snapshot: Dict):
+        """Remplace l'état dérivé par celui d'un snapshot pris à la hauteur du dernier bloc
+        
+        Les blocs jusqu'à cette hauteur sont considérés comme élagués: les requêtes
+        sont servies depuis l'état restauré, sans corps de blocs.
+        """
+        height = snapshot["height"]
+        if height != len(self.chain) - 1 or self.chain[height].hash != snapshot["block_hash"]:
+            raise ValueError("Snapshot does not match the chain tip")
+        
+        self.participants = dict(snapshot["participants"])
+        self.participants_version += 1
+        
+        self.pruned_state = {
+            "assignments": list(snapshot["assignments"]),
+            "submissions": list(snapshot["submissions"]),
+            "grades": list(snapshot["grades"]),
+            "submitted": {
+                (s["sender"], s["data"].get("assignment_id")) for s in snapshot["submissions"]
+            },
+            "transaction_counts": dict(snapshot["transaction_counts"])
+        }
+        self.pruned_height = height + 1
+        
+        # Reconstruire les index à partir de l'état
+        self.announcements = []
+        self.broadcast_announcements = []
+        self.announcement_index = {}
+        for announcement in snapshot["announcements"]:
+            self._index_announcement(announcement, announcement["block_index"])
+        
+        self.submissions_by_id = {s["transaction_id"]: s for s in snapshot["submissions"]}
+        self._reset_deadline_index()
+        for assignment in snapshot["assignments"]:
+            self._index_assignment(assignment, assignment["block_index"])
+        for submission in snapshot["submissions"]:
+            self._index_submission(submission, submission["block_index"])
+        # Blocs ajoutés sans passer par append_block (en-têtes d'amorçage); position inconnue sans le corps
+        self.block_heights = {block.hash: block.index for block in self.chain}
+        for txs in (snapshot["assignments"], snapshot["submissions"], snapshot["grades"], snapshot["announcements"]):
+            for tx in txs:
+                self.transaction_locations.setdefault(tx["transaction_id"], (tx["block_index"], None))
+        self.graded = set()
+        for grade in snapshot["grades"]:
+            assignment_id = self.get_grade_assignment_id(grade)
+            if assignment_id is not None:
+                self.graded.add((grade["sender"], grade["receiver"], assignment_id))
+    
+    def prune(self, before_height: int) -> int:
+        """Élague le corps des blocs d'index < before_height; retourne le nombre de blocs élagués
+        
+        L'état dérivé de ces blocs est conservé dans pruned_state. Si archive_dir est défini,
+        les transactions retirées y sont écrites (un fichier par bloc, compressé avec
+        block_codec s'il est défini, gzip sinon).
+        """
+        with self._prune_lock:
+            start = self.first_unpruned_index()
+            before_height = min(before_height, len(self.chain) - 1)
+            if before_height <= start:
+                return 0
+            
+            if self.archive_dir:
+                os.makedirs(self.archive_dir, exist_ok=True)
+            
+            for block in self.chain[start:before_height]:
+                apply_transactions_to_state(self.pruned_state, block.transactions, block.index)
+                
+                # Ne garder que les métadonnées des soumissions indexées
+                for tx in block.transactions:
+                    if tx["type"] == "SUBMISSION" and tx["transaction_id"] in self.submissions_by_id:
+                        self.submissions_by_id[tx["transaction_id"]] = submission_metadata(tx, block.index)
+                
+                self.archive_transactions(block.index, block.prune())
+            
+            self.pruned_height = before_height
+            self.body_revision += 1
+            return before_height - start
+    
+    def archive_transactions(self, index: int, transactions: List[Dict]):
+        """Écrit le corps d'un bloc dans le répertoire d'archive (si configuré)"""
+        if not self.archive_dir:
+            return
+        if self.block_codec is not None:
+            with open(self._archive_path(index, compressed=True), "wb") as f:
+                f.write(dumps_block(transactions, self.block_codec))
+            return
+        with gzip.open(self._archive_path(index), "wt", encoding="utf-8") as f:
+            json.dump(transactions, f)
+    
+    def _archive_path(self, index: int, compressed: bool = False) -> str:
+        extension = "blk" if compressed else "json.gz"
+        return os.path.join(self.archive_dir, f"block-{index:08d}.{extension}")
+    
+    def load_archived_transactions(self, index: int) -> Optional[List[Dict]]:
+        """Relit les transactions archivées d'un bloc élagué (None si non archivées)
+        
+        Les deux formats sont lus quel que soit block_codec: une archive peut
+        mêler des blocs écrits avant et après un changement de configuration.
+        """
+        if not self.archive_dir:
+            return None
+        for compressed in (True, False):
+            path = self._archive_path(index, compressed)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return loads_block(f.read())
+        return None
+    
+    def content_version(self) -> Tuple:
+        """Version du contenu de la chaîne pour les caches de réponses
+        
+        Le hash du dernier bloc distingue deux chaînes de même hauteur; la révision
+        des corps change quand des blocs sont élagués ou complétés.
+        """
+        return (len(self.chain), self.chain[-1].hash, self.body_revision)
     
     def get_latest_block(self) -> Block:
         """Retourne le dernier bloc de la chaîne"""
         return self.chain[-1]
     
+    def get_block(self, height: int) -> Optional[Dict]:
+        """Bloc à une hauteur donnée, avec son nombre de confirmations"""
+        if not 0 <= height < len(self.chain):
+            return None
+        block = self.chain[height].to_dict()
+        block["confirmations"] = len(self.chain) - height
+        return block
+    
+    def get_block_by_hash(self, block_hash: str) -> Optional[Dict]:
+        """Bloc désigné par son hash"""
+        height = self.block_heights.get(block_hash)
+        return None if height is None else self.get_block(height)
+    
+    def get_transaction(self, transaction_id: str) -> Optional[Dict]:
+        """Transaction minée ou en attente, avec son emplacement et ses confirmations
+        
+        Dans un bloc élagué, le corps est relu depuis l'archive si elle existe
+        (transaction à None sinon).
+        """
+        location = self.transaction_locations.get(transaction_id)
+        if location is None:
+            if transaction_id in self.pending_ids:
+                for pending in self.pending_transactions:
+                    if pending.transaction_id == transaction_id:
+                        return {
+                            "status": "pending",
+                            "transaction": pending.to_dict(),
+                            "block_height": None,
+                            "block_hash": None,
+                            "position": None,
+                            "confirmations": 0
+                        }
+            return None
+        
+        height, position = location
+        block = self.chain[height]
+        transaction = None
+        if not block.pruned:
+            transaction = block.transactions[position]
+        else:
+            archived = self.load_archived_transactions(height)
+            if archived is not None:
+                if position is None:
+                    position = next(
+                        (i for i, tx in enumerate(archived) if tx["transaction_id"] == transaction_id), None
+                    )
+                if position is not None:
+                    transaction = archived[position]
+        
+        return {
+            "status": "confirmed",
+            "transaction": transaction,
+            "block_height": height,
+            "block_hash": block.hash,
+            "position": position,
+            "confirmations": len(self.chain) - height
+        }
+    
+    def has_transaction_id(self, transaction_id: str) -> bool:
+        """Vérifie si un ID est déjà utilisé (mempool ou chaîne)"""
+        return transaction_id in self.pending_ids or transaction_id in self.transaction_locations
+    
     def add_transaction(self, transaction: Transaction) -> bool:
         """Ajoute une transaction à la liste des transactions en attente"""
         if not transaction.sender or not transaction.receiver:
             return False
+        if self.has_transaction_id(transaction.transaction_id):
+            return False
         
+        self.pending_ids.add(transaction.transaction_id)
         self.pending_transactions.append(transaction)
+        if self.listeners:
+            self.notify("pending_transaction", transaction.to_dict())
+        return True
+    
+    def add_transactions(self, transactions: List[Transaction]) -> bool:
+        """Ajoute un lot de transactions en attente: toutes ou aucune"""
+        if any(not tx.sender or not tx.receiver for tx in transactions):
+            return False
+        
+        batch_ids = {tx.transaction_id for tx in transactions}
+        if len(batch_ids) != len(transactions) or any(self.has_transaction_id(i) for i in batch_ids):
+            return False
+        
+        self.pending_ids.update(batch_ids)
+        self.pending_transactions.extend(transactions)
+        if self.listeners:
+            for tx in transactions:
+                self.notify("pending_transaction", tx.to_dict())
         return True
     
     def mine_pending_transactions(self, miner_address: str):
         """Mine les transactions en attente et crée un nouveau bloc"""
+        block = self.prepare_block()
+        if block is None:
+            return None
+        
+        started = time.perf_counter()
+        block.mine_block(self.difficulty)
+        return self.commit_block(block, miner_address, time.perf_counter() - started)
+    
+    def prepare_block(self) -> Optional[Block]:
+        """Construit le bloc candidat (non miné) contenant les transactions en attente"""
         if not self.pending_transactions:
             return None
         
-        # Créer un nouveau bloc avec les transactions en attente
-        block = Block(
+        return Block(
             len(self.chain),
             time.time(),
             [tx.to_dict() for tx in self.pending_transactions],
             self.get_latest_block().hash
         )
+    
+    def commit_block(self, block: Block, miner_address: str, mining_seconds: float) -> Optional[Block]:
+        """Ajoute un bloc candidat miné; None si la chaîne a avancé entre-temps
         
-        # Miner le bloc
-        block.mine_block(self.difficulty)
+        Les transactions arrivées pendant le minage restent en attente, suivies
+        de la récompense du mineur.
+        """
+        if block.index != len(self.chain) or block.previous_hash != self.get_latest_block().hash:
+            return None
+        
+        MINING_DURATION.observe(mining_seconds)
+        MINING_HASHES.observe(block.nonce + 1)
+        BLOCK_TRANSACTIONS.observe(len(block.transactions))
+        BLOCKS_MINED.inc()
         
         # Ajouter le bloc à la chaîne
-        self.chain.append(block)
+        self.append_block(block)
         
-        # Réinitialiser les transactions en attente et ajouter une récompense
+        # Retirer les transactions minées et ajouter une récompense
+        mined = {tx["transaction_id"] for tx in block.transactions}
+        reward = Transaction("SYSTEM", miner_address, "REWARD", {"amount": self.mining_reward})
         self.pending_transactions = [
-            Transaction("SYSTEM", miner_address, "REWARD", {"amount": self.mining_reward})
-        ]
+            tx for tx in self.pending_transactions if tx.transaction_id not in mined
+        ] + [reward]
+        self.pending_ids.add(reward.transaction_id)
         
         return block
     
+    @timed(QUERY_LATENCY, method="is_chain_valid")
     def is_chain_valid(self) -> bool:
         """Vérifie l'intégrité de la blockchain"""
         for i in range(1, len(self.chain)):
             current_block = self.chain[i]
             previous_block = self.chain[i - 1]
             
-            # Vérifier le hash du bloc actuel
+            # Vérifier le hash du bloc actuel et la racine de Merkle de ses transactions
             if current_block.hash != current_block.calculate_hash():
                 return False
+            if not current_block.verify_merkle_root():
+                return False
             
             # Vérifier la liaison avec le bloc précédent
             if current_block.previous_hash != previous_block.hash:
@@ -164,43 +846,81 @@ class Blockchain:
         return True
     
     def register_participant(self, address: str, role: str, public_key: str, 
-                           name: str, email: str) -> Dict:
-        """Enregistre un participant (étudiant ou enseignant)"""
-        if address in self.participants:
-            return {"error": "Participant already exists"}
+                           name: str, email: str, key_type: str = "RSA") -> Dict:
+        """Enregistre un participant (étudiant ou enseignant)
         
-        self.participants[address] = {
+        key_type (RSA, ED25519 ou ECDSA) détermine la vérification de ses signatures.
+        """
+        return self.register_participants([{
             "address": address,
-            "role": role,  # "TEACHER" ou "STUDENT"
+            "role": role,
             "public_key": public_key,
             "name": name,
             "email": email,
-            "registered_at": time.time()
-        }
+            "key_type": key_type
+        }])[0]
+    
+    def register_participants(self, entries: List[Dict]) -> List[Dict]:
+        """Enregistre un lot de participants et crée leurs transactions d'enregistrement
         
-        # Créer une transaction d'enregistrement
-        registration_tx = Transaction(
-            "SYSTEM",
-            address,
-            "REGISTRATION",
-            {
-                "role": role,
-                "name": name,
-                "email": email,
-                "public_key": public_key
+        Chaque entrée contient address, role, public_key, name, email et
+        éventuellement key_type (RSA par défaut) et timestamp (horodatage imposé,
+        données synthétiques).
+        Retourne, dans le même ordre, le participant créé ou {"error": ...}.
+        """
+        results = []
+        registration_txs = []
+        
+        for entry in entries:
+            address = entry["address"]
+            if address in self.participants:
+                results.append({"error": "Participant already exists"})
+                continue
+            
+            self.participants[address] = {
+                "address": address,
+                "role": entry["role"],  # "TEACHER" ou "STUDENT"
+                "public_key": entry["public_key"],
+                "key_type": entry.get("key_type", "RSA"),
+                "name": entry["name"],
+                "email": entry["email"],
+                "registered_at": entry.get("timestamp", time.time())
             }
-        )
-        self.add_transaction(registration_tx)
+            results.append(self.participants[address])
+            
+            # Créer une transaction d'enregistrement
+            registration_txs.append(Transaction(
+                "SYSTEM",
+                address,
+                "REGISTRATION",
+                {
+                    "role": entry["role"],
+                    "name": entry["name"],
+                    "email": entry["email"],
+                    "public_key": entry["public_key"],
+                    "key_type": entry.get("key_type", "RSA")
+                },
+                timestamp=entry.get("timestamp")
+            ))
+        
+        if registration_txs:
+            self.participants_version += 1
+            self.add_transactions(registration_txs)
         
-        return self.participants[address]
+        return results
     
+    @timed(QUERY_LATENCY, method="get_transactions_by_address")
     def get_transactions_by_address(self, address: str) -> List[Dict]:
-        """Récupère toutes les transactions liées à une adresse"""
+        """Récupère toutes les transactions liées à une adresse (blocs non élagués uniquement)
+        
+        Les annonces ciblées comptent pour chacun de leurs destinataires, même
+        lorsque receiver vaut "MULTIPLE".
+        """
         transactions = []
         
-        for block in self.chain[1:]:  # Ignorer le bloc genesis
+        for block in self.chain[self.first_unpruned_index():]:  # Ignorer le genesis et les blocs élagués
             for tx in block.transactions:
-                if tx["sender"] == address or tx["receiver"] == address:
+                if tx["sender"] == address or tx["receiver"] == address or is_announcement_recipient(tx, address):
                     tx_with_block = tx.copy()
                     tx_with_block["block_index"] = block.index
                     tx_with_block["block_hash"] = block.hash
@@ -208,11 +928,15 @@ class Blockchain:
         
         return transactions
     
+    @timed(QUERY_LATENCY, method="get_assignments")
     def get_assignments(self, student_address: Optional[str] = None) -> List[Dict]:
         """Récupère les devoirs (assignments)"""
-        assignments = []
+        assignments = [
+            assignment.copy() for assignment in self.pruned_state["assignments"]
+            if student_address is None or assignment["receiver"] in (student_address, "ALL")
+        ]
         
-        for block in self.chain[1:]:
+        for block in self.chain[self.first_unpruned_index():]:
             for tx in block.transactions:
                 if tx["type"] == "ASSIGNMENT":
                     if student_address is None or tx["receiver"] == student_address or tx["receiver"] == "ALL":
@@ -222,11 +946,18 @@ class Blockchain:
         
         return assignments
     
+    @timed(QUERY_LATENCY, method="get_submissions")
     def get_submissions(self, assignment_id: str) -> List[Dict]:
-        """Récupère les soumissions pour un devoir spécifique"""
-        submissions = []
+        """Récupère les soumissions pour un devoir spécifique
+        
+        Les soumissions des blocs élagués n'ont plus leur contenu chiffré.
+        """
+        submissions = [
+            submission.copy() for submission in self.pruned_state["submissions"]
+            if submission["data"].get("assignment_id") == assignment_id
+        ]
         
-        for block in self.chain[1:]:
+        for block in self.chain[self.first_unpruned_index():]:
             for tx in block.transactions:
                 if tx["type"] == "SUBMISSION" and tx["data"].get("assignment_id") == assignment_id:
                     submission = tx.copy()
@@ -235,21 +966,31 @@ class Blockchain:
         
         return submissions
     
+    @timed(QUERY_LATENCY, method="get_submission_by_id")
     def get_submission_by_id(self, submission_id: str) -> Optional[Dict]:
         """Récupère une soumission spécifique par son transaction_id"""
-        for block in self.chain[1:]:
-            for tx in block.transactions:
-                if tx["type"] == "SUBMISSION" and tx["transaction_id"] == submission_id:
-                    submission = tx.copy()
-                    submission["block_index"] = block.index
-                    return submission
-        return None
+        submission = self.submissions_by_id.get(submission_id)
+        return submission.copy() if submission else None
+    
+    def get_grade_assignment_id(self, tx: Dict) -> Optional[str]:
+        """Retourne le devoir concerné par une note
+        
+        Les anciennes notes ne stockent que submission_id: le devoir est alors
+        retrouvé via la soumission.
+        """
+        assignment_id = tx["data"].get("assignment_id")
+        if assignment_id is None:
+            submission = self.submissions_by_id.get(tx["data"].get("submission_id"))
+            if submission:
+                assignment_id = submission["data"].get("assignment_id")
+        return assignment_id
     
+    @timed(QUERY_LATENCY, method="get_grades")
     def get_grades(self, student_address: str) -> List[Dict]:
         """Récupère les notes d'un étudiant"""
-        grades = []
+        grades = [grade.copy() for grade in self.pruned_state["grades"] if grade["receiver"] == student_address]
         
-        for block in self.chain[1:]:
+        for block in self.chain[self.first_unpruned_index():]:
             for tx in block.transactions:
                 if tx["type"] == "GRADE" and tx["receiver"] == student_address:
                     grade = tx.copy()
@@ -258,43 +999,83 @@ class Blockchain:
         
         return grades
     
+    @timed(QUERY_LATENCY, method="get_announcements")
     def get_announcements(self, student_address: Optional[str] = None) -> List[Dict]:
         """Récupère les annonces pour un étudiant ou toutes les annonces"""
-        announcements = []
-        
-        for block in self.chain[1:]:
-            for tx in block.transactions:
-                if tx["type"] == "ANNOUNCEMENT":
-                    # Si student_address est None, retourner toutes les annonces
-                    # Sinon, filtrer par destinataire (ALL ou l'adresse spécifique)
-                    if student_address is None or tx["receiver"] == "ALL" or tx["receiver"] == student_address:
-                        announcement = tx.copy()
-                        announcement["block_index"] = block.index
-                        announcements.append(announcement)
+        # Si student_address est None, retourner toutes les annonces
+        if student_address is None:
+            return [announcement.copy() for announcement in self.announcements]
         
-        return announcements
+        # Sinon, fusionner les annonces "ALL" et celles ciblant l'adresse (déjà triées)
+        positions = heapq.merge(
+            self.broadcast_announcements,
+            self.announcement_index.get(student_address, [])
+        )
+        return [self.announcements[position].copy() for position in positions]
     
+    @timed(QUERY_LATENCY, method="has_student_submitted")
     def has_student_submitted(self, student_address: str, assignment_id: str) -> bool:
         """Vérifie si un étudiant a déjà soumis un devoir spécifique"""
-        for block in self.chain[1:]:
-            for tx in block.transactions:
-                if (tx["type"] == "SUBMISSION" and 
-                    tx["sender"] == student_address and 
-                    tx["data"].get("assignment_id") == assignment_id):
-                    return True
-        return False
+        return student_address in self.assignment_submitters.get(assignment_id, {})
     
+    def get_deadline(self, assignment_id: str) -> Optional[float]:
+        """Date limite (timestamp) d'un devoir miné; None si inconnue ou illisible"""
+        assignment = self.assignments_by_id.get(assignment_id)
+        return assignment["due_timestamp"] if assignment else None
+    
+    @timed(QUERY_LATENCY, method="get_upcoming_deadlines")
+    def get_upcoming_deadlines(self, hours: float, teacher_address: Optional[str] = None,
+                               now: Optional[float] = None) -> List[Dict]:
+        """Devoirs dont la date limite tombe dans les prochaines heures, par échéance croissante"""
+        if now is None:
+            now = time.time()
+        start = bisect.bisect_right(self.deadlines, now, key=lambda deadline: deadline[0])
+        end = bisect.bisect_right(self.deadlines, now + hours * 3600, key=lambda deadline: deadline[0])
+        
+        upcoming = []
+        for _, assignment_id in self.deadlines[start:end]:
+            assignment = self.assignments_by_id[assignment_id]
+            if teacher_address is not None and assignment["teacher_address"] != teacher_address:
+                continue
+            upcoming.append({
+                **assignment,
+                "submissions": len(self.assignment_submitters.get(assignment_id, {})),
+                "remaining_seconds": assignment["due_timestamp"] - now
+            })
+        return upcoming
+    
+    @timed(QUERY_LATENCY, method="get_late_submissions")
+    def get_late_submissions(self, assignment_id: str) -> List[Dict]:
+        """Soumissions minées reçues après la date limite d'un devoir"""
+        return [dict(submission) for submission in self.late_submissions.get(assignment_id, [])]
+    
+    @timed(QUERY_LATENCY, method="get_missing_submissions")
+    def get_missing_submissions(self, assignment_id: str) -> Optional[List[Dict]]:
+        """Étudiants destinataires d'un devoir qui ne l'ont pas soumis; None si le devoir est inconnu"""
+        assignment = self.assignments_by_id.get(assignment_id)
+        if assignment is None:
+            return None
+        
+        submitters = self.assignment_submitters.get(assignment_id, {})
+        if assignment["receiver"] == "ALL":
+            students = [
+                address for address, participant in self.participants.items()
+                if participant.get("role") == "STUDENT"
+            ]
+        else:
+            students = [assignment["receiver"]]
+        
+        return [
+            {"student_address": address, "name": self.participants.get(address, {}).get("name")}
+            for address in students if address not in submitters
+        ]
+    
+    @timed(QUERY_LATENCY, method="has_teacher_graded")
     def has_teacher_graded(self, teacher_address: str, student_address: str, assignment_id: str) -> bool:
         """Vérifie si un enseignant a déjà noté un étudiant pour un devoir spécifique"""
-        for block in self.chain[1:]:
-            for tx in block.transactions:
-                if (tx["type"] == "GRADE" and 
-                    tx["sender"] == teacher_address and 
-                    tx["receiver"] == student_address and
-                    tx["data"].get("assignment_id") == assignment_id):
-                    return True
-        return False
+        return (teacher_address, student_address, assignment_id) in self.graded
     
+    @timed(QUERY_LATENCY, method="get_chain_info")
     def get_chain_info(self) -> Dict:
         """Retourne les informations sur la blockchain"""
         return {
@@ -306,6 +1087,7 @@ class Blockchain:
             "latest_block": self.get_latest_block().to_dict()
         }
     
+    @timed(QUERY_LATENCY, method="export_chain")
     def export_chain(self) -> List[Dict]:
         """Exporte toute la chaîne"""
         return [block.to_dict() for block in self.chain]
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Amorçage rapide d'un nœud à partir d'un snapshot vérifié et de la chaîne d'en-têtes
+
+Un paquet d'amorçage contient l'état dérivé à la hauteur du dernier bloc, son
+empreinte SHA-256 et les en-têtes de tous les blocs. Le chargement vérifie les
+en-têtes (hash, liaison, preuve de travail) puis le snapshot, qui doit
+correspondre au hash du dernier bloc: le nœud sert les requêtes immédiatement.
+
+L'empreinte contenue dans le paquet ne protège que contre la corruption: qui
+modifie le snapshot peut la recalculer. Le snapshot est digne de confiance s'il
+correspond à une empreinte obtenue hors du paquet (trusted_state_digest, celle
+d'un nœud de confiance), ou une fois l'état reconstruit à partir des corps des
+blocs, récupérés en arrière-plan et vérifiés contre les racines de Merkle: un
+écart fait échouer l'amorçage.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.blockchain import Block, Blockchain, apply_transactions_to_state, empty_state, hash_transaction
+
+FORMAT_VERSION = 1
+PARTICIPANT_FIELDS = ("role", "name", "email", "public_key", "key_type")  # Champs portés par REGISTRATION
+
+
+class SnapshotMismatch(ValueError):
+    """Le snapshot d'amorçage diffère de l'état reconstruit à partir des corps de blocs vérifiés"""
+
+    def __init__(self, sections: List[str]):
+        super().__init__(f"Bootstrap snapshot does not match the verified block bodies: {', '.join(sections)}")
+        self.sections = sections
+
+
+def _open(path: str, mode: str):
+    opener = gzip.open if path.endswith(".gz") else open
+    return opener(path, mode, encoding="utf-8")
+
+
+def state_digest(snapshot: Dict) -> str:
+    """Empreinte canonique d'un snapshot"""
+    return hashlib.sha256(json.dumps(snapshot, sort_keys=True).encode()).hexdigest()
+
+
+def export_bootstrap(blockchain: Blockchain) -> Dict:
+    """Construit un paquet d'amorçage à partir d'une chaîne en service
+
+    Les participants dont l'enregistrement n'est pas encore miné en sont exclus:
+    rien dans les blocs ne permettrait de les vérifier.
+    """
+    snapshot = blockchain.create_snapshot()
+    pending = {tx.receiver for tx in blockchain.pending_transactions if tx.transaction_type == "REGISTRATION"}
+    snapshot["participants"] = {
+        address: participant for address, participant in snapshot["participants"].items()
+        if address not in pending
+    }
+    return {
+        "format": FORMAT_VERSION,
+        "difficulty": blockchain.difficulty,
+        "snapshot": snapshot,
+        "state_digest": state_digest(snapshot),
+        "headers": [block.to_header() for block in blockchain.chain]
+    }
+
+
+def save_bootstrap(path: str, blockchain: Blockchain):
+    """Écrit un paquet d'amorçage (gzip si le chemin finit par .gz)"""
+    with _open(path, "wt") as f:
+        json.dump(export_bootstrap(blockchain), f)
+
+
+def validate_headers(blocks, difficulty: int):
+    """Vérifie hash, liaison et preuve de travail des en-têtes; lève ValueError sinon"""
+    target = "0" * difficulty
+    for i, block in enumerate(blocks):
+        if block.index != i:
+            raise ValueError(f"Unexpected block index {block.index} at position {i}")
+        previous_hash = blocks[i - 1].hash if i > 0 else "0"
+        if block.previous_hash != previous_hash:
+            raise ValueError(f"Block {i} is not linked to its predecessor")
+        if i > 0 and not block.hash.startswith(target):
+            raise ValueError(f"Block {i} does not satisfy proof of work")
+
+
+def load_bootstrap(bundle: Dict, trusted_hash: Optional[str] = None, trusted_state_digest: Optional[str] = None,
+                   **blockchain_options) -> Blockchain:
+    """Construit une Blockchain prête à servir à partir d'un paquet d'amorçage
+
+    trusted_hash et trusted_state_digest, s'ils sont fournis, doivent être le hash
+    du dernier bloc et l'empreinte du snapshot obtenus par une source de confiance
+    (configuration, autre nœud). Sans trusted_state_digest, le snapshot n'est
+    vérifié qu'à la fin de backfill_bodies.
+    """
+    if bundle.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported bootstrap format: {bundle.get('format')}")
+
+    snapshot = bundle["snapshot"]
+    digest = state_digest(snapshot)
+    if digest != bundle["state_digest"]:
+        raise ValueError("Snapshot digest mismatch")
+    if trusted_state_digest is not None and digest != trusted_state_digest:
+        raise ValueError("Snapshot does not match the trusted state digest")
+
+    blocks = []
+    for header in bundle["headers"]:
+        block = Block.from_header(header)
+        if block.hash != header["hash"]:
+            raise ValueError(f"Block {block.index} header hash mismatch")
+        blocks.append(block)
+    validate_headers(blocks, bundle["difficulty"])
+
+    if trusted_hash is not None and blocks[-1].hash != trusted_hash:
+        raise ValueError("Chain tip does not match the trusted hash")
+
+    blockchain = Blockchain(difficulty=bundle["difficulty"], genesis_block=blocks[0], **blockchain_options)
+    blockchain.chain.extend(blocks[1:])
+    blockchain.restore_snapshot(snapshot)
+    return blockchain
+
+
+def read_bootstrap_file(path: str) -> Dict:
+    """Lit un paquet d'amorçage depuis un fichier"""
+    with _open(path, "rt") as f:
+        return json.load(f)
+
+
+def iter_chain_file(path: str) -> Iterable[Tuple[int, list]]:
+    """Lit les corps de blocs (index, transactions) d'un export de chaîne
+
+    Accepte la réponse de GET /api/blockchain/chain ou un fichier de app.synthetic.
+    """
+    with _open(path, "rt") as f:
+        payload = json.load(f)
+    for block in payload["chain"]:
+        if not block.get("pruned"):
+            yield block["index"], block["transactions"]
+
+
+class StateReplay:
+    """État dérivé reconstruit à partir des corps de blocs vérifiés, dans l'ordre de la chaîne"""
+
+    def __init__(self):
+        self.state = empty_state()
+        self.participants: Dict[str, Dict] = {}
+        self.announcements: List[Dict] = []
+        self.next_index = 0  # None: un bloc a manqué ou est arrivé dans le désordre
+
+    def apply(self, index: int, transactions: List[Dict]):
+        """Rejoue un bloc; un bloc manquant ou dans le désordre interrompt la reconstruction"""
+        if index != self.next_index:
+            self.next_index = None
+            return
+        apply_transactions_to_state(self.state, transactions, index)
+        for tx in transactions:
+            if tx["type"] == "REGISTRATION":
+                self.participants[tx["receiver"]] = _participant_fields(tx["data"])
+            elif tx["type"] == "ANNOUNCEMENT":
+                announcement = tx.copy()
+                announcement["block_index"] = index
+                self.announcements.append(announcement)
+        self.next_index += 1
+
+    def covers(self, height: int) -> bool:
+        """Vérifie que tous les blocs jusqu'à height ont été rejoués"""
+        return self.next_index is not None and self.next_index > height
+
+    def mismatches(self, snapshot: Dict) -> List[str]:
+        """Sections du snapshot qui diffèrent de l'état reconstruit"""
+        rebuilt = {
+            "participants": self.participants,
+            "assignments": self.state["assignments"],
+            "submissions": self.state["submissions"],
+            "grades": self.state["grades"],
+            "announcements": self.announcements,
+            "transaction_counts": self.state["transaction_counts"]
+        }
+        expected = dict(snapshot, participants={
+            address: _participant_fields(participant) for address, participant in snapshot["participants"].items()
+        })
+        return [section for section, value in rebuilt.items() if _canonical(value) != _canonical(expected[section])]
+
+
+def _participant_fields(entry: Dict) -> Dict:
+    return {field: entry.get(field, "RSA" if field == "key_type" else None) for field in PARTICIPANT_FIELDS}
+
+
+def _canonical(value) -> str:
+    return json.dumps(value, sort_keys=True)
+
+
+def backfill_bodies(blockchain: Blockchain, bodies: Iterable[Tuple[int, list]],
+                    snapshot: Optional[Dict] = None) -> Dict:
+    """Vérifie des corps de blocs contre les racines de Merkle des en-têtes
+
+    Les hash de transactions vérifiés sont rattachés aux blocs; si la chaîne a un
+    répertoire d'archive, les corps y sont écrits pour rester consultables.
+    Si snapshot (celui du paquet d'amorçage) est fourni, l'état reconstruit à
+    partir des corps vérifiés lui est comparé: SnapshotMismatch en cas d'écart,
+    report["state"] vaut "incomplete" s'il manque des corps pour conclure.
+    """
+    report = {"verified": 0, "rejected": [], "skipped": 0}
+    replay = StateReplay() if snapshot is not None else None
+
+    for index, transactions in bodies:
+        if index >= len(blockchain.chain) or index >= blockchain.pruned_height:
+            report["skipped"] += 1
+            continue
+
+        block = blockchain.chain[index]
+        if block.tx_hashes is not None:
+            report["skipped"] += 1
+            continue
+
+        if not block.attach_transaction_hashes([hash_transaction(tx) for tx in transactions]):
+            report["rejected"].append(index)
+            continue
+
+        blockchain.archive_transactions(index, transactions)
+        blockchain.body_revision += 1
+        report["verified"] += 1
+        if replay is not None:
+            replay.apply(index, transactions)
+
+    if replay is not None:
+        if not replay.covers(snapshot["height"]):
+            report["state"] = "incomplete"
+        else:
+            sections = replay.mismatches(snapshot)
+            if sections:
+                raise SnapshotMismatch(sections)
+            report["state"] = "verified"
+
+    return report
+
+
+def start_backfill(blockchain: Blockchain, path: str, snapshot: Optional[Dict] = None,
+                   on_failure: Optional[Callable[[Exception], None]] = None) -> threading.Thread:
+    """Lance la vérification des corps de blocs (et du snapshot) en arrière-plan
+
+    on_failure est appelé si le snapshot diffère des corps vérifiés.
+    """
+    def run():
+        try:
+            report = backfill_bodies(blockchain, iter_chain_file(path), snapshot)
+        except SnapshotMismatch as e:
+            print(f"Bootstrap FAILED: {e}")
+            if on_failure is not None:
+                on_failure(e)
+            return
+        print(f"Bootstrap backfill finished: {report['verified']} blocks verified, "
+              f"{len(report['rejected'])} rejected, snapshot {report.get('state', 'not checked')}")
+
+    thread = threading.Thread(target=run, name="bootstrap-backfill", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,159 @@
+"""
+Cache des réponses des routes de lecture, invalidé par la version du contenu de la chaîne
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from app.compression import encode_http, encoding_headers, negotiate_encoding
+
+
+class ResponseCache:
+    """Cache LRU de réponses JSON déjà sérialisées
+
+    Chaque entrée est indexée par route + paramètres et étiquetée par une
+    version (Blockchain.content_version, version des participants, ...). Une
+    entrée dont la version ne correspond plus est recalculée. L'ETag dérive de la
+    clé et de la version, ce qui permet de répondre 304 sans rien recalculer. Il
+    dérive aussi du tenant et d'un identifiant tiré à la création du cache: un
+    ETag émis avant un redémarrage, ou par un autre nœud, ne valide rien.
+
+    Avec compress=True, la réponse est compressée selon Accept-Encoding et mise
+    en cache compressée: une entrée (et un ETag) par encodage.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024, namespace: str = ""):
+        self.max_entries = max_entries
+        self.namespace = f"{namespace}:{os.urandom(8).hex()}"  # Tenant et instance du cache
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries: "OrderedDict[str, Tuple[Tuple, str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(request: Request) -> str:
+        """Construit la clé de cache à partir du chemin et des paramètres triés"""
+        params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{params}"
+
+    def make_etag(self, key: str, version: Tuple) -> str:
+        """Calcule l'ETag d'une réponse pour une version donnée"""
+        digest = hashlib.sha1(f"{self.namespace}|{key}|{version!r}".encode("utf-8")).hexdigest()
+        return f'"{digest}"'
+
+    def respond(self, request: Request, version: Tuple, compute: Callable[[], Any],
+                compress: bool = False) -> Response:
+        """Retourne la réponse en cache, un 304 ou calcule et met en cache la réponse"""
+        encoding = negotiate_encoding(request.headers.get("accept-encoding")) if compress else None
+        key, etag, headers, cached = self._lookup(request, version, compress, encoding)
+        if cached is not None:
+            return cached
+
+        body = self._render(compute, encoding)
+        self._store(key, version, etag, body)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def respond_async(self, request: Request, version: Tuple, compute: Callable[[], Any],
+                            run: Callable[[Callable[[], bytes]], Awaitable[bytes]],
+                            compress: bool = False) -> Response:
+        """Comme respond, mais le calcul, la sérialisation et la compression sont confiés à run
+        (pool de threads)
+
+        Les hits et les 304 restent servis directement depuis la boucle d'événements.
+        """
+        encoding = negotiate_encoding(request.headers.get("accept-encoding")) if compress else None
+        key, etag, headers, cached = self._lookup(request, version, compress, encoding)
+        if cached is not None:
+            return cached
+
+        body = await run(lambda: self._render(compute, encoding))
+        self._store(key, version, etag, body)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def _lookup(self, request: Request, version: Tuple, compress: bool = False,
+                encoding: Optional[str] = None) -> Tuple[str, str, Dict, Optional[Response]]:
+        """Calcule clé et ETag; retourne la réponse 304 ou en cache si elle existe"""
+        key = self.make_key(request)
+        if encoding is not None:
+            key = f"{key}|{encoding}"
+        etag = self.make_etag(key, version)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if compress:
+            headers.update(encoding_headers(encoding))
+
+        if etag in _parse_if_none_match(request.headers.get("if-none-match")):
+            with self._lock:
+                self.not_modified += 1
+            headers.pop("Content-Encoding", None)
+            return key, etag, headers, Response(status_code=304, headers=headers)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                cached = Response(content=entry[2], media_type="application/json", headers=headers)
+                return key, etag, headers, cached
+            self.misses += 1
+
+        return key, etag, headers, None
+
+    @staticmethod
+    def _render(compute: Callable[[], Any], encoding: Optional[str] = None) -> bytes:
+        return encode_http(JSONResponse(content=jsonable_encoder(compute())).body, encoding)
+
+    def _store(self, key: str, version: Tuple, etag: str, body: bytes):
+        """Ajoute une entrée et évince les moins récemment utilisées"""
+        if len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous[2])
+
+            self._entries[key] = (version, etag, body)
+            self.total_bytes += len(body)
+
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def clear(self):
+        """Vide le cache"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def get_stats(self) -> Dict:
+        """Retourne les statistiques du cache"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified
+        }
+
+
+def compressed_response(request: Request, content: Any) -> Response:
+    """Réponse JSON non mise en cache, compressée selon Accept-Encoding"""
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    body = encode_http(JSONResponse(content=jsonable_encoder(content)).body, encoding)
+    return Response(content=body, media_type="application/json", headers=encoding_headers(encoding))
+
+
+def _parse_if_none_match(header: str) -> set:
+    """Extrait les ETags d'un en-tête If-None-Match"""
+    if not header:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")}
@@ -0,0 +1,193 @@
+"""
+Compression des blocs archivés et des réponses de la chaîne
+
+Le corps d'un bloc est du JSON aux clés répétées (transaction_id, sender...),
+aux hash hexadécimaux et aux clés publiques PEM. Compressé seul, un bloc se
+prête mal à gzip: le compresseur n'a aucun contexte. Chaque bloc est donc
+compressé avec un dictionnaire partagé, construit à partir de la forme de nos
+transactions (clés, types, en-têtes PEM): ces fragments sont déjà connus au
+premier octet du bloc.
+
+Codecs: zlib (toujours disponible) et zstd (paquet zstandard facultatif). Un
+bloc compressé commence par un en-tête (magie, codec, version du
+dictionnaire), ce qui permet de le relire sans connaître la configuration qui
+l'a écrit.
+
+Les réponses HTTP de la chaîne utilisent les encodages standard (zstd, gzip,
+deflate) négociés par Accept-Encoding: un client HTTP ne connaît pas notre
+dictionnaire.
+"""
+import gzip
+import json
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # Dépendance facultative: zlib seul
+    zstandard = None
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+CODECS = (CODEC_ZLIB, CODEC_ZSTD)
+DICTIONARY_VERSION = 1  # À incrémenter si _TEMPLATES change: les blocs déjà écrits en dépendent
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 12
+HTTP_LEVEL = 6
+
+MAGIC = b"\xb7K"
+_CODEC_IDS = {CODEC_ZLIB: 1, CODEC_ZSTD: 2}
+_CODEC_NAMES = {code: name for name, code in _CODEC_IDS.items()}
+
+# Fragments constants des clés publiques (préfixe SubjectPublicKeyInfo et fin PEM)
+_RSA_PUBLIC_KEY = "-----BEGIN PUBLIC KEY-----\nMIIBIjANBgkqhkiG9w0BAQEFAAOCAQ8AMIIBCgKCAQEA\nIDAQAB\n-----END PUBLIC KEY-----"
+_ED25519_PUBLIC_KEY = "-----BEGIN PUBLIC KEY-----\nMCowBQYDK2VwAyEA=\n-----END PUBLIC KEY-----"
+_ECDSA_PUBLIC_KEY = "-----BEGIN PUBLIC KEY-----\nMFkwEwYHKoZIzj0CAQYIKoZIzj0DAQcDQgAE==\n-----END PUBLIC KEY-----"
+
+# Une transaction de chaque type, dans l'ordre de Transaction.to_dict, de la moins
+# fréquente à la plus fréquente: zlib atteint mieux la fin du dictionnaire.
+_TEMPLATES = [
+    ("REGISTRATION", "SYSTEM", "", {"role": "STUDENT", "name": "", "email": "", "public_key": _ECDSA_PUBLIC_KEY,
+                                    "key_type": "ECDSA"}),
+    ("REGISTRATION", "SYSTEM", "", {"role": "TEACHER", "name": "", "email": "", "public_key": _ED25519_PUBLIC_KEY,
+                                    "key_type": "ED25519"}),
+    ("REGISTRATION", "SYSTEM", "", {"role": "STUDENT", "name": "", "email": "", "public_key": _RSA_PUBLIC_KEY,
+                                    "key_type": "RSA"}),
+    ("ANNOUNCEMENT", "", "MULTIPLE", {"title": "", "message": "", "recipients": [""]}),
+    ("ASSIGNMENT", "", "ALL", {"title": "", "description": "", "due_date": "T00:00",
+                               "encryption_public_key": _RSA_PUBLIC_KEY}),
+    ("REWARD", "SYSTEM", "", {"amount": 10}),
+    ("SUBMISSION", "", "SYSTEM", {"assignment_id": "", "encrypted_content": "", "student_name": ""}),
+    ("GRADE", "", "", {"submission_id": "", "assignment_id": "", "grade": 0.0, "comment": ""}),
+]
+
+
+def _build_dictionary() -> bytes:
+    """Dictionnaire partagé: les modèles sérialisés comme dans une archive de bloc"""
+    transactions = [
+        {
+            "transaction_id": "",
+            "sender": sender,
+            "receiver": receiver,
+            "type": transaction_type,
+            "data": data,
+            "timestamp": 1700000000.0,
+            "signature": None if sender == "SYSTEM" else ""
+        }
+        for transaction_type, sender, receiver, data in _TEMPLATES
+    ]
+    return json.dumps(transactions).encode("utf-8")
+
+
+DICTIONARY = _build_dictionary()
+_local = threading.local()  # Compresseurs zstd (non partageables entre threads)
+
+
+def available_codecs() -> List[str]:
+    return [codec for codec in CODECS if codec != CODEC_ZSTD or zstandard is not None]
+
+
+def check_codec(codec: str):
+    """Lève ValueError si le codec est inconnu ou indisponible"""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown block codec: {codec} (expected one of {', '.join(CODECS)})")
+    if codec == CODEC_ZSTD and zstandard is None:
+        raise ValueError("The zstd block codec requires the zstandard package")
+
+
+def _zstd(kind: str):
+    codecs = getattr(_local, "zstd", None)
+    if codecs is None:
+        dictionary = zstandard.ZstdCompressionDict(DICTIONARY, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        codecs = _local.zstd = {
+            "compress": zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary),
+            "decompress": zstandard.ZstdDecompressor(dict_data=dictionary)
+        }
+    return codecs[kind]
+
+
+def compress_block(payload: bytes, codec: str = CODEC_ZLIB) -> bytes:
+    """Compresse le corps d'un bloc avec le dictionnaire partagé (en-tête inclus)"""
+    check_codec(codec)
+    if codec == CODEC_ZSTD:
+        compressed = _zstd("compress").compress(payload)
+    else:
+        compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, 15, zdict=DICTIONARY)
+        compressed = compressor.compress(payload) + compressor.flush()
+    return MAGIC + bytes((_CODEC_IDS[codec], DICTIONARY_VERSION)) + compressed
+
+
+def decompress_block(blob: bytes) -> bytes:
+    """Décompresse un bloc écrit par compress_block (ou un ancien fichier gzip)"""
+    if blob[:2] == b"\x1f\x8b":
+        return gzip.decompress(blob)
+    if blob[:2] != MAGIC or len(blob) < 4:
+        raise ValueError("Not a compressed block")
+    codec = _CODEC_NAMES.get(blob[2])
+    if codec is None:
+        raise ValueError(f"Unknown block codec id: {blob[2]}")
+    if blob[3] != DICTIONARY_VERSION:
+        raise ValueError(f"Unsupported block dictionary version: {blob[3]}")
+    check_codec(codec)
+    if codec == CODEC_ZSTD:
+        return _zstd("decompress").decompress(blob[4:])
+    decompressor = zlib.decompressobj(15, zdict=DICTIONARY)
+    return decompressor.decompress(blob[4:]) + decompressor.flush()
+
+
+def dumps_block(value: Any, codec: str = CODEC_ZLIB) -> bytes:
+    return compress_block(json.dumps(value).encode("utf-8"), codec)
+
+
+def loads_block(blob: bytes) -> Any:
+    return json.loads(decompress_block(blob))
+
+
+# --- Réponses HTTP ---
+
+def http_encodings() -> List[str]:
+    """Encodages proposés, par ordre de préférence"""
+    return (["zstd"] if zstandard is not None else []) + ["gzip", "deflate"]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Meilleur encodage accepté par le client (None: réponse non compressée)"""
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in http_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def encode_http(body: bytes, encoding: Optional[str]) -> bytes:
+    """Encode un corps de réponse (Content-Encoding standard)"""
+    if encoding is None:
+        return body
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=HTTP_LEVEL).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=HTTP_LEVEL, mtime=0)
+    if encoding == "deflate":
+        return zlib.compress(body, HTTP_LEVEL)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def encoding_headers(encoding: Optional[str]) -> Dict[str, str]:
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return headers
+
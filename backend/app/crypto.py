@@ -1,26 +1,214 @@
-from Crypto.PublicKey import RSA
-from Crypto.Signature import pkcs1_15
+from Crypto.PublicKey import ECC, RSA
+from Crypto.Signature import DSS, eddsa, pkcs1_15
 from Crypto.Cipher import PKCS1_OAEP
 from Crypto.Hash import SHA256
 import binascii
 import json
 import base64
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.keystore import KeyStore, KeyStoreMapping
+from app.metrics import measure, timed, CRYPTO_LATENCY
+
+# Types de clés des portefeuilles. Les clés de chiffrement des soumissions restent RSA (OAEP).
+KEY_TYPE_RSA = "RSA"          # RSA-2048, PKCS#1 v1.5
+KEY_TYPE_ED25519 = "ED25519"  # EdDSA (RFC 8032)
+KEY_TYPE_ECDSA = "ECDSA"      # ECDSA P-256 (FIPS 186-3)
+KEY_TYPES = (KEY_TYPE_RSA, KEY_TYPE_ED25519, KEY_TYPE_ECDSA)
+DEFAULT_KEY_TYPE = KEY_TYPE_RSA
+_CURVES = {KEY_TYPE_ED25519: "ed25519", KEY_TYPE_ECDSA: "p256"}
+
+
+def generate_rsa_keypair(bits: int = 2048, randfunc=None) -> Tuple[str, str]:
+    """Génère une paire de clés RSA (private_pem, public_pem)
+
+    Fonction de module pour pouvoir être exécutée dans un pool de processus.
+    randfunc permet une génération déterministe (jeux de données de test).
+    """
+    key = RSA.generate(bits, randfunc=randfunc)
+    private_key = key.export_key().decode('utf-8')
+    public_key = key.publickey().export_key().decode('utf-8')
+    return private_key, public_key
+
+
+def generate_keypair(key_type: str = DEFAULT_KEY_TYPE, randfunc=None) -> Tuple[str, str]:
+    """Génère une paire de clés de portefeuille (private_pem, public_pem) du type demandé
+
+    Fonction de module pour pouvoir être exécutée dans un pool de processus.
+    """
+    if key_type == KEY_TYPE_RSA:
+        return generate_rsa_keypair(randfunc=randfunc)
+    if key_type not in _CURVES:
+        raise ValueError(f"Unknown key type: {key_type}")
+    options = {"randfunc": randfunc} if randfunc is not None else {}
+    key = ECC.generate(curve=_CURVES[key_type], **options)
+    return key.export_key(format="PEM"), key.public_key().export_key(format="PEM")
+
+
+def derive_address(public_key: str) -> str:
+    """Dérive l'adresse d'un participant à partir de sa clé publique"""
+    return SHA256.new(public_key.encode('utf-8')).hexdigest()[:40]
+
+
+class PrecomputedSHA256:
+    """Empreinte SHA-256 déjà calculée, signée ou vérifiée par pkcs1_15 sans rehachage
+
+    L'identifiant d'une transaction est le SHA-256 de son contenu canonique:
+    c'est cette empreinte qui est signée.
+    """
+    oid = SHA256.SHA256Hash.oid
+    digest_size = SHA256.digest_size
+
+    def __init__(self, hex_digest: str):
+        self._digest = binascii.unhexlify(hex_digest)
+
+    def digest(self) -> bytes:
+        return self._digest
+
+
+def _signer(private_key_pem: str) -> Callable[[str], bytes]:
+    """Fonction de signature d'un identifiant de transaction, selon le type de la clé privée
+
+    Les clés RSA sont exportées en PKCS#1 ("RSA PRIVATE KEY"), les clés
+    elliptiques en PKCS#8: l'en-tête suffit à distinguer les deux familles.
+    """
+    if "RSA PRIVATE KEY" in private_key_pem[:40]:
+        signer = pkcs1_15.new(RSA.import_key(private_key_pem))
+        return lambda transaction_id: signer.sign(PrecomputedSHA256(transaction_id))
+    key = ECC.import_key(private_key_pem)
+    if key.curve == "Ed25519":
+        signer = eddsa.new(key, "rfc8032")
+        return lambda transaction_id: signer.sign(binascii.unhexlify(transaction_id))
+    signer = DSS.new(key, "fips-186-3")
+    return lambda transaction_id: signer.sign(PrecomputedSHA256(transaction_id))
+
+
+def sign_transaction_id(transaction_id: str, private_key_pem: str) -> str:
+    """Signe l'identifiant d'une transaction (empreinte SHA-256 de son contenu canonique)
+
+    Fonction de module pour pouvoir être exécutée dans un pool de processus.
+    """
+    return binascii.hexlify(_signer(private_key_pem)(transaction_id)).decode('utf-8')
+
+
+def verify_transaction_id(transaction_id: str, signature: str, public_key_pem: str,
+                          key_type: str = DEFAULT_KEY_TYPE) -> bool:
+    """Vérifie la signature d'un identifiant de transaction avec une clé publique du type indiqué"""
+    try:
+        signature_bytes = binascii.unhexlify(signature)
+        if key_type == KEY_TYPE_RSA:
+            pkcs1_15.new(RSA.import_key(public_key_pem)).verify(PrecomputedSHA256(transaction_id), signature_bytes)
+        elif key_type == KEY_TYPE_ED25519:
+            eddsa.new(ECC.import_key(public_key_pem), "rfc8032").verify(
+                binascii.unhexlify(transaction_id), signature_bytes
+            )
+        elif key_type == KEY_TYPE_ECDSA:
+            DSS.new(ECC.import_key(public_key_pem), "fips-186-3").verify(
+                PrecomputedSHA256(transaction_id), signature_bytes
+            )
+        else:
+            return False
+        return True
+    except (ValueError, TypeError, binascii.Error):
+        return False
+
+
+def verify_participant_signature(transaction: Dict, participant: Optional[Dict]) -> Optional[bool]:
+    """Vérifie la signature d'une transaction avec la clé enregistrée de son émetteur
+
+    Le type de clé est celui enregistré par register_participant (RSA pour les
+    participants antérieurs aux clés elliptiques). None si la transaction n'est
+    pas signée ou si l'émetteur n'est pas un participant (transactions SYSTEM).
+    """
+    if not transaction.get("signature") or participant is None:
+        return None
+    return verify_transaction_id(
+        transaction["transaction_id"], transaction["signature"], participant["public_key"],
+        participant.get("key_type", DEFAULT_KEY_TYPE)
+    )
+
+
+def decrypt_message(encrypted_message_base64: str, private_key_pem: str) -> Optional[str]:
+    """Déchiffre un message RSA (PKCS1_OAEP avec SHA-256); None si le déchiffrement échoue
+
+    Fonction de module pour pouvoir être exécutée dans un pool de processus.
+    """
+    try:
+        cipher = PKCS1_OAEP.new(RSA.import_key(private_key_pem), hashAlgo=SHA256)
+        return cipher.decrypt(base64.b64decode(encrypted_message_base64)).decode('utf-8')
+    except Exception as e:
+        print(f"Error decrypting message: {e}")
+        return None
+
+
+def transaction_signer(private_key_pem: str) -> Callable[[str], str]:
+    """Fonction de signature réutilisable: la clé privée n'est importée qu'une fois"""
+    signer = _signer(private_key_pem)
+    return lambda transaction_id: binascii.hexlify(signer(transaction_id)).decode('utf-8')
+
+
+def sign_transactions(transaction_ids: List[str], private_key_pem: str) -> List[str]:
+    """Signe un lot d'identifiants de transactions avec une même clé privée (importée une seule fois)
+
+    Fonction de module pour pouvoir être exécutée dans un pool de processus.
+    """
+    signer = transaction_signer(private_key_pem)
+    return [signer(transaction_id) for transaction_id in transaction_ids]
+
+
+async def run_crypto(pipeline, operation: str, func: Callable, *args):
+    """Exécute une fonction de ce module dans la voie "crypto" du pool de processus
+
+    La durée du calcul est observée dans CRYPTO_LATENCY sous le libellé operation,
+    comme pour les méthodes de WalletManager exécutées dans le processus courant.
+    """
+    result, elapsed = await pipeline.run_in_process("crypto", measure, func, *args)
+    CRYPTO_LATENCY.observe(elapsed, operation=operation)
+    return result
+
 
 class WalletManager:
-    """Gère la création de portefeuilles et la cryptographie"""
+    """Gère la création de portefeuilles et la cryptographie
+
+    Les routes exécutent les opérations coûteuses dans le pool de processus
+    (run_crypto); les méthodes chronométrées servent aux appels dans le processus
+    courant (données synthétiques, benchmarks).
+    """
     
-    def __init__(self):
-        self.wallets = {}  # Stockage en mémoire pour la démo (address -> private_key)
-        self.encryption_keys = {}  # Stockage des clés de chiffrement (address -> {public_key, private_key})
+    def __init__(self, key_store: Optional[KeyStore] = None, default_key_type: str = DEFAULT_KEY_TYPE):
+        if default_key_type not in KEY_TYPES:
+            raise ValueError(f"Unknown key type: {default_key_type}")
+        self.key_store = key_store
+        self.default_key_type = default_key_type  # Type des portefeuilles créés sans type explicite
+        if key_store is None:
+            self.wallets = {}  # Stockage en mémoire pour la démo (address -> private_key)
+            self.encryption_keys = {}  # Stockage des clés de chiffrement (address -> {public_key, private_key})
+        else:
+            # Base chiffrée sur disque, clés chargées à la première utilisation
+            self.wallets = KeyStoreMapping(key_store, "wallet")
+            self.encryption_keys = KeyStoreMapping(key_store, "encryption")
     
-    def create_wallet(self, role: str, name: str, email: str):
-        """Crée une nouvelle paire de clés RSA"""
-        key = RSA.generate(2048)
-        private_key = key.export_key().decode('utf-8')
-        public_key = key.publickey().export_key().decode('utf-8')
-        
+    def is_persistent(self) -> bool:
+        """Les clés sont-elles conservées sur disque (base chiffrée)"""
+        return self.key_store is not None
+    
+    def close(self):
+        if self.key_store is not None:
+            self.key_store.close()
+    
+    @timed(CRYPTO_LATENCY, operation="keygen")
+    def create_wallet(self, role: str, name: str, email: str, key_type: str = None):
+        """Crée une nouvelle paire de clés (RSA par défaut, ou Ed25519/ECDSA)"""
+        key_type = key_type or self.default_key_type
+        private_key, public_key = generate_keypair(key_type)
+        return self.store_wallet(private_key, public_key, role, name, email, key_type=key_type)
+    
+    def store_wallet(self, private_key: str, public_key: str, role: str, name: str, email: str,
+                     address: str = None, key_type: str = DEFAULT_KEY_TYPE):
+        """Enregistre un portefeuille à partir d'une paire de clés déjà générée"""
         # L'adresse est dérivée de la clé publique (simplification)
-        address = SHA256.new(public_key.encode('utf-8')).hexdigest()[:40]
+        if address is None:
+            address = derive_address(public_key)
         
         wallet_data = {
             "address": address,
@@ -28,7 +216,8 @@ class WalletManager:
             "private_key": private_key,
             "role": role,
             "name": name,
-            "email": email
+            "email": email,
+            "key_type": key_type
         }
         
         self.wallets[address] = wallet_data
@@ -38,6 +227,7 @@ class WalletManager:
         """Récupère un portefeuille par son adresse"""
         return self.wallets.get(address)
     
+    @timed(CRYPTO_LATENCY, operation="sign")
     def sign_transaction(self, transaction_dict: dict, private_key_pem: str) -> str:
         """Signe une transaction avec la clé privée"""
         try:
@@ -45,35 +235,44 @@ class WalletManager:
             tx_string = json.dumps(transaction_dict, sort_keys=True)
             h = SHA256.new(tx_string.encode('utf-8'))
             
-            # Signer le hash
-            key = RSA.import_key(private_key_pem)
-            signature = pkcs1_15.new(key).sign(h)
-            
-            return binascii.hexlify(signature).decode('utf-8')
+            # Signer le hash (selon le type de la clé privée)
+            return sign_transaction_id(h.hexdigest(), private_key_pem)
         except Exception as e:
             print(f"Error signing transaction: {e}")
             return None
     
-    def verify_signature(self, transaction_dict: dict, signature: str, public_key_pem: str) -> bool:
-        """Vérifie la signature d'une transaction"""
+    @timed(CRYPTO_LATENCY, operation="sign")
+    def sign_transaction_id(self, transaction_id: str, private_key_pem: str) -> str:
+        """Signe une transaction via son identifiant (empreinte SHA-256 de son contenu canonique)"""
         try:
-            # Créer le hash de la transaction
-            tx_string = json.dumps(transaction_dict, sort_keys=True)
-            h = SHA256.new(tx_string.encode('utf-8'))
-            
-            # Vérifier la signature
-            key = RSA.import_key(public_key_pem)
-            pkcs1_15.new(key).verify(h, binascii.unhexlify(signature))
-            return True
-        except (ValueError, TypeError):
-            return False
+            return sign_transaction_id(transaction_id, private_key_pem)
+        except Exception as e:
+            print(f"Error signing transaction: {e}")
+            return None
     
+    @timed(CRYPTO_LATENCY, operation="verify")
+    def verify_transaction_id(self, transaction_id: str, signature: str, public_key_pem: str,
+                              key_type: str = DEFAULT_KEY_TYPE) -> bool:
+        """Vérifie la signature d'un identifiant de transaction (recalculé par l'appelant)"""
+        return verify_transaction_id(transaction_id, signature, public_key_pem, key_type)
+    
+    @timed(CRYPTO_LATENCY, operation="verify")
+    def verify_signature(self, transaction_dict: dict, signature: str, public_key_pem: str,
+                         key_type: str = DEFAULT_KEY_TYPE) -> bool:
+        """Vérifie la signature d'une transaction"""
+        # Créer le hash de la transaction
+        tx_string = json.dumps(transaction_dict, sort_keys=True)
+        h = SHA256.new(tx_string.encode('utf-8'))
+        return verify_transaction_id(h.hexdigest(), signature, public_key_pem, key_type)
+    
+    @timed(CRYPTO_LATENCY, operation="keygen")
     def generate_encryption_keypair(self, teacher_address: str) -> dict:
         """Génère une paire de clés RSA pour le chiffrement/déchiffrement des soumissions"""
-        key = RSA.generate(2048)
-        private_key = key.export_key().decode('utf-8')
-        public_key = key.publickey().export_key().decode('utf-8')
-        
+        private_key, public_key = generate_rsa_keypair()
+        return self.store_encryption_keypair(teacher_address, private_key, public_key)
+    
+    def store_encryption_keypair(self, teacher_address: str, private_key: str, public_key: str) -> dict:
+        """Enregistre une paire de clés de chiffrement déjà générée"""
         keypair = {
             "public_key": public_key,
             "private_key": private_key,
@@ -87,6 +286,7 @@ class WalletManager:
         """Récupère les clés de chiffrement d'un enseignant"""
         return self.encryption_keys.get(teacher_address)
     
+    @timed(CRYPTO_LATENCY, operation="encrypt")
     def encrypt_with_public_key(self, message: str, public_key_pem: str) -> str:
         """Chiffre un message avec une clé publique RSA (PKCS1_OAEP avec SHA-256)"""
         try:
@@ -104,20 +304,8 @@ class WalletManager:
             print(f"Error encrypting message: {e}")
             return None
     
+    @timed(CRYPTO_LATENCY, operation="decrypt")
     def decrypt_with_private_key(self, encrypted_message_base64: str, private_key_pem: str) -> str:
         """Déchiffre un message avec une clé privée RSA (PKCS1_OAEP avec SHA-256)"""
-        try:
-            key = RSA.import_key(private_key_pem)
-            # Utiliser explicitement SHA-256 pour OAEP
-            cipher = PKCS1_OAEP.new(key, hashAlgo=SHA256)
-            
-            # Décoder base64
-            encrypted_bytes = base64.b64decode(encrypted_message_base64)
-            
-            # Déchiffrer le message
-            decrypted_bytes = cipher.decrypt(encrypted_bytes)
-            return decrypted_bytes.decode('utf-8')
-        except Exception as e:
-            print(f"Error decrypting message: {e}")
-            return None
+        return decrypt_message(encrypted_message_base64, private_key_pem)
 
@@ -0,0 +1,182 @@
+"""
+Diffusion des événements de la blockchain (nouveaux blocs, transactions en attente)
+"""
+import asyncio
+import json
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+class Subscriber:
+    """Abonné au flux d'événements, avec ses filtres et sa file bornée"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int,
+                 address: Optional[str] = None, transaction_type: Optional[str] = None,
+                 assignment_id: Optional[str] = None):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.address = address
+        self.transaction_type = transaction_type
+        self.assignment_id = assignment_id
+        self.dropped = False
+
+    def matches(self, tx: Dict) -> bool:
+        """Vérifie si une transaction correspond aux filtres de l'abonné"""
+        if self.transaction_type is not None and tx["type"] != self.transaction_type:
+            return False
+
+        if self.assignment_id is not None:
+            if (tx["transaction_id"] != self.assignment_id and
+                    tx["data"].get("assignment_id") != self.assignment_id):
+                return False
+
+        if self.address is not None:
+            if (tx["sender"] != self.address and
+                    tx["receiver"] not in (self.address, "ALL") and
+                    self.address not in tx["data"].get("recipients", ())):
+                return False
+
+        return True
+
+    def push(self, event: Dict):
+        """Ajoute un événement à la file; un abonné trop lent est déconnecté"""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+
+
+class EventBroker:
+    """Distribue les événements émis par la Blockchain aux abonnés SSE
+
+    publish s'exécute dans append_block: les abonnés filtrés par adresse sont
+    indexés par adresse, et chaque transaction n'est confrontée qu'aux abonnés
+    qu'elle peut concerner (sauf diffusion à "ALL").
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.subscribers: List[Subscriber] = []
+        self.by_address: Dict[str, List[Subscriber]] = {}  # Abonnés filtrés par adresse
+        self.unaddressed: List[Subscriber] = []  # Abonnés sans filtre d'adresse
+        self.dropped_count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, address: Optional[str] = None, transaction_type: Optional[str] = None,
+                  assignment_id: Optional[str] = None) -> Subscriber:
+        """Crée un abonné (à appeler depuis la boucle d'événements)"""
+        subscriber = Subscriber(
+            asyncio.get_running_loop(), self.queue_size,
+            address, transaction_type, assignment_id
+        )
+        with self._lock:
+            self.subscribers.append(subscriber)
+            if address is None:
+                self.unaddressed.append(subscriber)
+            else:
+                self.by_address.setdefault(address, []).append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Retire un abonné"""
+        with self._lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+                if subscriber.address is None:
+                    self.unaddressed.remove(subscriber)
+                else:
+                    subscribers = self.by_address[subscriber.address]
+                    subscribers.remove(subscriber)
+                    if not subscribers:
+                        del self.by_address[subscriber.address]
+                if subscriber.dropped:
+                    self.dropped_count += 1
+
+    def publish(self, event_type: str, payload):
+        """Écouteur branché sur Blockchain: reçoit les blocs et les transactions en attente"""
+        with self._lock:
+            subscribers = list(self.subscribers)
+            unaddressed = list(self.unaddressed)
+            by_address = {address: list(group) for address, group in self.by_address.items()}
+        if not subscribers:
+            return
+
+        def candidates(tx: Dict) -> Iterable[Subscriber]:
+            """Abonnés que la transaction peut concerner (à confirmer par matches)"""
+            if tx["receiver"] == "ALL":
+                return subscribers
+            addresses = {tx["sender"], tx["receiver"], *tx["data"].get("recipients", ())}
+            found = list(unaddressed)
+            for address in addresses:
+                found.extend(by_address.get(address, ()))
+            return found
+
+        if event_type == "block":
+            block = payload
+            header = {
+                "event": "block",
+                "data": {
+                    "index": block.index,
+                    "hash": block.hash,
+                    "previous_hash": block.previous_hash,
+                    "timestamp": block.timestamp,
+                    "transactions_count": len(block.transactions)
+                }
+            }
+            # Une copie par transaction, partagée par les abonnés (événements en lecture seule)
+            matched: Dict[Subscriber, List[Dict]] = {}
+            for tx in block.transactions:
+                event = None
+                for subscriber in candidates(tx):
+                    if subscriber.matches(tx):
+                        if event is None:
+                            event = {"event": "transaction", "data": dict(tx, block_index=block.index)}
+                        matched.setdefault(subscriber, [header]).append(event)
+            for subscriber in subscribers:
+                self._deliver(subscriber, matched.get(subscriber, [header]))
+
+        elif event_type == "pending_transaction":
+            event = {"event": "pending_transaction", "data": payload}
+            for subscriber in candidates(payload):
+                if subscriber.matches(payload):
+                    self._deliver(subscriber, [event])
+
+    @staticmethod
+    def _deliver(subscriber: Subscriber, events: List[Dict]):
+        """Dépose les événements dans la file de l'abonné, depuis n'importe quel thread"""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is subscriber.loop:
+            for event in events:
+                subscriber.push(event)
+        else:
+            for event in events:
+                subscriber.loop.call_soon_threadsafe(subscriber.push, event)
+
+    async def stream(self, subscriber: Subscriber, keepalive: float = 15.0):
+        """Générateur SSE pour un abonné; se termine si l'abonné est déconnecté"""
+        try:
+            yield ": connected\n\n"
+            while not subscriber.dropped:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+            yield "event: dropped\ndata: {\"reason\": \"slow consumer\"}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def get_stats(self) -> Dict:
+        """Retourne les statistiques du flux"""
+        return {
+            "subscribers": len(self.subscribers),
+            "dropped": self.dropped_count
+        }
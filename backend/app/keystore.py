@@ -0,0 +1,231 @@
+"""
+Stockage persistant des clés privées, chiffrées au repos
+
+Les portefeuilles et les clés de chiffrement des enseignants sont rangés dans
+une base SQLite indexée par (type, adresse). Seule la clé privée est chiffrée
+(AES-256-GCM, l'adresse et le type en données associées: une ligne copiée sur
+une autre adresse ne se déchiffre pas); les champs publics restent en clair.
+
+La clé de chiffrement est dérivée d'une clé maîtresse (KEY_STORE_MASTER_KEY)
+par scrypt, avec un sel propre à chaque base. Les clés ne sont lues et
+déchiffrées qu'à leur première utilisation, puis gardées dans un cache LRU
+borné: la mémoire suit le nombre d'utilisateurs actifs, pas le nombre
+d'inscrits.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, Optional
+
+from Crypto.Cipher import AES
+from Crypto.Protocol.KDF import scrypt
+from Crypto.Random import get_random_bytes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keys (
+    kind TEXT NOT NULL,
+    address TEXT NOT NULL,
+    public TEXT NOT NULL,
+    nonce BLOB NOT NULL,
+    ciphertext BLOB NOT NULL,
+    tag BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (kind, address)
+);
+"""
+
+SECRET_FIELD = "private_key"
+CHECK_VALUE = b"key-store-check"
+SCRYPT_COST = 2 ** 14
+
+
+class InvalidMasterKey(Exception):
+    """La clé maîtresse ne correspond pas à celle qui a chiffré la base"""
+
+
+class KeyStore:
+    """Base des clés privées chiffrées, avec cache des clés déchiffrées"""
+
+    def __init__(self, path: str, master_key: str, cache_size: int = 1024):
+        if not master_key:
+            raise ValueError("A master key is required to open the key store")
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._key = self._derive_key(master_key.encode("utf-8"))
+
+    def _derive_key(self, master_key: bytes) -> bytes:
+        """Dérive la clé AES de la base; vérifie la clé maîtresse sur une valeur témoin"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'kdf'").fetchone()
+        if row is None:
+            salt = get_random_bytes(16)
+            key = scrypt(master_key, salt, 32, N=SCRYPT_COST, r=8, p=1)
+            nonce, ciphertext, tag = _encrypt(key, CHECK_VALUE, b"check")
+            meta = {"salt": salt.hex(), "nonce": nonce.hex(), "check": ciphertext.hex(), "tag": tag.hex()}
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('kdf', ?)", (json.dumps(meta),))
+            return key
+
+        meta = json.loads(row[0])
+        key = scrypt(master_key, bytes.fromhex(meta["salt"]), 32, N=SCRYPT_COST, r=8, p=1)
+        try:
+            _decrypt(key, bytes.fromhex(meta["nonce"]), bytes.fromhex(meta["check"]),
+                     bytes.fromhex(meta["tag"]), b"check")
+        except ValueError:
+            raise InvalidMasterKey(f"Master key does not match the key store {self.path}")
+        return key
+
+    # --- Lecture et écriture ---
+
+    def put(self, kind: str, address: str, record: Dict):
+        """Enregistre (ou remplace) une entrée; record contient la clé privée en clair"""
+        public = {field: value for field, value in record.items() if field != SECRET_FIELD}
+        nonce, ciphertext, tag = _encrypt(
+            self._key, record[SECRET_FIELD].encode("utf-8"), _associated_data(kind, address)
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO keys (kind, address, public, nonce, ciphertext, tag, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, address, json.dumps(public), nonce, ciphertext, tag, time.time())
+            )
+            self._remember((kind, address), dict(record))
+
+    def get(self, kind: str, address: str) -> Optional[Dict]:
+        """Entrée déchiffrée (copie), lue sur disque au premier accès"""
+        cache_key = (kind, address)
+        with self._lock:
+            record = self._cache.get(cache_key)
+            if record is not None:
+                self._cache.move_to_end(cache_key)
+                self.hits += 1
+                return dict(record)
+
+            self.misses += 1
+            row = self._conn.execute(
+                "SELECT public, nonce, ciphertext, tag FROM keys WHERE kind = ? AND address = ?",
+                (kind, address)
+            ).fetchone()
+            if row is None:
+                return None
+            record = json.loads(row[0])
+            record[SECRET_FIELD] = _decrypt(
+                self._key, row[1], row[2], row[3], _associated_data(kind, address)
+            ).decode("utf-8")
+            self._remember(cache_key, record)
+            return dict(record)
+
+    def contains(self, kind: str, address: str) -> bool:
+        with self._lock:
+            if (kind, address) in self._cache:
+                return True
+            return self._conn.execute(
+                "SELECT 1 FROM keys WHERE kind = ? AND address = ?", (kind, address)
+            ).fetchone() is not None
+
+    def delete(self, kind: str, address: str) -> bool:
+        with self._lock:
+            self._cache.pop((kind, address), None)
+            cursor = self._conn.execute("DELETE FROM keys WHERE kind = ? AND address = ?", (kind, address))
+            return cursor.rowcount > 0
+
+    def addresses(self, kind: str) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT address FROM keys WHERE kind = ? ORDER BY address", (kind,)).fetchall()
+        return (row[0] for row in rows)
+
+    def count(self, kind: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM keys WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def _remember(self, cache_key: tuple, record: Dict):
+        self._cache[cache_key] = record
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        """Taille de la base et efficacité du cache"""
+        with self._lock:
+            entries = dict(self._conn.execute("SELECT kind, COUNT(*) FROM keys GROUP BY kind").fetchall())
+            return {
+                "path": self.path,
+                "entries": entries,
+                "cached": len(self._cache),
+                "cache_size": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def close(self):
+        with self._lock:
+            self._cache.clear()
+            self._conn.close()
+
+
+class KeyStoreMapping(MutableMapping):
+    """Vue dictionnaire (adresse -> entrée) d'un type de clés de la base
+
+    Remplace les dictionnaires en mémoire de WalletManager sans changer leurs appelants.
+    """
+
+    def __init__(self, store: KeyStore, kind: str):
+        self.store = store
+        self.kind = kind
+
+    def __getitem__(self, address: str) -> Dict:
+        record = self.store.get(self.kind, address)
+        if record is None:
+            raise KeyError(address)
+        return record
+
+    def __setitem__(self, address: str, record: Dict):
+        self.store.put(self.kind, address, record)
+
+    def __delitem__(self, address: str):
+        if not self.store.delete(self.kind, address):
+            raise KeyError(address)
+
+    def __contains__(self, address) -> bool:
+        return self.store.contains(self.kind, address)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.store.addresses(self.kind)
+
+    def __len__(self) -> int:
+        return self.store.count(self.kind)
+
+
+def _associated_data(kind: str, address: str) -> bytes:
+    return f"{kind}:{address}".encode("utf-8")
+
+
+def _encrypt(key: bytes, plaintext: bytes, associated_data: bytes):
+    cipher = AES.new(key, AES.MODE_GCM)
+    cipher.update(associated_data)
+    ciphertext, tag = cipher.encrypt_and_digest(plaintext)
+    return cipher.nonce, ciphertext, tag
+
+
+def _decrypt(key: bytes, nonce: bytes, ciphertext: bytes, tag: bytes, associated_data: bytes) -> bytes:
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(associated_data)
+    return cipher.decrypt_and_verify(ciphertext, tag)
@@ -1,31 +1,269 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import os
+import threading
+import time
+
+from fastapi import Depends, FastAPI, Path, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from app.audit import DEFAULT_CHUNK_SIZE, AuditAlreadyRunning, AuditJobs, audit_blockchain
+from app.blockchain import Blockchain, make_genesis_block
+from app.bootstrap import load_bootstrap, read_bootstrap_file, start_backfill
+from app.crypto import DEFAULT_KEY_TYPE, WalletManager
+from app.keystore import KeyStore
+from app.pipeline import ExecutionPipeline, PipelineError
+from app import metrics
+from app.profiling import Profiler
+from app.querystore import QueryStore
+from app.ratelimit import RateLimited, RateLimiter, parse_rules
+from app.tenants import DEFAULT_TENANT, Tenant, TenantNotFound, TenantRegistry
+from app.routers import admin, blockchain, student, teacher
 
-from app.blockchain import Blockchain
-from app.crypto import WalletManager
-from app.routers import blockchain, student, teacher
+DEFAULT_DIFFICULTY = 4
 
 # État global de l'application
 class AppState:
+    """Objets partagés de l'application, construits à la première utilisation"""
+
     def __init__(self):
-        self.blockchain = Blockchain()
-        self.wallet_manager = WalletManager()
+        self.default_tenant = None  # Construit depuis la configuration (amorçage, genesis, élagage)
+        self.tenants = TenantRegistry(
+            os.environ.get("TENANT_DATA_DIR"),
+            self._create_tenant_blockchain,
+            max_loaded=int(os.environ.get("TENANT_MAX_LOADED", 32)),
+            idle_seconds=float(os.environ.get("TENANT_IDLE_SECONDS", 600)),
+            create_wallet_manager=self._create_wallet_manager,
+            create_query_store=self._create_query_store
+        )
+        self.rate_limiter = RateLimiter(parse_rules(os.environ.get("RATE_LIMITS", "")))
+        self.process_pool = None  # Créé à la première opération parallèle (génération de clés)
+        self.profiler = None
+        self.pipeline = None
+        self.audits = AuditJobs()
+        self.bootstrap_error = None  # Snapshot d'amorçage démenti par les corps de blocs vérifiés
+        self._lock = threading.Lock()
+
+    def _blockchain_options(self, tenant_id: str):
+        # Élagage et compression; archive dans un sous-répertoire par tenant (hors tenant par défaut)
+        retention = os.environ.get("PRUNE_RETENTION_BLOCKS")
+        archive_dir = os.environ.get("PRUNE_ARCHIVE_DIR")
+        if archive_dir and tenant_id != DEFAULT_TENANT:
+            archive_dir = os.path.join(archive_dir, tenant_id)
+        return {
+            "retention_blocks": int(retention) if retention else None,
+            "archive_dir": archive_dir,
+            "block_codec": os.environ.get("BLOCK_COMPRESSION") or None  # zlib ou zstd
+        }
+
+    def _create_tenant_blockchain(self, tenant_id: str):
+        # Tenants créés par l'API: genesis par défaut, mêmes options que le tenant par défaut
+        return Blockchain(difficulty=DEFAULT_DIFFICULTY, **self._blockchain_options(tenant_id))
+
+    def _create_query_store(self, tenant_id: str):
+        # Miroir SQLite (QUERY_STORE_PATH), un fichier par tenant: query.db -> query.<tenant>.db
+        store_path = os.environ.get("QUERY_STORE_PATH")
+        if not store_path:
+            return None
+        if tenant_id != DEFAULT_TENANT:
+            root, extension = os.path.splitext(store_path)
+            store_path = f"{root}.{tenant_id}{extension}"
+        return QueryStore(store_path)
+
+    def _create_blockchain(self):
+        blockchain_options = self._blockchain_options(DEFAULT_TENANT)
+
+        # Amorçage depuis un snapshot (BOOTSTRAP_FILE), corps des blocs vérifiés en arrière-plan.
+        # Le snapshot doit être ancré: empreinte de confiance et/ou corps des blocs à rejouer
+        bootstrap_file = os.environ.get("BOOTSTRAP_FILE")
+        if bootstrap_file:
+            trusted_state_digest = os.environ.get("BOOTSTRAP_TRUSTED_STATE_DIGEST")
+            bodies = os.environ.get("BOOTSTRAP_BODIES")
+            if not trusted_state_digest and not bodies:
+                raise ValueError("BOOTSTRAP_FILE requires BOOTSTRAP_TRUSTED_STATE_DIGEST or BOOTSTRAP_BODIES")
+            bundle = read_bootstrap_file(bootstrap_file)
+            blockchain = load_bootstrap(
+                bundle,
+                trusted_hash=os.environ.get("BOOTSTRAP_TRUSTED_HASH"),
+                trusted_state_digest=trusted_state_digest,
+                **blockchain_options
+            )
+            if bodies:
+                start_backfill(blockchain, bodies, bundle["snapshot"], on_failure=self._bootstrap_failed)
+            return blockchain
+
+        # Genesis configurable (GENESIS_FILE: {"timestamp": ..., "nonce": ...}), sinon genesis par défaut
+        genesis_file = os.environ.get("GENESIS_FILE")
+        if genesis_file:
+            with open(genesis_file) as f:
+                genesis = json.load(f)
+            blockchain_options["genesis_block"] = make_genesis_block(
+                DEFAULT_DIFFICULTY, genesis["timestamp"], genesis.get("nonce")
+            )
+        return Blockchain(difficulty=DEFAULT_DIFFICULTY, **blockchain_options)
+
+    def _create_wallet_manager(self, tenant_id: str):
+        # Type des nouveaux portefeuilles sans type explicite (WALLET_KEY_TYPE: RSA, ED25519 ou ECDSA)
+        key_type = os.environ.get("WALLET_KEY_TYPE", DEFAULT_KEY_TYPE).upper()
+        # Base de clés chiffrée par tenant (KEY_STORE_DIR), sinon portefeuilles en mémoire
+        key_store_dir = os.environ.get("KEY_STORE_DIR")
+        if not key_store_dir:
+            return WalletManager(default_key_type=key_type)
+        return WalletManager(KeyStore(
+            os.path.join(key_store_dir, f"{tenant_id}.keys.db"),
+            os.environ.get("KEY_STORE_MASTER_KEY", ""),
+            cache_size=int(os.environ.get("KEY_CACHE_SIZE", 1024))
+        ), default_key_type=key_type)
+
+    def _bootstrap_failed(self, error: Exception):
+        self.bootstrap_error = str(error)
+
+    def is_ready(self):
+        return self.default_tenant is not None and self.bootstrap_error is None
+
+    def get_default_tenant(self):
+        if self.default_tenant is None:
+            with self._lock:
+                if self.default_tenant is None:
+                    blockchain = self._create_blockchain()
+                    
+                    query_store = self._create_query_store(DEFAULT_TENANT)
+                    if query_store is not None:
+                        print(f"Query store {query_store.path}: {query_store.sync(blockchain)}")
+                    
+                    tenant = Tenant(DEFAULT_TENANT, blockchain, self._create_wallet_manager(DEFAULT_TENANT), query_store)
+                    self.tenants.add(tenant, pinned=True)
+                    self.default_tenant = tenant
+        return self.default_tenant
 
     def get_blockchain(self):
-        return self.blockchain
+        """Chaîne du tenant par défaut"""
+        return self.get_default_tenant().blockchain
+
+    def get_tenant(self, request: Request):
+        """Tenant de la requête (paramètre de chemin tenant_id, sinon tenant par défaut)"""
+        tenant_id = request.path_params.get("tenant_id", DEFAULT_TENANT)
+        if tenant_id == DEFAULT_TENANT:
+            return self.get_default_tenant()
+        return self.tenants.get(tenant_id)
+
+    def get_tenants(self):
+        return self.tenants
+
+    def acquire_tenant(self, tenant_id: str):
+        """Charge un tenant et empêche son éviction jusqu'à release_tenant (le tenant par défaut l'est toujours)"""
+        if tenant_id == DEFAULT_TENANT:
+            return self.get_default_tenant()
+        return self.tenants.acquire(tenant_id)
+
+    def release_tenant(self, tenant):
+        if tenant.tenant_id != DEFAULT_TENANT:
+            self.tenants.release(tenant)
 
-    def get_wallet_manager(self):
-        return self.wallet_manager
+    def get_rate_limiter(self):
+        return self.rate_limiter
+
+    def get_process_pool(self):
+        if self.process_pool is None:
+            with self._lock:
+                if self.process_pool is None:
+                    initializer, initargs = self.get_profiler().worker_initializer()
+                    self.process_pool = ProcessPoolExecutor(initializer=initializer, initargs=initargs)
+        return self.process_pool
+
+    def get_pipeline(self):
+        if self.pipeline is None:
+            with self._lock:
+                if self.pipeline is None:
+                    cpu_concurrency = os.environ.get("HEAVY_CONCURRENCY")
+                    self.pipeline = ExecutionPipeline(
+                        self.get_process_pool,
+                        cpu_concurrency=int(cpu_concurrency) if cpu_concurrency else None,
+                        scan_threads=int(os.environ.get("SCAN_THREADS", 4)),
+                        queue_limit=int(os.environ.get("HEAVY_QUEUE_LIMIT", 64)),
+                        timeout=float(os.environ.get("REQUEST_TIMEOUT", 30)),
+                        mining_timeout=float(os.environ.get("MINING_TIMEOUT", 120)),
+                        mining_concurrency=int(os.environ.get("MINING_CONCURRENCY", 1)),
+                        audit_concurrency=int(os.environ.get("AUDIT_CONCURRENCY", 0)) or None
+                    )
+        return self.pipeline
+
+    def get_audits(self):
+        return self.audits
+
+    async def audit_tenant(self, tenant_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Audit d'intégrité d'un tenant, gardé en mémoire (non évinçable) pendant l'audit"""
+        tenant = await asyncio.to_thread(self.acquire_tenant, tenant_id)
+        try:
+            pipeline = self.get_pipeline()
+            report = await audit_blockchain(
+                tenant.blockchain,
+                lambda func, *args: pipeline.run_in_process("audit", func, *args),
+                pipeline.scan,
+                pipeline.lanes["audit"].concurrency,
+                chunk_size
+            )
+        finally:
+            self.release_tenant(tenant)
+        metrics.AUDIT_ERRORS.set(report["error_count"], tenant=tenant_id)
+        metrics.AUDIT_DURATION.observe(report["timings"]["total_seconds"], tenant=tenant_id)
+        if not report["valid"]:
+            print(f"Integrity audit of {tenant_id}: {report['error_count']} errors, "
+                  f"first bad height {report['first_bad_height']}")
+        return report
+
+    def get_profiler(self):
+        if self.profiler is None:
+            self.profiler = Profiler()
+        return self.profiler
+
+    def shutdown(self):
+        self.audits.cancel()
+        if self.pipeline is not None:
+            self.pipeline.shutdown()
+        self.tenants.shutdown()
+        if self.process_pool is not None:
+            self.process_pool.shutdown(cancel_futures=True)
+
+async def evict_idle_tenants(state: AppState):
+    """Sauvegarde et retire de la mémoire les tenants inactifs, périodiquement"""
+    interval = float(os.environ.get("TENANT_SWEEP_SECONDS", 60))
+    while True:
+        await asyncio.sleep(interval)
+        evicted = await asyncio.to_thread(state.tenants.evict_idle)
+        if evicted:
+            print(f"Evicted idle tenants: {', '.join(evicted)}")
+
+async def run_scheduled_audits(state: AppState, interval: float):
+    """Audit d'intégrité périodique du tenant par défaut (AUDIT_INTERVAL_SECONDS)"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            state.audits.start(DEFAULT_TENANT, lambda: state.audit_tenant(DEFAULT_TENANT))
+        except AuditAlreadyRunning:
+            pass
 
 # Initialisation au démarrage
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Initialiser la blockchain et le wallet manager
+    # Construire la blockchain en arrière-plan: le serveur répond dès maintenant (/health),
+    # /ready passe à 200 une fois la chaîne chargée
     app.state = AppState()
+    warmup = asyncio.create_task(asyncio.to_thread(app.state.get_blockchain))
+    sweeper = asyncio.create_task(evict_idle_tenants(app.state))
+    audit_interval = os.environ.get("AUDIT_INTERVAL_SECONDS")
+    auditor = asyncio.create_task(run_scheduled_audits(app.state, float(audit_interval))) if audit_interval else None
     print("Blockchain system initialized")
     yield
-    # Nettoyage à l'arrêt (si nécessaire)
+    # Nettoyage à l'arrêt
+    warmup.cancel()
+    sweeper.cancel()
+    if auditor is not None:
+        auditor.cancel()
+    app.state.shutdown()
     print("Shutting down blockchain system")
 
 app = FastAPI(
@@ -50,10 +288,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Inclusion des routeurs
+@app.middleware("http")
+async def record_http_latency(request: Request, call_next):
+    """Mesure la latence de chaque requête, par route (gabarit de chemin)"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.HTTP_LATENCY.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code
+    )
+    return response
+
+@app.exception_handler(PipelineError)
+async def pipeline_error_handler(request: Request, exc: PipelineError):
+    """File d'attente pleine (503) ou délai dépassé (504) sur une opération lourde"""
+    headers = {"Retry-After": "1"} if exc.status_code == 503 else None
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers=headers)
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    """Seau à jetons vide pour cette adresse et cette classe de route"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+    )
+
+@app.exception_handler(TenantNotFound)
+async def tenant_not_found_handler(request: Request, exc: TenantNotFound):
+    return JSONResponse(status_code=404, content={"detail": str(exc)})
+
+def use_tenant(request: Request, tenant_id: str = Path(...)):
+    """Dépendance des routes d'un tenant: le charge si besoin et empêche son éviction pendant la requête"""
+    state = request.app.state
+    tenant = state.acquire_tenant(tenant_id)
+    try:
+        yield
+    finally:
+        state.release_tenant(tenant)
+
+# Inclusion des routeurs (tenant par défaut, puis les mêmes routes par tenant)
 app.include_router(blockchain.router, prefix="/api/blockchain", tags=["Blockchain"])
 app.include_router(student.router, prefix="/api/student", tags=["Student"])
 app.include_router(teacher.router, prefix="/api/teacher", tags=["Teacher"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
+
+for router, name, tag in ((blockchain.router, "blockchain", "Blockchain"),
+                          (student.router, "student", "Student"),
+                          (teacher.router, "teacher", "Teacher")):
+    app.include_router(router, prefix=f"/api/tenants/{{tenant_id}}/{name}", tags=[tag],
+                       dependencies=[Depends(use_tenant)])
 
 @app.get("/")
 async def root():
@@ -62,3 +349,30 @@ async def root():
         "status": "running",
         "docs": "/docs"
     }
+
+@app.get("/health")
+async def health():
+    """Sonde de vie: répond dès le démarrage du serveur"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready(request: Request):
+    """Sonde de disponibilité: 503 tant que la blockchain n'est pas chargée, ou si l'amorçage a échoué"""
+    if request.app.state.bootstrap_error is not None:
+        return JSONResponse(status_code=503, content={"status": "failed", "detail": request.app.state.bootstrap_error})
+    if not request.app.state.is_ready():
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request):
+    """Métriques au format d'exposition Prometheus (jauges de chaîne par tenant chargé)"""
+    for gauge in (metrics.CHAIN_HEIGHT, metrics.MEMPOOL_DEPTH, metrics.MEMPOOL_AGE):
+        gauge.clear()  # Les tenants évincés disparaissent de l'exposition
+    now = time.time()
+    for tenant in request.app.state.get_tenants().loaded():
+        pending = tenant.blockchain.pending_transactions
+        metrics.CHAIN_HEIGHT.set(len(tenant.blockchain.chain), tenant=tenant.tenant_id)
+        metrics.MEMPOOL_DEPTH.set(len(pending), tenant=tenant.tenant_id)
+        metrics.MEMPOOL_AGE.set(now - pending[0].timestamp if pending else 0, tenant=tenant.tenant_id)
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
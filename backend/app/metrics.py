@@ -0,0 +1,220 @@
+"""
+Métriques au format d'exposition Prometheus (compteurs, jauges, histogrammes)
+
+Registre en mémoire, sans dépendance externe, servi par la route /metrics.
+"""
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# Bornes par défaut (secondes), de la microseconde pour les index à la dizaine de secondes pour le minage
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """Base commune: nom, description et valeurs par combinaison de labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    """Compteur monotone"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Valeur instantanée"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def clear(self):
+        """Oublie toutes les combinaisons de labels (avant de les recalculer)"""
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Metric):
+    """Distribution de valeurs par intervalles cumulés"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Ensemble des métriques exposées"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Métriques du moteur ---
+
+MINING_DURATION = REGISTRY.histogram(
+    "blockchain_mining_duration_seconds", "Durée de la preuve de travail par bloc")
+MINING_HASHES = REGISTRY.histogram(
+    "blockchain_mining_hash_attempts", "Nombre de hachages essayés par bloc miné",
+    buckets=(1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000))
+BLOCK_TRANSACTIONS = REGISTRY.histogram(
+    "blockchain_block_transactions", "Nombre de transactions par bloc miné",
+    buckets=(1, 5, 10, 50, 100, 500, 1_000, 5_000))
+BLOCKS_MINED = REGISTRY.counter("blockchain_blocks_mined_total", "Blocs minés")
+CHAIN_HEIGHT = REGISTRY.gauge("blockchain_height", "Nombre de blocs dans la chaîne", ["tenant"])
+MEMPOOL_DEPTH = REGISTRY.gauge(
+    "blockchain_mempool_transactions", "Transactions en attente de minage", ["tenant"])
+MEMPOOL_AGE = REGISTRY.gauge(
+    "blockchain_mempool_oldest_age_seconds", "Âge de la plus ancienne transaction en attente", ["tenant"])
+QUERY_LATENCY = REGISTRY.histogram(
+    "blockchain_query_duration_seconds", "Durée des requêtes sur la chaîne", ["method"])
+AUDIT_ERRORS = REGISTRY.gauge(
+    "blockchain_audit_errors", "Erreurs relevées par le dernier audit d'intégrité", ["tenant"])
+AUDIT_DURATION = REGISTRY.histogram(
+    "blockchain_audit_duration_seconds", "Durée d'un audit d'intégrité complet", ["tenant"],
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0))
+
+# --- Cryptographie ---
+
+CRYPTO_LATENCY = REGISTRY.histogram(
+    "crypto_operation_duration_seconds", "Durée des opérations cryptographiques (clés, signatures, chiffrement)",
+    ["operation"])
+
+# --- Exécution des opérations lourdes ---
+
+PIPELINE_QUEUE_TIME = REGISTRY.histogram(
+    "pipeline_queue_duration_seconds", "Attente d'une place avant exécution, par voie", ["lane"])
+PIPELINE_EXECUTION_TIME = REGISTRY.histogram(
+    "pipeline_execution_duration_seconds", "Durée d'exécution dans le pool, par voie", ["lane"])
+PIPELINE_IN_FLIGHT = REGISTRY.gauge("pipeline_in_flight", "Opérations en cours d'exécution", ["lane"])
+PIPELINE_QUEUED = REGISTRY.gauge("pipeline_queued", "Opérations en attente d'une place", ["lane"])
+PIPELINE_REJECTED = REGISTRY.counter(
+    "pipeline_rejected_total", "Opérations refusées (file d'attente pleine)", ["lane"])
+PIPELINE_TIMEOUTS = REGISTRY.counter("pipeline_timeouts_total", "Opérations ayant dépassé leur délai", ["lane"])
+
+# --- Limitation de débit ---
+
+RATE_LIMIT_DECISIONS = REGISTRY.counter(
+    "rate_limit_decisions_total", "Décisions du limiteur de débit par classe de route", ["route_class", "outcome"])
+
+# --- HTTP ---
+
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP par route", ["method", "route", "status"])
+
+
+def measure(func: Callable, *args) -> Tuple[Any, float]:
+    """Exécute func(*args) et retourne (résultat, durée en secondes)
+
+    Fonction de module: dans un pool de processus, la durée est mesurée dans le
+    processus de calcul, sans l'attente dans la file ni le transfert des arguments.
+    """
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def timed(histogram: Histogram, **labels):
+    """Décorateur: observe la durée de chaque appel dans l'histogramme"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, **labels)
+        return wrapper
+    return decorator
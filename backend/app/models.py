@@ -1,12 +1,26 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 from typing import List, Optional, Dict, Any
 
+from app.blockchain import parse_due_date
+from app.crypto import KEY_TYPES
+
 # --- User & Auth Models ---
 
 class UserRegistration(BaseModel):
     name: str
     email: EmailStr
     role: str  # "STUDENT" or "TEACHER"
+    key_type: Optional[str] = None  # "RSA", "ED25519" ou "ECDSA"; type par défaut du serveur sinon
+
+    @field_validator("key_type")
+    @classmethod
+    def check_key_type(cls, value: Optional[str]) -> Optional[str]:
+        if not value:
+            return None
+        value = value.upper()
+        if value not in KEY_TYPES:
+            raise ValueError(f"key_type must be one of {', '.join(KEY_TYPES)}")
+        return value
 
 class WalletResponse(BaseModel):
     address: str
@@ -14,6 +28,7 @@ class WalletResponse(BaseModel):
     role: str
     name: str
     email: str
+    key_type: str = "RSA"
 
 # --- Blockchain Models ---
 
@@ -43,6 +58,14 @@ class AssignmentCreate(BaseModel):
     teacher_address: str
     encryption_public_key: Optional[str] = None  # Clé publique RSA pour chiffrer les soumissions
 
+    @field_validator("due_date")
+    @classmethod
+    def check_due_date(cls, value: str) -> str:
+        # Date ISO 8601 ("2026-06-30" ou "2026-06-30T18:00"), indexée à la création du bloc
+        if parse_due_date(value) is None:
+            raise ValueError("due_date must be an ISO 8601 date, e.g. 2026-06-30 or 2026-06-30T18:00")
+        return value
+
 class SubmissionCreate(BaseModel):
     assignment_id: str
     student_address: str
@@ -56,6 +79,15 @@ class GradeCreate(BaseModel):
     comment: str
     teacher_address: str
 
+class BulkGradeEntry(BaseModel):
+    submission_id: str
+    grade: float
+    comment: str
+
+class BulkGradeCreate(BaseModel):
+    teacher_address: str
+    grades: List[BulkGradeEntry]
+
 class AnnouncementCreate(BaseModel):
     title: str
     message: str
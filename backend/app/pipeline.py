@@ -0,0 +1,265 @@
+"""
+Exécution des opérations coûteuses hors de la boucle d'événements
+
+Chaque opération passe par une voie (lane) qui borne le nombre d'exécutions
+simultanées et la longueur de la file d'attente:
+
+- "crypto": opérations avec clé privée (génération, signature, déchiffrement),
+  exécutées dans le pool de processus;
+- "mining": preuve de travail, dans le pool de processus; les établissements
+  (tenants) en attente sont servis à tour de rôle;
+- "scan": parcours de la chaîne, dans un pool de threads;
+- "audit": tranches d'un audit d'intégrité, dans le pool de processus, avec
+  moins de places que "crypto" pour que les requêtes gardent des processus.
+
+Une requête qui arrive sur une voie dont la file est pleine est refusée (503)
+au lieu d'attendre; une opération qui dépasse son délai répond 504. Les routes
+légères (index, cache) ne passent par aucune voie et gardent une latence basse.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional
+
+from app.metrics import (
+    PIPELINE_QUEUE_TIME, PIPELINE_EXECUTION_TIME, PIPELINE_IN_FLIGHT,
+    PIPELINE_QUEUED, PIPELINE_REJECTED, PIPELINE_TIMEOUTS
+)
+
+DEFAULT_TIMEOUT = 30.0
+MINING_TIMEOUT = 120.0
+
+
+class PipelineError(Exception):
+    """Erreur d'admission ou de délai, convertie en réponse HTTP par l'application"""
+
+    status_code = 503
+
+    def __init__(self, lane: str, message: str):
+        super().__init__(message)
+        self.lane = lane
+
+
+class Overloaded(PipelineError):
+    """La file d'attente de la voie est pleine"""
+
+    status_code = 503
+
+
+class OperationTimeout(PipelineError):
+    """L'opération n'a pas abouti dans le délai imparti"""
+
+    status_code = 504
+
+
+class Lane:
+    """Sémaphore borné avec file d'attente limitée et métriques de temps d'attente"""
+
+    def __init__(self, name: str, concurrency: int, queue_limit: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.waiting = 0
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def acquire(self, timeout: Optional[float], key: Hashable = None):
+        """Attend une place; Overloaded si la file est pleine, OperationTimeout si trop long"""
+        if self.waiting >= self.queue_limit:
+            PIPELINE_REJECTED.inc(lane=self.name)
+            raise Overloaded(self.name, f"Too many pending {self.name} operations, retry later")
+
+        self.waiting += 1
+        PIPELINE_QUEUED.set(self.waiting, lane=self.name)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            PIPELINE_TIMEOUTS.inc(lane=self.name)
+            raise OperationTimeout(self.name, f"Timed out waiting for a {self.name} slot")
+        finally:
+            self.waiting -= 1
+            PIPELINE_QUEUED.set(self.waiting, lane=self.name)
+            PIPELINE_QUEUE_TIME.observe(time.perf_counter() - started, lane=self.name)
+
+        self.in_flight += 1
+        PIPELINE_IN_FLIGHT.set(self.in_flight, lane=self.name)
+
+    def release(self):
+        self.in_flight -= 1
+        PIPELINE_IN_FLIGHT.set(self.in_flight, lane=self.name)
+        self._semaphore.release()
+
+    def get_stats(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting
+        }
+
+
+class FairLane(Lane):
+    """Voie partagée entre plusieurs clés (tenants), servies à tour de rôle
+
+    Chaque clé a sa propre file (au plus per_key_limit opérations en attente);
+    une place libérée revient à la clé suivante dans la rotation, si bien qu'un
+    tenant qui enchaîne les demandes ne retarde les autres que d'une opération.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_limit: int, per_key_limit: int):
+        super().__init__(name, concurrency, queue_limit)
+        self.per_key_limit = per_key_limit
+        self.available = concurrency
+        self._queues: "OrderedDict[Hashable, deque]" = OrderedDict()  # Ordre = rotation
+
+    async def acquire(self, timeout: Optional[float], key: Hashable = None):
+        queue = self._queues.get(key)
+        if self.waiting >= self.queue_limit or (queue is not None and len(queue) >= self.per_key_limit):
+            PIPELINE_REJECTED.inc(lane=self.name)
+            raise Overloaded(self.name, f"Too many pending {self.name} operations, retry later")
+
+        if self.available > 0 and not self._queues:
+            self.available -= 1
+        else:
+            await self._wait_turn(key, timeout)
+
+        self.in_flight += 1
+        PIPELINE_IN_FLIGHT.set(self.in_flight, lane=self.name)
+
+    async def _wait_turn(self, key: Hashable, timeout: Optional[float]):
+        turn = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append(turn)
+        self.waiting += 1
+        PIPELINE_QUEUED.set(self.waiting, lane=self.name)
+        started = time.perf_counter()
+        granted = False
+        try:
+            await asyncio.wait_for(asyncio.shield(turn), timeout)
+            granted = True
+        except asyncio.TimeoutError:
+            PIPELINE_TIMEOUTS.inc(lane=self.name)
+            raise OperationTimeout(self.name, f"Timed out waiting for a {self.name} slot")
+        finally:
+            self.waiting -= 1
+            PIPELINE_QUEUED.set(self.waiting, lane=self.name)
+            PIPELINE_QUEUE_TIME.observe(time.perf_counter() - started, lane=self.name)
+            if not granted:
+                if turn.done():
+                    self._hand_over()  # Place accordée au moment de l'abandon: la passer au suivant
+                else:
+                    turn.cancel()
+                    self._forget(key, turn)
+
+    def _forget(self, key: Hashable, turn: asyncio.Future):
+        queue = self._queues.get(key)
+        if queue is not None and turn in queue:
+            queue.remove(turn)
+            if not queue:
+                del self._queues[key]
+
+    def release(self):
+        self.in_flight -= 1
+        PIPELINE_IN_FLIGHT.set(self.in_flight, lane=self.name)
+        self._hand_over()
+
+    def _hand_over(self):
+        """Donne la place à la prochaine clé en attente, sinon la rend disponible"""
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            turn = queue.popleft()
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            turn.set_result(None)
+            return
+        self.available += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            **super().get_stats(),
+            "per_key_limit": self.per_key_limit,
+            "keys_waiting": len(self._queues)
+        }
+
+
+class ExecutionPipeline:
+    """Exécuteurs dédiés (processus et threads) et contrôle d'admission par voie
+
+    À construire depuis la boucle d'événements. Le pool de processus est fourni
+    par une fabrique pour n'être créé qu'à la première opération lourde.
+    """
+
+    def __init__(self, process_pool_factory: Callable, cpu_concurrency: Optional[int] = None,
+                 scan_threads: int = 4, queue_limit: int = 64,
+                 timeout: float = DEFAULT_TIMEOUT, mining_timeout: float = MINING_TIMEOUT,
+                 mining_concurrency: int = 1, audit_concurrency: Optional[int] = None):
+        cpu_concurrency = cpu_concurrency or os.cpu_count() or 1
+        audit_concurrency = audit_concurrency or max(1, cpu_concurrency // 2)
+        self.process_pool_factory = process_pool_factory
+        self.thread_pool = ThreadPoolExecutor(max_workers=scan_threads, thread_name_prefix="scan")
+        self.timeout = timeout
+        self.timeouts = {"mining": mining_timeout}
+        self.lanes = {
+            "crypto": Lane("crypto", cpu_concurrency, queue_limit),
+            "mining": FairLane("mining", mining_concurrency, queue_limit, max(1, queue_limit // 16)),
+            "scan": Lane("scan", scan_threads, queue_limit * 4),
+            "audit": Lane("audit", audit_concurrency, audit_concurrency)
+        }
+
+    async def run_in_process(self, lane: str, func: Callable, *args, timeout: Optional[float] = None,
+                             key: Hashable = None):
+        """Exécute func(*args) dans le pool de processus (func doit être une fonction de module)
+
+        key identifie le demandeur (tenant) sur les voies à tour de rôle.
+        """
+        return await self._run(lane, self.process_pool_factory(), func, args, timeout, key)
+
+    async def run_in_thread(self, lane: str, func: Callable, *args, timeout: Optional[float] = None,
+                            key: Hashable = None):
+        """Exécute func(*args) dans le pool de threads"""
+        return await self._run(lane, self.thread_pool, func, args, timeout, key)
+
+    async def scan(self, func: Callable, *args):
+        """Parcours de la chaîne dans le pool de threads (voie "scan")"""
+        return await self.run_in_thread("scan", func, *args)
+
+    async def _run(self, lane_name: str, executor, func: Callable, args, timeout: Optional[float],
+                   key: Hashable = None):
+        lane = self.lanes[lane_name]
+        if timeout is None:
+            timeout = self.timeouts.get(lane_name, self.timeout)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        await lane.acquire(timeout, key)
+
+        started = time.perf_counter()
+        try:
+            future = loop.run_in_executor(executor, func, *args)
+        except BaseException:
+            lane.release()
+            raise
+
+        # La place n'est rendue qu'à la fin réelle du calcul: une opération abandonnée
+        # après un délai dépassé continue d'occuper un processus ou un thread
+        def finished(_):
+            lane.release()
+            PIPELINE_EXECUTION_TIME.observe(time.perf_counter() - started, lane=lane_name)
+        future.add_done_callback(finished)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            PIPELINE_TIMEOUTS.inc(lane=lane_name)
+            raise OperationTimeout(lane_name, f"{lane_name} operation timed out after {timeout:g}s")
+
+    def get_stats(self) -> Dict:
+        """Retourne l'état des voies"""
+        return {name: lane.get_stats() for name, lane in self.lanes.items()}
+
+    def shutdown(self):
+        self.thread_pool.shutdown(wait=False, cancel_futures=True)
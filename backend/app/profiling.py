@@ -0,0 +1,128 @@
+"""
+Profileur par échantillonnage à la demande (sortie "collapsed stacks" pour flamegraph)
+
+Un thread échantillonne périodiquement les piles de tous les threads du
+processus via sys._current_frames(). Les processus du pool de calcul ont
+chacun un thread d'échantillonnage endormi sur un Event partagé: aucun coût
+tant que le profilage n'est pas demandé.
+"""
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Tuple
+
+MAX_DURATION = 30.0
+MIN_INTERVAL = 0.001
+
+
+def _format_frame(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> str:
+    """Pile racine -> feuille, séparée par des points-virgules"""
+    frames = []
+    while frame is not None:
+        frames.append(_format_frame(frame))
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+def sample_stacks(duration: float, interval: float, prefix: str) -> Counter:
+    """Échantillonne les piles des autres threads pendant duration secondes"""
+    samples: Counter = Counter()
+    own_id = threading.get_ident()
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            samples[f"{prefix};{names.get(thread_id, thread_id)};{_collapse(frame)}"] += 1
+        time.sleep(interval)
+
+    return samples
+
+
+# --- Côté processus du pool ---
+
+def init_worker(control: multiprocessing.Event, results: multiprocessing.Queue,
+                interval: multiprocessing.Value):
+    """Initialiseur du pool: démarre le thread d'échantillonnage (inactif par défaut)"""
+    thread = threading.Thread(
+        target=_worker_sampler, args=(control, results, interval),
+        name="profiler-sampler", daemon=True
+    )
+    thread.start()
+
+
+def _worker_sampler(control, results, interval):
+    prefix = f"worker-{os.getpid()}"
+    while True:
+        control.wait()
+        samples = Counter()
+        while control.is_set():
+            samples.update(sample_stacks(0.05, interval.value, prefix))
+        results.put(dict(samples))
+
+
+# --- Côté processus principal ---
+
+class Profiler:
+    """Pilote une capture bornée dans le temps sur le processus et son pool"""
+
+    def __init__(self):
+        self.control = multiprocessing.Event()
+        self.results = multiprocessing.Queue()
+        self.interval = multiprocessing.Value("d", 0.005)
+        self._lock = threading.Lock()
+
+    def worker_initializer(self) -> Tuple:
+        """Initialiseur et arguments à passer au ProcessPoolExecutor"""
+        return init_worker, (self.control, self.results, self.interval)
+
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    def capture(self, duration: float, interval: float = 0.005) -> str:
+        """Profile pendant duration secondes et retourne les piles agrégées
+
+        Lève RuntimeError si une capture est déjà en cours.
+        """
+        duration = min(max(duration, 0.1), MAX_DURATION)
+        interval = max(interval, MIN_INTERVAL)
+
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile capture is already running")
+        try:
+            # Écarter d'éventuels résultats arrivés après la capture précédente
+            while True:
+                try:
+                    self.results.get_nowait()
+                except queue.Empty:
+                    break
+
+            self.interval.value = interval
+            self.control.set()
+            try:
+                samples = sample_stacks(duration, interval, f"main-{os.getpid()}")
+            finally:
+                self.control.clear()
+
+            # Récupérer les échantillons des processus du pool (ceux qui ont démarré)
+            deadline = time.monotonic() + 1.0
+            while time.monotonic() < deadline:
+                try:
+                    samples.update(self.results.get(timeout=0.3))
+                except queue.Empty:
+                    break
+
+            return "\n".join(f"{stack} {count}" for stack, count in samples.most_common()) + "\n"
+        finally:
+            self._lock.release()
@@ -0,0 +1,341 @@
+"""
+Base SQLite de requêtes, dérivée de la chaîne
+
+Miroir facultatif (variable QUERY_STORE_PATH) des participants et des
+transactions minées, alimenté bloc par bloc par un écouteur de la Blockchain.
+Les routes de lecture l'interrogent via des index SQL au lieu de parcourir
+self.chain; la base reste reconstructible à tout moment depuis la chaîne.
+
+La hauteur et le hash du dernier bloc appliqué sont enregistrés dans la même
+transaction SQL que le bloc: au redémarrage, la base rattrape les blocs
+manquants si elle correspond à la chaîne, sinon elle est reconstruite (de même
+si elle a été écrite avec une version antérieure du schéma).
+"""
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from app.blockchain import Block, Blockchain, get_recipients
+from app.metrics import timed, QUERY_LATENCY
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS participants (
+    address TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    name TEXT,
+    email TEXT,
+    public_key TEXT,
+    registered_at REAL,
+    key_type TEXT NOT NULL DEFAULT 'RSA'
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    block_index INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    block_hash TEXT,
+    type TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    receiver TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_sender ON transactions (sender, block_index, position);
+CREATE INDEX IF NOT EXISTS idx_transactions_receiver ON transactions (receiver, block_index, position);
+CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions (type, block_index, position);
+CREATE TABLE IF NOT EXISTS recipients (
+    transaction_id TEXT NOT NULL,
+    address TEXT NOT NULL,
+    PRIMARY KEY (address, transaction_id)
+);
+CREATE TABLE IF NOT EXISTS assignments (
+    transaction_id TEXT PRIMARY KEY,
+    teacher_address TEXT NOT NULL,
+    receiver TEXT NOT NULL,
+    title TEXT,
+    due_date TEXT,
+    block_index INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_teacher ON assignments (teacher_address);
+CREATE TABLE IF NOT EXISTS submissions (
+    transaction_id TEXT PRIMARY KEY,
+    assignment_id TEXT,
+    student_address TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    block_index INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_assignment ON submissions (assignment_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_student ON submissions (student_address, assignment_id);
+CREATE TABLE IF NOT EXISTS grades (
+    transaction_id TEXT PRIMARY KEY,
+    submission_id TEXT,
+    assignment_id TEXT,
+    teacher_address TEXT NOT NULL,
+    student_address TEXT NOT NULL,
+    grade REAL,
+    block_index INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_grades_student ON grades (student_address);
+CREATE INDEX IF NOT EXISTS idx_grades_assignment ON grades (assignment_id);
+CREATE INDEX IF NOT EXISTS idx_grades_teacher ON grades (teacher_address, student_address, assignment_id);
+"""
+
+DERIVED_TABLES = ("participants", "transactions", "recipients", "assignments", "submissions", "grades")
+SCHEMA_VERSION = 3  # À incrémenter si les tables dérivées changent: la base est alors reconstruite
+
+ORDER = "ORDER BY t.block_index, t.position"
+
+
+class QueryStore:
+    """Miroir SQLite (mode WAL) de la chaîne, interrogeable depuis plusieurs threads
+
+    Les écritures passent par une connexion unique protégée par un verrou;
+    chaque thread de lecture ouvre sa propre connexion, fermée par close.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._write = sqlite3.connect(path, check_same_thread=False)
+        self._write.execute("PRAGMA journal_mode=WAL")
+        self._write.execute("PRAGMA synchronous=NORMAL")
+        self._write.executescript(SCHEMA)
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self.height = int(self._get_meta("height") or 0)
+        self.tip_hash = self._get_meta("tip_hash")
+        self.schema_version = int(self._get_meta("schema_version") or 1)
+        if self.schema_version != SCHEMA_VERSION:
+            # Colonnes modifiées: les tables dérivées sont recréées, puis remplies par sync
+            for table in DERIVED_TABLES:
+                self._write.execute(f"DROP TABLE IF EXISTS {table}")
+            self._write.executescript(SCHEMA)
+        self._write.commit()
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA query_only=ON")
+            self._local.connection = connection
+            with self._readers_lock:
+                self._readers.append(connection)
+        return connection
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._write.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # --- Alimentation ---
+
+    def sync(self, blockchain: Blockchain) -> str:
+        """Met la base à jour avec la chaîne; retourne "current", "caught_up" ou "rebuilt" """
+        height = self.height
+        if (self.schema_version == SCHEMA_VERSION and 0 < height <= len(blockchain.chain) and
+                blockchain.chain[height - 1].hash == self.tip_hash and
+                height >= blockchain.first_unpruned_index()):
+            if height == len(blockchain.chain):
+                return "current"
+            for block in blockchain.chain[height:]:
+                self.apply_block(block, blockchain)
+            return "caught_up"
+
+        self.rebuild(blockchain)
+        return "rebuilt"
+
+    def rebuild(self, blockchain: Blockchain):
+        """Reconstruit la base: état des blocs élagués, puis blocs complets"""
+        with self._write_lock, self._write:
+            for table in DERIVED_TABLES:
+                self._write.execute(f"DELETE FROM {table}")
+
+            for participant in blockchain.participants.values():
+                self._insert_participant(participant)
+
+            # Blocs élagués: seuls leurs devoirs, soumissions, notes et annonces sont conservés
+            pruned = blockchain.pruned_state
+            announcements = [a for a in blockchain.announcements
+                             if a["block_index"] < blockchain.first_unpruned_index()]
+            for position, tx in enumerate(pruned["assignments"] + pruned["submissions"] +
+                                          pruned["grades"] + announcements):
+                block = blockchain.chain[tx["block_index"]]
+                self._insert_transaction(tx, tx["block_index"], position, block.hash, blockchain)
+
+            for block in blockchain.chain[blockchain.first_unpruned_index():]:
+                self._insert_block(block, blockchain)
+
+            self._set_tip(blockchain.chain[-1])
+            self._write.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                                (str(SCHEMA_VERSION),))
+            self.schema_version = SCHEMA_VERSION
+
+    def apply_block(self, block: Block, blockchain: Blockchain):
+        """Ajoute les transactions d'un bloc, atomiquement avec la nouvelle hauteur"""
+        with self._write_lock, self._write:
+            self._insert_block(block, blockchain)
+            self._set_tip(block)
+
+    def listener(self, blockchain: Blockchain):
+        """Écouteur à brancher sur Blockchain.add_listener"""
+        def on_event(event_type: str, payload):
+            if event_type == "block":
+                self.apply_block(payload, blockchain)
+        return on_event
+
+    def _set_tip(self, block: Block):
+        self.height = block.index + 1
+        self.tip_hash = block.hash
+        self._write.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [("height", str(self.height)), ("tip_hash", self.tip_hash)]
+        )
+
+    def _insert_block(self, block: Block, blockchain: Blockchain):
+        for position, tx in enumerate(block.transactions):
+            self._insert_transaction(tx, block.index, position, block.hash, blockchain)
+
+    def _insert_participant(self, participant: Dict):
+        self._write.execute(
+            "INSERT OR REPLACE INTO participants VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (participant["address"], participant["role"], participant.get("name"),
+             participant.get("email"), participant.get("public_key"), participant.get("registered_at"),
+             participant.get("key_type", "RSA"))
+        )
+
+    def _insert_transaction(self, tx: Dict, block_index: int, position: int, block_hash: str,
+                            blockchain: Blockchain):
+        data = tx["data"]
+        stored = {k: v for k, v in tx.items() if k != "block_index"}
+        self._write.execute(
+            "INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (tx["transaction_id"], block_index, position, block_hash, tx["type"],
+             tx["sender"], tx["receiver"], tx["timestamp"], json.dumps(stored))
+        )
+
+        if tx["type"] == "REGISTRATION":
+            self._write.execute(
+                "INSERT OR IGNORE INTO participants VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (tx["receiver"], data.get("role"), data.get("name"), data.get("email"),
+                 data.get("public_key"), tx["timestamp"], data.get("key_type", "RSA"))
+            )
+        elif tx["type"] == "ANNOUNCEMENT":
+            recipients = get_recipients(tx)
+            if recipients is not None:
+                self._write.executemany(
+                    "INSERT OR IGNORE INTO recipients VALUES (?, ?)",
+                    [(tx["transaction_id"], address) for address in recipients]
+                )
+        elif tx["type"] == "ASSIGNMENT":
+            self._write.execute(
+                "INSERT OR REPLACE INTO assignments VALUES (?, ?, ?, ?, ?, ?)",
+                (tx["transaction_id"], tx["sender"], tx["receiver"], data.get("title"),
+                 data.get("due_date"), block_index)
+            )
+        elif tx["type"] == "SUBMISSION":
+            self._write.execute(
+                "INSERT OR REPLACE INTO submissions VALUES (?, ?, ?, ?, ?)",
+                (tx["transaction_id"], data.get("assignment_id"), tx["sender"], tx["timestamp"], block_index)
+            )
+        elif tx["type"] == "GRADE":
+            self._write.execute(
+                "INSERT OR REPLACE INTO grades VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (tx["transaction_id"], data.get("submission_id"), blockchain.get_grade_assignment_id(tx),
+                 tx["sender"], tx["receiver"], data.get("grade"), block_index)
+            )
+
+    # --- Requêtes (mêmes signatures et résultats que Blockchain) ---
+
+    def _fetch(self, sql: str, params: Iterable = (), with_hash: bool = False) -> List[Dict]:
+        transactions = []
+        for block_index, block_hash, payload in self._reader().execute(sql, tuple(params)):
+            tx = json.loads(payload)
+            tx["block_index"] = block_index
+            if with_hash:
+                tx["block_hash"] = block_hash
+            transactions.append(tx)
+        return transactions
+
+    @timed(QUERY_LATENCY, method="store_get_transactions_by_address")
+    def get_transactions_by_address(self, address: str) -> List[Dict]:
+        """Transactions envoyées ou reçues par une adresse (annonces ciblées comprises)"""
+        return self._fetch(
+            "SELECT t.block_index, t.block_hash, t.payload FROM transactions t "
+            "WHERE t.sender = ? OR t.receiver = ? "
+            f"OR t.transaction_id IN (SELECT transaction_id FROM recipients WHERE address = ?) {ORDER}",
+            (address, address, address), with_hash=True
+        )
+
+    @timed(QUERY_LATENCY, method="store_get_assignments")
+    def get_assignments(self, student_address: Optional[str] = None) -> List[Dict]:
+        """Devoirs, éventuellement limités à ceux visibles par un étudiant"""
+        if student_address is None:
+            return self._fetch(
+                "SELECT t.block_index, t.block_hash, t.payload FROM assignments a "
+                f"JOIN transactions t USING (transaction_id) {ORDER}"
+            )
+        return self._fetch(
+            "SELECT t.block_index, t.block_hash, t.payload FROM assignments a "
+            f"JOIN transactions t USING (transaction_id) WHERE a.receiver IN (?, 'ALL') {ORDER}",
+            (student_address,)
+        )
+
+    @timed(QUERY_LATENCY, method="store_get_submissions")
+    def get_submissions(self, assignment_id: str) -> List[Dict]:
+        """Soumissions d'un devoir"""
+        return self._fetch(
+            "SELECT t.block_index, t.block_hash, t.payload FROM submissions s "
+            f"JOIN transactions t USING (transaction_id) WHERE s.assignment_id = ? {ORDER}",
+            (assignment_id,)
+        )
+
+    @timed(QUERY_LATENCY, method="store_get_grades")
+    def get_grades(self, student_address: str) -> List[Dict]:
+        """Notes reçues par un étudiant"""
+        return self._fetch(
+            "SELECT t.block_index, t.block_hash, t.payload FROM grades g "
+            f"JOIN transactions t USING (transaction_id) WHERE g.student_address = ? {ORDER}",
+            (student_address,)
+        )
+
+    @timed(QUERY_LATENCY, method="store_get_grades_by_assignment")
+    def get_grades_by_assignment(self, assignment_id: str) -> List[Dict]:
+        """Notes attribuées pour un devoir"""
+        return self._fetch(
+            "SELECT t.block_index, t.block_hash, t.payload FROM grades g "
+            f"JOIN transactions t USING (transaction_id) WHERE g.assignment_id = ? {ORDER}",
+            (assignment_id,)
+        )
+
+    @timed(QUERY_LATENCY, method="store_has_student_submitted")
+    def has_student_submitted(self, student_address: str, assignment_id: str) -> bool:
+        """Vérifie si un étudiant a déjà soumis un devoir"""
+        row = self._reader().execute(
+            "SELECT 1 FROM submissions WHERE student_address = ? AND assignment_id = ? LIMIT 1",
+            (student_address, assignment_id)
+        ).fetchone()
+        return row is not None
+
+    def get_stats(self) -> Dict:
+        """Retourne la hauteur synchronisée et le nombre de lignes par table"""
+        reader = self._reader()
+        return {
+            "path": self.path,
+            "height": self.height,
+            "tip_hash": self.tip_hash,
+            "rows": {
+                table: reader.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in DERIVED_TABLES
+            }
+        }
+
+    def close(self):
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for connection in readers:
+            connection.close()
+        self._write.close()
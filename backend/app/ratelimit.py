@@ -0,0 +1,100 @@
+"""
+Limitation de débit par adresse et par classe de route (seau à jetons)
+
+Le contrôle se fait en début de route, avant tout parcours de la chaîne ou
+opération cryptographique: une requête refusée ne coûte qu'une recherche
+dans un dictionnaire.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.metrics import RATE_LIMIT_DECISIONS
+
+# Classe de route -> (jetons par seconde, capacité du seau)
+DEFAULT_RULES: Dict[str, Tuple[float, float]] = {
+    "submission": (0.2, 5),  # Une soumission toutes les 5 s en régime établi
+    "announcement": (0.1, 5),
+    "teacher_write": (2.0, 20),  # Devoirs et notes
+}
+MAX_RETRY_AFTER = 3600  # Délai annoncé au plus (règle de taux nul: le seau ne se remplit jamais)
+
+
+class RateLimited(Exception):
+    """Requête refusée: le seau de l'adresse est vide (convertie en 429)"""
+
+    def __init__(self, route_class: str, retry_after: float):
+        super().__init__(f"Too many {route_class} requests, retry in {retry_after:.1f}s")
+        self.route_class = route_class
+        self.retry_after = retry_after
+
+
+def parse_rules(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Lit des règles au format "classe=taux:capacité,..." (variable RATE_LIMITS)
+
+    Un taux nul bloque la classe une fois la capacité consommée; un taux négatif
+    lève ValueError.
+    """
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        route_class, _, values = item.partition("=")
+        rate, _, burst = values.partition(":")
+        if float(rate) < 0:
+            raise ValueError(f"Negative rate for route class {route_class.strip()}: {rate}")
+        rules[route_class.strip()] = (float(rate), float(burst) if burst else max(1.0, float(rate)))
+    return rules
+
+
+class RateLimiter:
+    """Seaux à jetons indexés par (classe de route, adresse)
+
+    Seuls les seaux entamés récemment sont conservés: au-delà de max_buckets,
+    les moins récemment utilisés sont oubliés (ils seraient de toute façon
+    pleins à nouveau).
+    """
+
+    def __init__(self, rules: Optional[Dict[str, Tuple[float, float]]] = None, max_buckets: int = 100_000):
+        self.rules = dict(DEFAULT_RULES)
+        self.rules.update(rules or {})
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[Tuple[str, str], list]" = OrderedDict()  # clé -> [jetons, dernière mise à jour]
+        self._lock = threading.Lock()
+
+    def check(self, route_class: str, address: str):
+        """Consomme un jeton pour cette adresse; lève RateLimited si le seau est vide"""
+        rule = self.rules.get(route_class)
+        if rule is None:
+            return
+        rate, burst = rule
+        key = (route_class, address)
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                if len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                allowed = True
+            else:
+                allowed = False
+                retry_after = min((1 - bucket[0]) / rate, MAX_RETRY_AFTER) if rate > 0 else MAX_RETRY_AFTER
+
+        RATE_LIMIT_DECISIONS.inc(route_class=route_class, outcome="allowed" if allowed else "rejected")
+        if not allowed:
+            raise RateLimited(route_class, retry_after)
+
+    def get_stats(self) -> Dict:
+        """Retourne les règles et le nombre de seaux suivis"""
+        return {
+            "rules": {name: {"rate": rate, "burst": burst} for name, (rate, burst) in self.rules.items()},
+            "buckets": len(self._buckets)
+        }
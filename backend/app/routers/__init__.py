@@ -1,6 +1,6 @@
 """
 Routers package initialization
 """
-from . import teacher, student, blockchain
+from . import teacher, student, blockchain, admin
 
-__all__ = ['teacher', 'student', 'blockchain']
\ No newline at end of file
+__all__ = ['teacher', 'student', 'blockchain', 'admin']
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+Routes d'administration (diagnostic), protégées par le jeton ADMIN_TOKEN
+"""
+import asyncio
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Depends, Header
+from fastapi.responses import PlainTextResponse
+
+from app.audit import DEFAULT_CHUNK_SIZE, AuditAlreadyRunning
+from app.bootstrap import export_bootstrap
+from app.tenants import DEFAULT_TENANT
+
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    """Dépendance: vérifie le jeton d'administration (routes désactivées sans ADMIN_TOKEN)"""
+    expected = os.environ.get("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def get_profiler(request: Request):
+    """Dépendance pour obtenir le profileur"""
+    return request.app.state.get_profiler()
+
+
+@router.get("/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def capture_profile(
+    duration: float = 5.0,
+    interval_ms: float = 5.0,
+    profiler=Depends(get_profiler)
+):
+    """
+    Capturer un profil échantillonné du processus et de son pool de calcul
+    
+    Retourne des piles agrégées ("collapsed stacks") utilisables par flamegraph.pl
+    ou speedscope. Durée bornée à 30 secondes, une seule capture à la fois.
+    """
+    if profiler.is_running():
+        raise HTTPException(status_code=409, detail="A profile capture is already running")
+    
+    try:
+        stacks = await asyncio.to_thread(profiler.capture, duration, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return PlainTextResponse(stacks)
+
+
+def get_blockchain(request: Request):
+    """Dépendance pour obtenir la blockchain"""
+    return request.app.state.get_tenant(request).get_blockchain()
+
+
+@router.get("/snapshot", dependencies=[Depends(require_admin)])
+async def get_snapshot(
+    height: Optional[int] = None,
+    blockchain=Depends(get_blockchain)
+):
+    """
+    Capturer l'état dérivé (participants, devoirs, soumissions, notes) à une hauteur donnée
+    """
+    try:
+        return blockchain.create_snapshot(height)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/prune", dependencies=[Depends(require_admin)])
+async def prune_chain(
+    retain_blocks: int,
+    blockchain=Depends(get_blockchain)
+):
+    """
+    Élaguer le corps des blocs plus anciens que les retain_blocks derniers blocs
+    """
+    if retain_blocks < 1:
+        raise HTTPException(status_code=400, detail="retain_blocks must be at least 1")
+    
+    # Archivage sur disque: hors de la boucle d'événements
+    pruned = await asyncio.to_thread(blockchain.prune, len(blockchain.chain) - retain_blocks)
+    return {
+        "success": True,
+        "pruned_blocks": pruned,
+        "pruned_height": blockchain.pruned_height,
+        "archive_dir": blockchain.archive_dir
+    }
+
+
+@router.get("/bootstrap", dependencies=[Depends(require_admin)])
+async def get_bootstrap_bundle(blockchain=Depends(get_blockchain)):
+    """
+    Exporter un paquet d'amorçage (snapshot + en-têtes) pour démarrer un nouveau nœud
+    """
+    return export_bootstrap(blockchain)
+
+
+def get_tenants(request: Request):
+    """Dépendance pour obtenir le registre des tenants"""
+    return request.app.state.get_tenants()
+
+
+@router.get("/tenants", dependencies=[Depends(require_admin)])
+async def list_tenants(tenants=Depends(get_tenants)):
+    """
+    Lister les tenants (chargés en mémoire ou sauvegardés sur disque)
+    """
+    return {
+        "success": True,
+        "tenants": await asyncio.to_thread(tenants.list),
+        "stats": tenants.get_stats()
+    }
+
+
+@router.post("/tenants", dependencies=[Depends(require_admin)])
+async def create_tenant(
+    tenant_id: str,
+    tenants=Depends(get_tenants)
+):
+    """
+    Créer un tenant (établissement ou cours), servi sous /api/tenants/{tenant_id}/...
+    """
+    try:
+        tenant = await asyncio.to_thread(tenants.create, tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "tenant": tenant.get_stats()}
+
+
+@router.post("/tenants/{tenant_id}/evict", dependencies=[Depends(require_admin)])
+async def evict_tenant(
+    tenant_id: str,
+    tenants=Depends(get_tenants)
+):
+    """
+    Sauvegarder un tenant et le retirer de la mémoire (rechargé à la prochaine requête)
+    """
+    if not await asyncio.to_thread(tenants.evict, tenant_id):
+        raise HTTPException(status_code=409, detail="Tenant is not loaded, in use, or cannot be evicted")
+    return {"success": True, "tenant_id": tenant_id}
+
+
+def get_pipeline(request: Request):
+    """Dépendance pour obtenir le pipeline d'exécution"""
+    return request.app.state.get_pipeline()
+
+
+def get_rate_limiter(request: Request):
+    """Dépendance pour obtenir le limiteur de débit"""
+    return request.app.state.get_rate_limiter()
+
+
+@router.get("/stats", dependencies=[Depends(require_admin)])
+async def get_stats(
+    pipeline=Depends(get_pipeline),
+    rate_limiter=Depends(get_rate_limiter),
+    tenants=Depends(get_tenants)
+):
+    """
+    État des voies d'exécution, des limites de débit et des tenants
+    """
+    return {
+        "pipeline": pipeline.get_stats(),
+        "rate_limits": rate_limiter.get_stats(),
+        "tenants": tenants.get_stats()
+    }
+
+
+def get_audits(request: Request):
+    """Dépendance pour obtenir les audits d'intégrité lancés par l'API"""
+    return request.app.state.get_audits()
+
+
+@router.post("/audit", status_code=202, dependencies=[Depends(require_admin)])
+async def start_audit(
+    request: Request,
+    tenant_id: str = DEFAULT_TENANT,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    tenants=Depends(get_tenants),
+    audits=Depends(get_audits)
+):
+    """
+    Lancer un audit d'intégrité (hash, liaison, preuve de travail, Merkle, signatures, index)
+    
+    L'audit s'exécute en arrière-plan par tranches de chunk_size blocs; son
+    rapport se consulte avec GET /audit/{audit_id}.
+    """
+    if chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be at least 1")
+    if tenant_id != DEFAULT_TENANT:
+        await asyncio.to_thread(tenants.get, tenant_id)  # TenantNotFound -> 404
+    
+    state = request.app.state
+    try:
+        job = audits.start(tenant_id, lambda: state.audit_tenant(tenant_id, chunk_size))
+    except AuditAlreadyRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True, "audit": job}
+
+
+@router.get("/audit", dependencies=[Depends(require_admin)])
+async def list_audits(audits=Depends(get_audits)):
+    """
+    Lister les derniers audits (sans le détail des rapports)
+    """
+    return {"success": True, "audits": audits.list()}
+
+
+@router.get("/audit/{audit_id}", dependencies=[Depends(require_admin)])
+async def get_audit(audit_id: str, audits=Depends(get_audits)):
+    """
+    Récupérer l'état et le rapport d'un audit
+    """
+    job = audits.get(audit_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Audit not found")
+    return {"success": True, "audit": job}
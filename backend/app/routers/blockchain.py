@@ -1,13 +1,26 @@
 """
 Routes pour la blockchain et la gestion des utilisateurs
 """
+import asyncio
+import csv
+import io
+import json
+import time
+
 from fastapi import APIRouter, HTTPException, Request, Depends
-from typing import List
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import List, Optional
 
 from app.models import (
     UserRegistration, WalletResponse, BlockchainInfo,
     MiningRequest, TransactionResponse
 )
+from app.blockchain import proof_of_work
+from app.cache import compressed_response
+from app.crypto import generate_keypair, run_crypto, verify_participant_signature
+from app.pipeline import PipelineError
+from app.tenants import DEFAULT_TENANT
 
 
 router = APIRouter()
@@ -15,29 +28,79 @@ router = APIRouter()
 
 def get_blockchain(request: Request):
     """Dépendance pour obtenir la blockchain"""
-    return request.app.state.get_blockchain()
+    return request.app.state.get_tenant(request).get_blockchain()
 
 
 def get_wallet_manager(request: Request):
     """Dépendance pour obtenir le wallet manager"""
-    return request.app.state.get_wallet_manager()
+    return request.app.state.get_tenant(request).get_wallet_manager()
+
+
+def get_response_cache(request: Request):
+    """Dépendance pour obtenir le cache des réponses"""
+    return request.app.state.get_tenant(request).get_response_cache()
+
+
+def get_event_broker(request: Request):
+    """Dépendance pour obtenir le diffuseur d'événements"""
+    return request.app.state.get_tenant(request).get_event_broker()
+
+
+def get_tenant(request: Request):
+    """Dépendance pour obtenir le tenant de la requête (établissement ou cours)"""
+    return request.app.state.get_tenant(request)
+
+
+def get_pipeline(request: Request):
+    """Dépendance pour obtenir les exécuteurs des opérations lourdes"""
+    return request.app.state.get_pipeline()
+
+
+def get_queries(request: Request):
+    """Dépendance pour obtenir la source des requêtes (miroir SQLite ou blockchain)"""
+    return request.app.state.get_tenant(request).get_queries()
+
+
+def get_search_index(request: Request):
+    """Dépendance pour obtenir l'index de recherche plein texte"""
+    return request.app.state.get_tenant(request).get_search_index()
+
+
+def parse_roster(body: bytes, content_type: str) -> List[dict]:
+    """Lit une liste d'inscriptions au format CSV (name,email,role) ou JSON"""
+    text = body.decode("utf-8-sig")
+    
+    if "csv" in content_type:
+        return list(csv.DictReader(io.StringIO(text)))
+    
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON roster: {e}")
+    
+    if isinstance(payload, dict):
+        payload = payload.get("users")
+    if not isinstance(payload, list):
+        raise ValueError("Roster must be a list of users or {\"users\": [...]}")
+    return payload
 
 
 @router.post("/register", response_model=WalletResponse)
 async def register_user(
     user: UserRegistration,
     blockchain=Depends(get_blockchain),
-    wallet_manager=Depends(get_wallet_manager)
+    wallet_manager=Depends(get_wallet_manager),
+    pipeline=Depends(get_pipeline)
 ):
     """
     Enregistrer un nouveau participant (étudiant ou enseignant)
     """
     try:
-        # Créer un portefeuille pour l'utilisateur
-        wallet = wallet_manager.create_wallet(
-            role=user.role,
-            name=user.name,
-            email=user.email
+        # Créer un portefeuille pour l'utilisateur (clés générées hors de la boucle d'événements)
+        key_type = user.key_type or wallet_manager.default_key_type
+        private_key, public_key = await run_crypto(pipeline, "keygen", generate_keypair, key_type)
+        wallet = wallet_manager.store_wallet(
+            private_key, public_key, user.role, user.name, user.email, key_type=key_type
         )
         
         # Enregistrer dans la blockchain
@@ -46,7 +109,8 @@ async def register_user(
             role=user.role,
             public_key=wallet["public_key"],
             name=user.name,
-            email=user.email
+            email=user.email,
+            key_type=key_type
         )
         
         # Retourner le portefeuille (sans la clé privée dans la réponse principale)
@@ -55,13 +119,138 @@ async def register_user(
             public_key=wallet["public_key"],
             role=wallet["role"],
             name=wallet["name"],
-            email=wallet["email"]
+            email=wallet["email"],
+            key_type=key_type
         )
     
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/register/bulk")
+async def register_users_bulk(
+    request: Request,
+    pipeline=Depends(get_pipeline)
+):
+    """
+    Enregistrer une liste de participants (CSV ou JSON)
+    
+    Les clés sont générées en parallèle; le résultat de chaque ligne est renvoyé
+    en flux NDJSON dès que son portefeuille est créé. Le flux se poursuit après
+    la fin de la route (et de ses dépendances): il retient lui-même le tenant,
+    qui ne peut pas être évincé avant la dernière inscription.
+    """
+    try:
+        rows = parse_roster(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    state = request.app.state
+    tenant_id = request.path_params.get("tenant_id", DEFAULT_TENANT)
+    
+    async def generate():
+        tenant = await asyncio.to_thread(state.acquire_tenant, tenant_id)
+        try:
+            async for line in register_rows(tenant.get_blockchain(), tenant.get_wallet_manager()):
+                yield line
+        finally:
+            state.release_tenant(tenant)
+    
+    async def register_rows(blockchain, wallet_manager):
+        # Vérifier les doublons (e-mail) en une seule passe sur les participants
+        known_emails = {p["email"].lower() for p in blockchain.participants.values()}
+        valid_rows = []
+        
+        for row_number, row in enumerate(rows):
+            try:
+                user = UserRegistration.model_validate(row)
+            except ValidationError as e:
+                yield json.dumps({"row": row_number, "success": False, "error": str(e)}) + "\n"
+                continue
+            
+            email = user.email.lower()
+            if email in known_emails:
+                yield json.dumps({"row": row_number, "success": False, "error": "Email already registered"}) + "\n"
+                continue
+            
+            known_emails.add(email)
+            valid_rows.append((row_number, user))
+        
+        # Générer les paires de clés en parallèle et enregistrer par lots au fil de l'eau.
+        # Au plus une génération par place de la voie "crypto": le lot ne remplit pas
+        # la file d'attente au détriment des autres requêtes.
+        remaining = iter(valid_rows)
+        pending = {}
+        
+        def submit_next():
+            entry = next(remaining, None)
+            if entry is not None:
+                key_type = entry[1].key_type or wallet_manager.default_key_type
+                future = asyncio.ensure_future(run_crypto(pipeline, "keygen", generate_keypair, key_type))
+                pending[future] = entry
+        
+        for _ in range(pipeline.lanes["crypto"].concurrency):
+            submit_next()
+        
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                
+                batch = []
+                for future in done:
+                    row_number, user = pending.pop(future)
+                    submit_next()
+                    # Une ligne en échec (génération, stockage) ne doit pas interrompre le flux
+                    try:
+                        private_key, public_key = future.result()
+                        wallet = wallet_manager.store_wallet(
+                            private_key, public_key, user.role, user.name, user.email,
+                            key_type=user.key_type or wallet_manager.default_key_type
+                        )
+                    except Exception as e:
+                        yield json.dumps({"row": row_number, "success": False, "error": str(e)}) + "\n"
+                        continue
+                    batch.append((row_number, wallet))
+                
+                if not batch:
+                    continue
+                
+                try:
+                    participants = blockchain.register_participants([
+                        {
+                            "address": wallet["address"],
+                            "role": wallet["role"],
+                            "public_key": wallet["public_key"],
+                            "name": wallet["name"],
+                            "email": wallet["email"],
+                            "key_type": wallet["key_type"]
+                        }
+                        for _, wallet in batch
+                    ])
+                except Exception as e:
+                    for row_number, _ in batch:
+                        yield json.dumps({"row": row_number, "success": False, "error": str(e)}) + "\n"
+                    continue
+                
+                for (row_number, wallet), participant in zip(batch, participants):
+                    if "error" in participant:
+                        result = {"row": row_number, "success": False, "error": participant["error"]}
+                    else:
+                        result = {
+                            "row": row_number,
+                            "success": True,
+                            "wallet": WalletResponse(**wallet).model_dump()
+                        }
+                    yield json.dumps(result) + "\n"
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @router.get("/wallet/{address}")
 async def get_wallet(
     address: str,
@@ -81,23 +270,35 @@ async def get_wallet(
         "public_key": wallet["public_key"],
         "role": wallet["role"],
         "name": wallet["name"],
-        "email": wallet["email"]
+        "email": wallet["email"],
+        "key_type": wallet.get("key_type", "RSA")  # Portefeuilles antérieurs aux clés elliptiques
     }
 
 
 @router.post("/mine", response_model=TransactionResponse)
 async def mine_block(
     mining_request: MiningRequest,
-    blockchain=Depends(get_blockchain)
+    blockchain=Depends(get_blockchain),
+    pipeline=Depends(get_pipeline),
+    tenant=Depends(get_tenant)
 ):
     """
     Miner les transactions en attente
     """
     try:
-        if len(blockchain.pending_transactions) == 0:
+        # Construire le bloc ici, chercher le nonce dans le pool de processus
+        block = blockchain.prepare_block()
+        if block is None:
             raise HTTPException(status_code=400, detail="No transactions to mine")
         
-        block = blockchain.mine_pending_transactions(mining_request.miner_address)
+        started = time.perf_counter()
+        # Voie de minage partagée: les tenants en attente sont servis à tour de rôle
+        block.nonce = await pipeline.run_in_process(
+            "mining", proof_of_work, block.to_header(), blockchain.difficulty,
+            key=tenant.tenant_id
+        )
+        block.hash = block.calculate_hash()
+        block = blockchain.commit_block(block, mining_request.miner_address, time.perf_counter() - started)
         
         if block:
             return TransactionResponse(
@@ -111,76 +312,152 @@ async def mine_block(
                 }
             )
         else:
-            raise HTTPException(status_code=500, detail="Mining failed")
+            raise HTTPException(status_code=409, detail="Chain advanced during mining, retry")
     
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/info", response_model=BlockchainInfo)
-async def get_blockchain_info(blockchain=Depends(get_blockchain)):
+async def get_blockchain_info(
+    request: Request,
+    blockchain=Depends(get_blockchain),
+    cache=Depends(get_response_cache)
+):
     """
     Obtenir les informations sur la blockchain
     """
     try:
-        info = blockchain.get_chain_info()
-        return BlockchainInfo(**info)
+        version = (blockchain.content_version(), blockchain.participants_version, len(blockchain.pending_transactions))
+        return cache.respond(
+            request, version,
+            lambda: BlockchainInfo(**blockchain.get_chain_info()).model_dump()
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/chain")
-async def get_full_chain(blockchain=Depends(get_blockchain)):
+async def get_full_chain(
+    request: Request,
+    blockchain=Depends(get_blockchain),
+    cache=Depends(get_response_cache),
+    pipeline=Depends(get_pipeline)
+):
     """
     Récupérer toute la chaîne de blocs
     """
     try:
-        chain = blockchain.export_chain()
-        return {
-            "success": True,
-            "length": len(chain),
-            "chain": chain
-        }
+        def build():
+            chain = blockchain.export_chain()
+            return {
+                "success": True,
+                "length": len(chain),
+                "chain": chain
+            }
+        
+        version = blockchain.content_version()
+        return await cache.respond_async(request, version, build, pipeline.scan, compress=True)
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/block/{height}")
+async def get_block(height: int, request: Request, blockchain=Depends(get_blockchain)):
+    """
+    Récupérer un bloc par sa hauteur
+    """
+    block = blockchain.get_block(height)
+    if block is None:
+        raise HTTPException(status_code=404, detail="Block not found")
+    return compressed_response(request, {"success": True, "block": block})
+
+
+@router.get("/block/hash/{block_hash}")
+async def get_block_by_hash(block_hash: str, request: Request, blockchain=Depends(get_blockchain)):
+    """
+    Récupérer un bloc par son hash
+    """
+    block = blockchain.get_block_by_hash(block_hash)
+    if block is None:
+        raise HTTPException(status_code=404, detail="Block not found")
+    return compressed_response(request, {"success": True, "block": block})
+
+
+@router.get("/tx/{transaction_id}")
+async def get_transaction(
+    transaction_id: str,
+    blockchain=Depends(get_blockchain),
+    pipeline=Depends(get_pipeline)
+):
+    """
+    Récupérer une transaction par son ID (hauteur du bloc, position, confirmations)
+    
+    signature_valid vérifie la signature avec la clé enregistrée de l'émetteur
+    (None pour les transactions système ou non signées).
+    """
+    # Lecture éventuelle de l'archive d'un bloc élagué: hors de la boucle d'événements
+    result = await pipeline.scan(blockchain.get_transaction, transaction_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    transaction = result["transaction"]
+    signature_valid = None
+    if transaction is not None:
+        signature_valid = verify_participant_signature(
+            transaction, blockchain.participants.get(transaction["sender"])
+        )
+    return {"success": True, "transaction_id": transaction_id, **result, "signature_valid": signature_valid}
+
+
 @router.get("/validate")
-async def validate_chain(blockchain=Depends(get_blockchain)):
+async def validate_chain(blockchain=Depends(get_blockchain), pipeline=Depends(get_pipeline)):
     """
     Valider l'intégrité de la blockchain
     """
     try:
-        is_valid = blockchain.is_chain_valid()
+        is_valid = await pipeline.scan(blockchain.is_chain_valid)
         return {
             "success": True,
             "is_valid": is_valid,
             "message": "Blockchain is valid" if is_valid else "Blockchain is corrupted"
         }
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/participants")
-async def get_all_participants(blockchain=Depends(get_blockchain)):
+async def get_all_participants(
+    request: Request,
+    blockchain=Depends(get_blockchain),
+    cache=Depends(get_response_cache)
+):
     """
     Récupérer tous les participants
     """
     try:
-        participants = list(blockchain.participants.values())
-        
-        # Grouper par rôle
-        teachers = [p for p in participants if p["role"] == "TEACHER"]
-        students = [p for p in participants if p["role"] == "STUDENT"]
+        def build():
+            participants = list(blockchain.participants.values())
+            
+            # Grouper par rôle
+            teachers = [p for p in participants if p["role"] == "TEACHER"]
+            students = [p for p in participants if p["role"] == "STUDENT"]
+            
+            return {
+                "success": True,
+                "total": len(participants),
+                "teachers": teachers,
+                "students": students,
+                "teachers_count": len(teachers),
+                "students_count": len(students)
+            }
         
-        return {
-            "success": True,
-            "total": len(participants),
-            "teachers": teachers,
-            "students": students,
-            "teachers_count": len(teachers),
-            "students_count": len(students)
-        }
+        return cache.respond(request, (blockchain.participants_version,), build)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -205,7 +482,11 @@ async def get_participant(
 @router.get("/transactions/{address}")
 async def get_user_transactions(
     address: str,
-    blockchain=Depends(get_blockchain)
+    request: Request,
+    blockchain=Depends(get_blockchain),
+    cache=Depends(get_response_cache),
+    pipeline=Depends(get_pipeline),
+    queries=Depends(get_queries)
 ):
     """
     Récupérer toutes les transactions d'un utilisateur
@@ -214,28 +495,63 @@ async def get_user_transactions(
         if address not in blockchain.participants:
             raise HTTPException(status_code=404, detail="User not found")
         
-        transactions = blockchain.get_transactions_by_address(address)
-        
-        # Grouper par type
-        by_type = {}
-        for tx in transactions:
-            tx_type = tx["type"]
-            if tx_type not in by_type:
-                by_type[tx_type] = []
-            by_type[tx_type].append(tx)
+        def build():
+            transactions = queries.get_transactions_by_address(address)
+            
+            # Grouper par type
+            by_type = {}
+            for tx in transactions:
+                tx_type = tx["type"]
+                if tx_type not in by_type:
+                    by_type[tx_type] = []
+                by_type[tx_type].append(tx)
+            
+            return {
+                "success": True,
+                "address": address,
+                "total_transactions": len(transactions),
+                "transactions": transactions,
+                "by_type": by_type
+            }
         
-        return {
-            "success": True,
-            "address": address,
-            "total_transactions": len(transactions),
-            "transactions": transactions,
-            "by_type": by_type
-        }
+        version = blockchain.content_version()
+        return await cache.respond_async(request, version, build, pipeline.scan, compress=True)
     
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/search")
+async def search(
+    q: str,
+    teacher_address: Optional[str] = None,
+    student_address: Optional[str] = None,
+    type: Optional[str] = None,
+    limit: int = 20,
+    search_index=Depends(get_search_index)
+):
+    """
+    Rechercher dans les titres, descriptions et messages des devoirs et annonces
+    
+    Filtrer par enseignant (devoirs et annonces publiés) ou par étudiant
+    (documents qui lui sont visibles), et par type (ASSIGNMENT, ANNOUNCEMENT).
+    """
+    if type is not None and type not in ("ASSIGNMENT", "ANNOUNCEMENT"):
+        raise HTTPException(status_code=400, detail="type must be ASSIGNMENT or ANNOUNCEMENT")
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    
+    results = search_index.search(q, teacher_address, student_address, type, limit)
+    return {
+        "success": True,
+        "query": q,
+        "count": len(results),
+        "results": results
+    }
+
+
 @router.get("/pending-transactions")
 async def get_pending_transactions(blockchain=Depends(get_blockchain)):
     """
@@ -253,46 +569,87 @@ async def get_pending_transactions(blockchain=Depends(get_blockchain)):
 
 
 @router.get("/statistics")
-async def get_statistics(blockchain=Depends(get_blockchain)):
+async def get_statistics(
+    request: Request,
+    blockchain=Depends(get_blockchain),
+    cache=Depends(get_response_cache),
+    pipeline=Depends(get_pipeline)
+):
     """
     Récupérer des statistiques sur le système
     """
     try:
-        # Compter les différents types de transactions
-        transaction_counts = {
-            "ASSIGNMENT": 0,
-            "SUBMISSION": 0,
-            "GRADE": 0,
-            "ANNOUNCEMENT": 0,
-            "REGISTRATION": 0,
-            "REWARD": 0
-        }
-        
-        for block in blockchain.chain[1:]:  # Ignorer le bloc genesis
-            for tx in block.transactions:
-                tx_type = tx.get("type")
+        def build():
+            # Compter les différents types de transactions
+            transaction_counts = {
+                "ASSIGNMENT": 0,
+                "SUBMISSION": 0,
+                "GRADE": 0,
+                "ANNOUNCEMENT": 0,
+                "REGISTRATION": 0,
+                "REWARD": 0
+            }
+            
+            # Partir des compteurs des blocs élagués, puis parcourir les blocs restants
+            for tx_type, count in blockchain.pruned_state["transaction_counts"].items():
                 if tx_type in transaction_counts:
-                    transaction_counts[tx_type] += 1
-        
-        participants = blockchain.participants
-        teachers_count = sum(1 for p in participants.values() if p["role"] == "TEACHER")
-        students_count = sum(1 for p in participants.values() if p["role"] == "STUDENT")
-        
-        return {
-            "success": True,
-            "blockchain": {
-                "total_blocks": len(blockchain.chain),
-                "difficulty": blockchain.difficulty,
-                "is_valid": blockchain.is_chain_valid()
-            },
-            "participants": {
-                "total": len(participants),
-                "teachers": teachers_count,
-                "students": students_count
-            },
-            "transactions": transaction_counts,
-            "pending_transactions": len(blockchain.pending_transactions)
-        }
+                    transaction_counts[tx_type] += count
+            
+            for block in blockchain.chain[blockchain.first_unpruned_index():]:
+                for tx in block.transactions:
+                    tx_type = tx.get("type")
+                    if tx_type in transaction_counts:
+                        transaction_counts[tx_type] += 1
+            
+            participants = blockchain.participants.copy()
+            teachers_count = sum(1 for p in participants.values() if p["role"] == "TEACHER")
+            students_count = sum(1 for p in participants.values() if p["role"] == "STUDENT")
+            
+            return {
+                "success": True,
+                "blockchain": {
+                    "total_blocks": len(blockchain.chain),
+                    "difficulty": blockchain.difficulty,
+                    "is_valid": blockchain.is_chain_valid()
+                },
+                "participants": {
+                    "total": len(participants),
+                    "teachers": teachers_count,
+                    "students": students_count
+                },
+                "transactions": transaction_counts,
+                "pending_transactions": len(blockchain.pending_transactions)
+            }
+            
+        version = (blockchain.content_version(), blockchain.participants_version, len(blockchain.pending_transactions))
+        return await cache.respond_async(request, version, build, pipeline.scan)
     
+    except PipelineError:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/events")
+async def stream_events(
+    address: Optional[str] = None,
+    type: Optional[str] = None,
+    assignment_id: Optional[str] = None,
+    broker=Depends(get_event_broker)
+):
+    """
+    Flux Server-Sent Events des nouveaux blocs et transactions (en attente ou confirmées)
+    
+    Filtres optionnels: adresse (émetteur ou destinataire), type de transaction, devoir.
+    Les en-têtes de blocs sont envoyés à tous les abonnés.
+    """
+    subscriber = broker.subscribe(
+        address=address,
+        transaction_type=type,
+        assignment_id=assignment_id
+    )
+    return StreamingResponse(
+        broker.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -2,30 +2,57 @@ from fastapi import APIRouter, HTTPException, Request, Depends
 from typing import List
 from app.models import SubmissionCreate, TransactionResponse
 from app.blockchain import Transaction
+from app.crypto import run_crypto, sign_transaction_id
+from app.analytics import HISTOGRAM_EDGES
+from app.pipeline import PipelineError
 
 router = APIRouter()
 
 def get_blockchain(request: Request):
-    return request.app.state.get_blockchain()
+    return request.app.state.get_tenant(request).get_blockchain()
 
 def get_wallet_manager(request: Request):
-    return request.app.state.get_wallet_manager()
+    return request.app.state.get_tenant(request).get_wallet_manager()
+
+def get_response_cache(request: Request):
+    return request.app.state.get_tenant(request).get_response_cache()
+
+def get_pipeline(request: Request):
+    return request.app.state.get_pipeline()
+
+def get_queries(request: Request):
+    return request.app.state.get_tenant(request).get_queries()
+
+def get_rate_limiter(request: Request):
+    return request.app.state.get_rate_limiter()
+
+def get_analytics(request: Request):
+    return request.app.state.get_tenant(request).get_analytics()
 
 @router.get("/assignments")
 async def get_assignments(
+    request: Request,
     student_address: str = None,
-    blockchain=Depends(get_blockchain)
+    blockchain=Depends(get_blockchain),
+    cache=Depends(get_response_cache),
+    pipeline=Depends(get_pipeline),
+    queries=Depends(get_queries)
 ):
     """
     Liste les devoirs disponibles pour un étudiant
     """
     try:
-        assignments = blockchain.get_assignments(student_address)
-        return {
-            "success": True,
-            "count": len(assignments),
-            "assignments": assignments
-        }
+        def build():
+            assignments = queries.get_assignments(student_address)
+            return {
+                "success": True,
+                "count": len(assignments),
+                "assignments": assignments
+            }
+        
+        return await cache.respond_async(request, blockchain.content_version(), build, pipeline.scan)
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -33,18 +60,24 @@ async def get_assignments(
 async def submit_assignment(
     submission: SubmissionCreate,
     blockchain=Depends(get_blockchain),
-    wallet_manager=Depends(get_wallet_manager)
+    wallet_manager=Depends(get_wallet_manager),
+    pipeline=Depends(get_pipeline),
+    rate_limiter=Depends(get_rate_limiter),
+    queries=Depends(get_queries)
 ):
     """
     Soumettre un devoir
     """
+    # Refus immédiat, avant tout parcours de la chaîne ou calcul RSA
+    rate_limiter.check("submission", submission.student_address)
+    
     try:
         # Vérifier que l'étudiant existe
         if submission.student_address not in blockchain.participants:
             raise HTTPException(status_code=404, detail="Student not found")
         
         # Vérifier si l'étudiant a déjà soumis ce devoir
-        if blockchain.has_student_submitted(submission.student_address, submission.assignment_id):
+        if queries.has_student_submitted(submission.student_address, submission.assignment_id):
             raise HTTPException(
                 status_code=400, 
                 detail="Vous avez déjà soumis ce devoir"
@@ -67,43 +100,75 @@ async def submit_assignment(
         # Signer la transaction (simulation car on a la clé privée en mémoire)
         wallet = wallet_manager.get_wallet(submission.student_address)
         if wallet:
-            signature = wallet_manager.sign_transaction(
-                transaction.to_dict(), 
-                wallet["private_key"]
+            signature = await run_crypto(
+                pipeline, "sign", sign_transaction_id,
+                transaction.transaction_id, wallet["private_key"]
             )
             transaction.signature = signature
         
+        # Comparer à la date limite (si le devoir est miné et daté)
+        due_timestamp = blockchain.get_deadline(submission.assignment_id)
+        late = due_timestamp is not None and transaction.timestamp > due_timestamp
+        
         # Ajouter à la blockchain
         if blockchain.add_transaction(transaction):
             return TransactionResponse(
                 success=True,
                 transaction_id=transaction.transaction_id,
-                message="Submission received and pending mining"
+                message="Submission received after the deadline and pending mining" if late
+                        else "Submission received and pending mining",
+                data={"late": late, "due_timestamp": due_timestamp}
             )
         else:
             raise HTTPException(status_code=400, detail="Failed to add transaction")
             
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/grades/{student_address}")
 async def get_grades(
     student_address: str,
-    blockchain=Depends(get_blockchain)
+    blockchain=Depends(get_blockchain),
+    pipeline=Depends(get_pipeline),
+    queries=Depends(get_queries)
 ):
     """
     Voir ses notes
     """
     try:
-        grades = blockchain.get_grades(student_address)
+        grades = await pipeline.scan(queries.get_grades, student_address)
         return {
             "success": True,
             "count": len(grades),
             "grades": grades
         }
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/summary/{student_address}")
+async def get_student_summary(
+    student_address: str,
+    analytics=Depends(get_analytics),
+    pipeline=Depends(get_pipeline)
+):
+    """
+    Bilan des notes: moyenne générale, distribution et rang parmi les étudiants notés
+    """
+    summary = await pipeline.scan(analytics.student_summary, student_address)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No grades for this student")
+    
+    return {
+        "success": True,
+        "student_address": student_address,
+        "histogram_edges": HISTOGRAM_EDGES,
+        "summary": summary
+    }
+
 @router.get("/announcements")
 async def get_announcements(
     student_address: str = None,
@@ -1,28 +1,54 @@
+import asyncio
+import time
+
 from fastapi import APIRouter, HTTPException, Request, Depends
 from typing import List
 from app.models import (
-    AssignmentCreate, GradeCreate, TransactionResponse,
+    AssignmentCreate, GradeCreate, BulkGradeCreate, TransactionResponse,
     EncryptionKeyPair, DecryptRequest, AnnouncementCreate
 )
 from app.blockchain import Transaction
+from app.crypto import decrypt_message, generate_rsa_keypair, run_crypto, sign_transaction_id, sign_transactions
+from app.analytics import HISTOGRAM_EDGES
+from app.pipeline import PipelineError
 
 router = APIRouter()
 
 def get_blockchain(request: Request):
-    return request.app.state.get_blockchain()
+    return request.app.state.get_tenant(request).get_blockchain()
 
 def get_wallet_manager(request: Request):
-    return request.app.state.get_wallet_manager()
+    return request.app.state.get_tenant(request).get_wallet_manager()
+
+def get_response_cache(request: Request):
+    return request.app.state.get_tenant(request).get_response_cache()
+
+def get_pipeline(request: Request):
+    return request.app.state.get_pipeline()
+
+def get_queries(request: Request):
+    return request.app.state.get_tenant(request).get_queries()
+
+def get_rate_limiter(request: Request):
+    return request.app.state.get_rate_limiter()
+
+def get_analytics(request: Request):
+    return request.app.state.get_tenant(request).get_analytics()
 
 @router.post("/assignments", response_model=TransactionResponse)
 async def create_assignment(
     assignment: AssignmentCreate,
     blockchain=Depends(get_blockchain),
-    wallet_manager=Depends(get_wallet_manager)
+    wallet_manager=Depends(get_wallet_manager),
+    pipeline=Depends(get_pipeline),
+    rate_limiter=Depends(get_rate_limiter)
 ):
     """
     Créer un nouveau devoir
     """
+    # Refus immédiat, avant tout parcours de la chaîne ou calcul RSA
+    rate_limiter.check("teacher_write", assignment.teacher_address)
+    
     try:
         # Vérifier que c'est bien un prof
         teacher = blockchain.participants.get(assignment.teacher_address)
@@ -32,7 +58,10 @@ async def create_assignment(
         # Récupérer ou générer la clé de chiffrement de l'enseignant
         encryption_keys = wallet_manager.get_encryption_keys(assignment.teacher_address)
         if not encryption_keys:
-            encryption_keys = wallet_manager.generate_encryption_keypair(assignment.teacher_address)
+            private_key, public_key = await run_crypto(pipeline, "keygen", generate_rsa_keypair)
+            encryption_keys = wallet_manager.store_encryption_keypair(
+                assignment.teacher_address, private_key, public_key
+            )
         
         # Créer la transaction
         tx_data = {
@@ -52,9 +81,9 @@ async def create_assignment(
         # Signer
         wallet = wallet_manager.get_wallet(assignment.teacher_address)
         if wallet:
-            signature = wallet_manager.sign_transaction(
-                transaction.to_dict(), 
-                wallet["private_key"]
+            signature = await run_crypto(
+                pipeline, "sign", sign_transaction_id,
+                transaction.transaction_id, wallet["private_key"]
             )
             transaction.signature = signature
             
@@ -67,36 +96,179 @@ async def create_assignment(
         else:
             raise HTTPException(status_code=400, detail="Failed to create assignment")
             
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/submissions/{assignment_id}")
 async def get_submissions(
+    request: Request,
     assignment_id: str,
-    blockchain=Depends(get_blockchain)
+    blockchain=Depends(get_blockchain),
+    cache=Depends(get_response_cache),
+    pipeline=Depends(get_pipeline),
+    queries=Depends(get_queries)
 ):
     """
     Voir les soumissions pour un devoir
     """
     try:
-        submissions = blockchain.get_submissions(assignment_id)
-        return {
-            "success": True,
-            "count": len(submissions),
-            "submissions": submissions
-        }
+        def build():
+            submissions = queries.get_submissions(assignment_id)
+            return {
+                "success": True,
+                "count": len(submissions),
+                "submissions": submissions
+            }
+        
+        return await cache.respond_async(request, blockchain.content_version(), build, pipeline.scan)
+    except PipelineError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/deadlines/upcoming")
+async def get_upcoming_deadlines(
+    hours: float = 24,
+    teacher_address: str = None,
+    blockchain=Depends(get_blockchain)
+):
+    """
+    Devoirs dont la date limite tombe dans les prochaines heures
+    """
+    if hours <= 0:
+        raise HTTPException(status_code=400, detail="hours must be positive")
+    
+    upcoming = blockchain.get_upcoming_deadlines(hours, teacher_address)
+    return {
+        "success": True,
+        "hours": hours,
+        "count": len(upcoming),
+        "assignments": upcoming
+    }
+
+@router.get("/assignments/{assignment_id}/late")
+async def get_late_submissions(
+    assignment_id: str,
+    blockchain=Depends(get_blockchain)
+):
+    """
+    Soumissions reçues après la date limite d'un devoir
+    """
+    due_timestamp = blockchain.get_deadline(assignment_id)
+    late = blockchain.get_late_submissions(assignment_id)
+    return {
+        "success": True,
+        "assignment_id": assignment_id,
+        "due_timestamp": due_timestamp,
+        "count": len(late),
+        "submissions": late
+    }
+
+@router.get("/assignments/{assignment_id}/missing")
+async def get_missing_submissions(
+    assignment_id: str,
+    blockchain=Depends(get_blockchain)
+):
+    """
+    Étudiants qui n'ont pas encore soumis un devoir
+    """
+    missing = blockchain.get_missing_submissions(assignment_id)
+    if missing is None:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    
+    due_timestamp = blockchain.get_deadline(assignment_id)
+    return {
+        "success": True,
+        "assignment_id": assignment_id,
+        "due_timestamp": due_timestamp,
+        "overdue": due_timestamp is not None and time.time() > due_timestamp,
+        "count": len(missing),
+        "students": missing
+    }
+
+@router.get("/analytics/assignments")
+async def get_assignment_analytics(
+    request: Request,
+    blockchain=Depends(get_blockchain),
+    analytics=Depends(get_analytics),
+    cache=Depends(get_response_cache),
+    pipeline=Depends(get_pipeline)
+):
+    """
+    Distribution des notes de chaque devoir (moyenne, écart-type, centiles, histogramme)
+    """
+    try:
+        def build():
+            distributions = analytics.distributions("assignment")
+            return {
+                "success": True,
+                "count": len(distributions),
+                "histogram_edges": HISTOGRAM_EDGES,
+                "assignments": distributions
+            }
+        
+        return await cache.respond_async(request, blockchain.content_version(), build, pipeline.scan)
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/analytics/assignments/{assignment_id}")
+async def get_single_assignment_analytics(
+    assignment_id: str,
+    analytics=Depends(get_analytics),
+    pipeline=Depends(get_pipeline)
+):
+    """
+    Distribution des notes d'un devoir
+    """
+    distribution = await pipeline.scan(analytics.distribution, "assignment", assignment_id)
+    if distribution is None:
+        raise HTTPException(status_code=404, detail="No grades for this assignment")
+    
+    return {
+        "success": True,
+        "assignment_id": assignment_id,
+        "histogram_edges": HISTOGRAM_EDGES,
+        "distribution": distribution
+    }
+
+@router.get("/analytics/teachers/{teacher_address}")
+async def get_teacher_analytics(
+    teacher_address: str,
+    analytics=Depends(get_analytics),
+    pipeline=Depends(get_pipeline)
+):
+    """
+    Distribution des notes attribuées par un enseignant
+    """
+    distribution = await pipeline.scan(analytics.distribution, "teacher", teacher_address)
+    if distribution is None:
+        raise HTTPException(status_code=404, detail="No grades for this teacher")
+    
+    return {
+        "success": True,
+        "teacher_address": teacher_address,
+        "histogram_edges": HISTOGRAM_EDGES,
+        "distribution": distribution
+    }
+
 @router.post("/grade", response_model=TransactionResponse)
 async def grade_submission(
     grade_data: GradeCreate,
     blockchain=Depends(get_blockchain),
-    wallet_manager=Depends(get_wallet_manager)
+    wallet_manager=Depends(get_wallet_manager),
+    pipeline=Depends(get_pipeline),
+    rate_limiter=Depends(get_rate_limiter)
 ):
     """
     Noter une soumission
     """
+    # Refus immédiat, avant tout parcours de la chaîne ou calcul RSA
+    rate_limiter.check("teacher_write", grade_data.teacher_address)
+    
     try:
         # Vérifier que c'est bien un prof
         teacher = blockchain.participants.get(grade_data.teacher_address)
@@ -120,6 +292,7 @@ async def grade_submission(
             
         tx_data = {
             "submission_id": grade_data.submission_id,
+            "assignment_id": assignment_id,
             "grade": grade_data.grade,
             "comment": grade_data.comment
         }
@@ -134,9 +307,9 @@ async def grade_submission(
         # Signer
         wallet = wallet_manager.get_wallet(grade_data.teacher_address)
         if wallet:
-            signature = wallet_manager.sign_transaction(
-                transaction.to_dict(), 
-                wallet["private_key"]
+            signature = await run_crypto(
+                pipeline, "sign", sign_transaction_id,
+                transaction.transaction_id, wallet["private_key"]
             )
             transaction.signature = signature
             
@@ -149,13 +322,108 @@ async def grade_submission(
         else:
             raise HTTPException(status_code=400, detail="Failed to record grade")
             
+    except PipelineError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/grade/bulk", response_model=TransactionResponse)
+async def grade_submissions_bulk(
+    bulk: BulkGradeCreate,
+    blockchain=Depends(get_blockchain),
+    wallet_manager=Depends(get_wallet_manager),
+    pipeline=Depends(get_pipeline),
+    rate_limiter=Depends(get_rate_limiter)
+):
+    """
+    Noter un lot de soumissions
+    
+    Toutes les lignes sont vérifiées avant l'ajout: si une seule est invalide,
+    aucune note n'est enregistrée.
+    """
+    # Refus immédiat, avant tout parcours de la chaîne ou calcul RSA
+    rate_limiter.check("teacher_write", bulk.teacher_address)
+    
+    try:
+        # Vérifier que c'est bien un prof
+        teacher = blockchain.participants.get(bulk.teacher_address)
+        if not teacher or teacher["role"] != "TEACHER":
+            raise HTTPException(status_code=403, detail="Only teachers can grade")
+        
+        # Résoudre les soumissions et vérifier les doublons en une seule passe
+        errors = []
+        transactions = []
+        batch_keys = set()
+        
+        for row_number, entry in enumerate(bulk.grades):
+            submission = blockchain.get_submission_by_id(entry.submission_id)
+            if not submission:
+                errors.append({"row": row_number, "error": "Submission not found"})
+                continue
+            
+            student_address = submission["sender"]
+            assignment_id = submission["data"].get("assignment_id")
+            key = (bulk.teacher_address, student_address, assignment_id)
+            
+            if key in batch_keys or blockchain.has_teacher_graded(*key):
+                errors.append({
+                    "row": row_number,
+                    "error": "Correction already submitted for this student for this assignment"
+                })
+                continue
+            batch_keys.add(key)
+            
+            transactions.append(Transaction(
+                sender=bulk.teacher_address,
+                receiver=student_address,
+                transaction_type="GRADE",
+                data={
+                    "submission_id": entry.submission_id,
+                    "assignment_id": assignment_id,
+                    "grade": entry.grade,
+                    "comment": entry.comment
+                }
+            ))
+        
+        if errors:
+            raise HTTPException(status_code=400, detail={"message": "No grade recorded", "errors": errors})
+        
+        # Signer en parallèle, un lot par processus
+        wallet = wallet_manager.get_wallet(bulk.teacher_address)
+        if wallet and transactions:
+            tx_ids = [tx.transaction_id for tx in transactions]
+            chunk_size = -(-len(tx_ids) // pipeline.lanes["crypto"].concurrency)
+            chunks = await asyncio.gather(*(
+                run_crypto(
+                    pipeline, "sign_batch", sign_transactions,
+                    tx_ids[i:i + chunk_size], wallet["private_key"]
+                )
+                for i in range(0, len(tx_ids), chunk_size)
+            ))
+            signatures = [signature for chunk in chunks for signature in chunk]
+            for transaction, signature in zip(transactions, signatures):
+                transaction.signature = signature
+        
+        if blockchain.add_transactions(transactions):
+            return TransactionResponse(
+                success=True,
+                transaction_id=None,
+                message=f"{len(transactions)} grades recorded and pending mining",
+                data={"transaction_ids": [tx.transaction_id for tx in transactions]}
+            )
+        else:
+            raise HTTPException(status_code=400, detail="Failed to record grades")
+    
+    except (HTTPException, PipelineError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/encryption-keys", response_model=EncryptionKeyPair)
 async def generate_encryption_keys(
     teacher_address: str,
-    wallet_manager=Depends(get_wallet_manager)
+    wallet_manager=Depends(get_wallet_manager),
+    pipeline=Depends(get_pipeline)
 ):
     """
     Génère une paire de clés RSA pour le chiffrement des soumissions
@@ -167,8 +435,11 @@ async def generate_encryption_keys(
             return EncryptionKeyPair(**existing_keys)
         
         # Générer de nouvelles clés
-        keypair = wallet_manager.generate_encryption_keypair(teacher_address)
+        private_key, public_key = await run_crypto(pipeline, "keygen", generate_rsa_keypair)
+        keypair = wallet_manager.store_encryption_keypair(teacher_address, private_key, public_key)
         return EncryptionKeyPair(**keypair)
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -193,11 +464,16 @@ async def get_encryption_public_key(
 async def create_announcement(
     announcement: AnnouncementCreate,
     blockchain=Depends(get_blockchain),
-    wallet_manager=Depends(get_wallet_manager)
+    wallet_manager=Depends(get_wallet_manager),
+    pipeline=Depends(get_pipeline),
+    rate_limiter=Depends(get_rate_limiter)
 ):
     """
     Créer une annonce pour les étudiants
     """
+    # Refus immédiat, avant tout parcours de la chaîne ou calcul RSA
+    rate_limiter.check("announcement", announcement.teacher_address)
+    
     try:
         # Vérifier que c'est bien un prof
         teacher = blockchain.participants.get(announcement.teacher_address)
@@ -210,8 +486,13 @@ async def create_announcement(
             "message": announcement.message
         }
         
-        # Déterminer le destinataire
-        receiver = "ALL" if not announcement.target_students else ",".join(announcement.target_students)
+        # Déterminer le(s) destinataire(s)
+        if not announcement.target_students:
+            receiver = "ALL"
+        else:
+            recipients = list(dict.fromkeys(announcement.target_students))
+            tx_data["recipients"] = recipients
+            receiver = recipients[0] if len(recipients) == 1 else "MULTIPLE"
         
         transaction = Transaction(
             sender=announcement.teacher_address,
@@ -223,9 +504,9 @@ async def create_announcement(
         # Signer
         wallet = wallet_manager.get_wallet(announcement.teacher_address)
         if wallet:
-            signature = wallet_manager.sign_transaction(
-                transaction.to_dict(),
-                wallet["private_key"]
+            signature = await run_crypto(
+                pipeline, "sign", sign_transaction_id,
+                transaction.transaction_id, wallet["private_key"]
             )
             transaction.signature = signature
         
@@ -238,13 +519,16 @@ async def create_announcement(
         else:
             raise HTTPException(status_code=400, detail="Failed to create announcement")
     
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/decrypt-submission")
 async def decrypt_submission(
     request: DecryptRequest,
-    wallet_manager=Depends(get_wallet_manager)
+    wallet_manager=Depends(get_wallet_manager),
+    pipeline=Depends(get_pipeline)
 ):
     """
     Déchiffre une soumission avec la clé privée de l'enseignant
@@ -256,9 +540,9 @@ async def decrypt_submission(
             raise HTTPException(status_code=404, detail="Encryption keys not found")
         
         # Déchiffrer le contenu
-        decrypted_content = wallet_manager.decrypt_with_private_key(
-            request.encrypted_content,
-            keys["private_key"]
+        decrypted_content = await run_crypto(
+            pipeline, "decrypt", decrypt_message,
+            request.encrypted_content, keys["private_key"]
         )
         
         if decrypted_content is None:
@@ -269,5 +553,7 @@ async def decrypt_submission(
             "decrypted_content": decrypted_content
         }
     
+    except PipelineError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,262 @@
+"""
+Recherche plein texte dans les devoirs et les annonces
+
+Index inversé en mémoire, alimenté bloc par bloc: les champs title,
+description et message sont découpés en mots, mis en minuscules et sans
+accents ("Évaluation" et "evaluation" se confondent). Une requête renvoie les
+documents contenant tous ses mots (le dernier peut être un préfixe), classés
+par BM25.
+
+Chaque liste de documents est triée par impact (part BM25 liée à la fréquence
+du mot, calculée à l'indexation), à la première requête qui l'utilise. La
+recherche parcourt la liste du mot le plus rare dans cet ordre et s'arrête dès
+que les documents restants ne peuvent plus entrer dans les résultats: le coût
+suit le nombre de résultats demandés plutôt que la taille du corpus.
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from app.blockchain import Block, Blockchain, get_recipients
+
+INDEXED_TYPES = ("ASSIGNMENT", "ANNOUNCEMENT")
+FIELD_WEIGHTS = {"title": 2.0, "description": 1.0, "message": 1.0}
+PREFIX_EXPANSIONS = 32  # Nombre maximal de mots couverts par un préfixe
+BM25_K1 = 1.2
+BM25_B = 0.75
+IMPACT_STEPS = 16  # Impacts arrondis au 1/16: documents comparables à égalité, arrêt anticipé plus tôt
+
+# Mots vides (déjà sans accents), ignorés à l'indexation comme dans les requêtes
+STOP_WORDS = frozenset("""
+    a au aux avec ce ces d dans de des du elle en et il ils je l la le les leur lui
+    m ma mais me mes n ne nous on ou par pas pour qu que qui s sa se ses son sur t
+    ta te tes ton tu un une vos votre vous y est sont
+""".split())
+
+_WORD = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents ni ligatures ("Œuvre élève" -> "oeuvre eleve")"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold().replace("œ", "oe").replace("æ", "ae"))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    """Mots normalisés d'un texte, mots vides exclus"""
+    return [word for word in _WORD.findall(fold(text)) if word not in STOP_WORDS]
+
+
+def _idf(document_frequency: int, count: int) -> float:
+    return math.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+class _Term:
+    """Mot de la requête: un mot de l'index, ou plusieurs pour un préfixe
+
+    Pour un préfixe, un document garde l'impact maximal parmi ses mots et la
+    fréquence documentaire est majorée par la somme de celles des mots.
+    """
+
+    def __init__(self, postings: List[Dict[int, float]], ordered: List[List[Tuple[float, int]]]):
+        self.postings = postings
+        self.ordered = ordered
+        self.frequency = sum(len(p) for p in postings)
+        self.max_impact = max((-o[0][0] for o in ordered), default=0.0)
+
+    def impact(self, position: int) -> Optional[float]:
+        impacts = [p[position] for p in self.postings if position in p]
+        return max(impacts) if impacts else None
+
+    def ranked(self):
+        """(impact, position) par impact décroissant puis du plus récent au plus ancien, sans doublons"""
+        if len(self.ordered) == 1:
+            for negative_impact, negative_position in self.ordered[0]:
+                yield -negative_impact, -negative_position
+            return
+        seen = set()
+        for negative_impact, negative_position in heapq.merge(*self.ordered):
+            if negative_position not in seen:  # Première occurrence = impact maximal
+                seen.add(negative_position)
+                yield -negative_impact, -negative_position
+
+
+class SearchIndex:
+    """Index inversé des devoirs et annonces minés"""
+
+    def __init__(self):
+        self.documents: List[Dict] = []  # Position -> résumé du document
+        self.postings: Dict[str, Dict[int, float]] = {}  # Mot -> position -> impact
+        self.ordered: Dict[str, List[Tuple[float, int]]] = {}  # Mot -> (-impact, -position), trié
+        self._unsorted: set = set()  # Mots dont la liste ordered est à retrier
+        self.vocabulary: List[str] = []  # Mots triés, pour la recherche par préfixe
+        self.total_length = 0.0
+        self._lock = threading.Lock()
+
+    # --- Alimentation ---
+
+    def load(self, blockchain: Blockchain):
+        """Indexe les devoirs et annonces existants (état élagué puis blocs complets)"""
+        with self._lock:
+            for assignment in blockchain.pruned_state["assignments"]:
+                self._add(assignment, assignment["block_index"])
+            for announcement in blockchain.announcements:
+                if announcement["block_index"] < blockchain.first_unpruned_index():
+                    self._add(announcement, announcement["block_index"])
+            for block in blockchain.chain[blockchain.first_unpruned_index():]:
+                self._add_block(block)
+
+    def apply_block(self, block: Block):
+        """Indexe les devoirs et annonces d'un bloc"""
+        with self._lock:
+            self._add_block(block)
+
+    def listener(self):
+        """Écouteur à brancher sur Blockchain.add_listener"""
+        def on_event(event_type: str, payload):
+            if event_type == "block":
+                self.apply_block(payload)
+        return on_event
+
+    def _add_block(self, block: Block):
+        for tx in block.transactions:
+            if tx["type"] in INDEXED_TYPES:
+                self._add(tx, block.index)
+
+    def _add(self, tx: Dict, block_index: int):
+        frequencies: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            value = tx["data"].get(field)
+            if isinstance(value, str):
+                for word in tokenize(value):
+                    frequencies[word] = frequencies.get(word, 0.0) + weight
+        if not frequencies:
+            return
+
+        position = len(self.documents)
+        recipients = get_recipients(tx)
+        self.documents.append({
+            "transaction_id": tx["transaction_id"],
+            "type": tx["type"],
+            "sender": tx["sender"],
+            "recipients": None if recipients is None else frozenset(recipients),
+            "title": tx["data"].get("title"),
+            "block_index": block_index,
+            "timestamp": tx["timestamp"]
+        })
+        length = sum(frequencies.values())
+        self.total_length += length
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length * len(self.documents) / self.total_length)
+
+        for word, frequency in frequencies.items():
+            postings = self.postings.get(word)
+            if postings is None:
+                postings = self.postings[word] = {}
+                self.ordered[word] = []
+                bisect.insort(self.vocabulary, word)
+            impact = round(frequency * (BM25_K1 + 1) / (frequency + norm) * IMPACT_STEPS) / IMPACT_STEPS
+            postings[position] = impact
+            self.ordered[word].append((-impact, -position))
+            self._unsorted.add(word)
+
+    # --- Requêtes ---
+
+    def search(self, query: str, teacher_address: Optional[str] = None,
+               student_address: Optional[str] = None, transaction_type: Optional[str] = None,
+               limit: int = 20) -> List[Dict]:
+        """Documents contenant tous les mots de la requête, du plus pertinent au moins pertinent
+
+        teacher_address restreint aux documents publiés par cet enseignant,
+        student_address à ceux visibles par cet étudiant (destinés à "ALL" ou à lui).
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+
+        with self._lock:
+            # Le dernier mot est aussi un préfixe ("evalu" -> "evaluation", "evalue"...)
+            terms = [self._term([word]) for word in words[:-1]]
+            terms.append(self._term(self._expand(words[-1])))
+            if not all(term.frequency for term in terms):
+                return []
+
+            count = len(self.documents)
+            terms.sort(key=lambda term: term.frequency)
+            driver, others = terms[0], terms[1:]
+            driver_idf = _idf(driver.frequency, count)
+            others = [(term, _idf(term.frequency, count)) for term in others]
+            # Score maximal que les autres mots peuvent encore apporter
+            others_bound = sum(idf * term.max_impact for term, idf in others)
+
+            best: List[Tuple[float, int]] = []  # Tas des meilleurs (score, position)
+            for impact, position in driver.ranked():
+                score = driver_idf * impact
+                if len(best) == limit and score + others_bound <= best[0][0]:
+                    break
+                if not self._visible(self.documents[position], teacher_address,
+                                     student_address, transaction_type):
+                    continue
+                for term, idf in others:
+                    impact = term.impact(position)
+                    if impact is None:
+                        break
+                    score += idf * impact
+                else:
+                    if len(best) < limit:
+                        heapq.heappush(best, (score, position))
+                    elif (score, position) > best[0]:
+                        heapq.heapreplace(best, (score, position))
+
+            return [
+                {**self._public(self.documents[position]), "score": round(score, 4)}
+                for score, position in sorted(best, reverse=True)
+            ]
+
+    def _expand(self, prefix: str) -> List[str]:
+        """Mots du vocabulaire commençant par prefix"""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        words = []
+        for word in self.vocabulary[start:start + PREFIX_EXPANSIONS]:
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+        return words
+
+    def _term(self, words: List[str]) -> "_Term":
+        words = [word for word in words if word in self.postings]
+        for word in self._unsorted.intersection(words):
+            # Liste déjà triée suivie des ajouts récents: tri quasi linéaire
+            self.ordered[word].sort()
+            self._unsorted.discard(word)
+        return _Term([self.postings[word] for word in words], [self.ordered[word] for word in words])
+
+    @staticmethod
+    def _visible(document: Dict, teacher_address: Optional[str], student_address: Optional[str],
+                 transaction_type: Optional[str]) -> bool:
+        if transaction_type is not None and document["type"] != transaction_type:
+            return False
+        if teacher_address is not None and document["sender"] != teacher_address:
+            return False
+        if student_address is not None:
+            recipients = document["recipients"]
+            return recipients is None or student_address in recipients
+        return True
+
+    @staticmethod
+    def _public(document: Dict) -> Dict:
+        recipients = document["recipients"]
+        return {
+            **document,
+            "recipients": None if recipients is None else sorted(recipients)
+        }
+
+    def get_stats(self) -> Dict:
+        """Taille de l'index"""
+        return {
+            "documents": len(self.documents),
+            "terms": len(self.postings)
+        }
@@ -0,0 +1,298 @@
+"""
+Générateur de chaînes synthétiques pour les tests de charge et les benchmarks
+
+Produit, à partir d'une graine, une chaîne réaliste (enseignants, étudiants,
+devoirs, soumissions, notes, annonces) sans passer par l'API:
+horloge simulée, difficulté faible et un petit lot de clés RSA réutilisées.
+
+Usage (depuis backend/):
+    python -m app.synthetic --blocks 10000 --students 2000 --output chain.json.gz
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.blockchain import Block, Blockchain, Transaction, GENESIS_TIMESTAMP
+from app.crypto import WalletManager, generate_rsa_keypair, transaction_signer
+
+FORMAT_VERSION = 2  # 2: hash des blocs calculé sur la racine de Merkle
+
+
+class SyntheticChainGenerator:
+    """Construit une chaîne déterministe de taille configurable"""
+
+    def __init__(self, blocks: int = 1000, teachers: int = 20, students: int = 1000,
+                 tx_per_block: int = 20, seed: int = 0, difficulty: int = 1,
+                 key_pool_size: int = 4, key_bits: int = 1024, sign: bool = False,
+                 start_time: float = GENESIS_TIMESTAMP + 86400.0, block_interval: float = 60.0):
+        self.blocks = blocks
+        self.teacher_count = teachers
+        self.student_count = students
+        self.tx_per_block = tx_per_block
+        self.seed = seed
+        self.difficulty = difficulty
+        self.key_pool_size = key_pool_size
+        self.key_bits = key_bits
+        self.sign = sign
+        self.start_time = start_time
+        self.block_interval = block_interval
+
+        self.rng = random.Random(seed)
+        self.clock = start_time
+        self.blockchain: Optional[Blockchain] = None
+        self.wallet_manager: Optional[WalletManager] = None
+        self.key_pool: List[Tuple[str, str]] = []
+        self.signers: Dict[str, Callable[[str], str]] = {}  # Clé privée du lot -> fonction de signature
+        self.teachers: List[str] = []
+        self.students: List[str] = []
+        self.assignments: List[Dict] = []  # {"id", "teacher"}
+        self.submissions: List[Dict] = []  # {"id", "student", "assignment_id", "teacher"}
+        self.ungraded: List[Dict] = []
+        self.submitted: set = set()
+
+    def generate(self) -> Tuple[Blockchain, WalletManager]:
+        """Génère la chaîne et le wallet manager associé"""
+        self.blockchain = Blockchain(difficulty=self.difficulty)
+        self.wallet_manager = WalletManager()
+
+        self._generate_keys()
+        self._register_participants()
+
+        while len(self.blockchain.chain) < self.blocks:
+            for _ in range(self.tx_per_block):
+                self._add_activity()
+            self._mine()
+
+        return self.blockchain, self.wallet_manager
+
+    def fixtures(self) -> Dict:
+        """Identifiants utiles aux requêtes de test"""
+        return {
+            "teachers": self.teachers,
+            "students": self.students,
+            "assignments": [a["id"] for a in self.assignments],
+            "submissions": [s["id"] for s in self.submissions]
+        }
+
+    def _tick(self) -> float:
+        self.clock += self.block_interval / (self.tx_per_block + 1)
+        return self.clock
+
+    def _generate_keys(self):
+        """Génère un petit lot de clés déterministes, partagées entre participants"""
+        randbytes = random.Random(self.seed).randbytes
+        self.key_pool = [
+            generate_rsa_keypair(self.key_bits, randfunc=randbytes)
+            for _ in range(self.key_pool_size)
+        ]
+
+    def _register_participants(self):
+        """Enregistre enseignants et étudiants, par blocs de taille raisonnable"""
+        per_block = max(self.tx_per_block, 500)
+        roster = (
+            [("TEACHER", i) for i in range(self.teacher_count)] +
+            [("STUDENT", i) for i in range(self.student_count)]
+        )
+
+        for start in range(0, len(roster), per_block):
+            entries = []
+            for role, i in roster[start:start + per_block]:
+                # Les clés sont partagées: l'adresse est dérivée de la graine et non de la clé publique
+                address = hashlib.sha256(f"{self.seed}:{role}:{i}".encode()).hexdigest()[:40]
+                private_key, public_key = self.key_pool[i % len(self.key_pool)]
+                name = f"{'Enseignant' if role == 'TEACHER' else 'Etudiant'} {i}"
+                email = f"{role.lower()}{i}@example.edu"
+
+                self.wallet_manager.store_wallet(private_key, public_key, role, name, email, address=address)
+                entries.append({
+                    "address": address,
+                    "role": role,
+                    "public_key": public_key,
+                    "name": name,
+                    "email": email,
+                    "timestamp": self._tick()
+                })
+                (self.teachers if role == "TEACHER" else self.students).append(address)
+
+            self.blockchain.register_participants(entries)
+            self._mine()
+
+    def _add_activity(self):
+        """Ajoute une transaction tirée selon la répartition d'un semestre"""
+        kind = self.rng.random()
+        if kind < 0.04 or not self.assignments:
+            self._add_assignment()
+        elif kind < 0.55:
+            self._add_submission()
+        elif kind < 0.9 and self.ungraded:
+            self._add_grade()
+        else:
+            self._add_announcement()
+
+    def _add_assignment(self):
+        teacher = self.rng.choice(self.teachers)
+        tx = Transaction(teacher, "ALL", "ASSIGNMENT", {
+            "title": f"Devoir {len(self.assignments) + 1}",
+            "description": f"Exercices du chapitre {self.rng.randint(1, 12)}",
+            "due_date": time.strftime("%Y-%m-%dT%H:%M", time.gmtime(self.clock + self.rng.randint(1, 14) * 86400)),
+            "encryption_public_key": self.key_pool[0][1]
+        }, timestamp=self._tick())
+        self._finalize(tx, teacher)
+        self.assignments.append({"id": tx.transaction_id, "teacher": teacher})
+
+    def _add_submission(self):
+        assignment = self.rng.choice(self.assignments[-20:])
+        student = self.rng.choice(self.students)
+        if (student, assignment["id"]) in self.submitted:
+            return self._add_announcement()
+
+        tx = Transaction(student, "SYSTEM", "SUBMISSION", {
+            "assignment_id": assignment["id"],
+            "encrypted_content": base64.b64encode(self.rng.randbytes(256)).decode(),
+            "student_name": self.wallet_manager.get_wallet(student)["name"]
+        }, timestamp=self._tick())
+        self._finalize(tx, student)
+        self.submitted.add((student, assignment["id"]))
+        submission = {
+            "id": tx.transaction_id,
+            "student": student,
+            "assignment_id": assignment["id"],
+            "teacher": assignment["teacher"]
+        }
+        self.submissions.append(submission)
+        self.ungraded.append(submission)
+
+    def _add_grade(self):
+        submission = self.ungraded.pop(self.rng.randrange(len(self.ungraded)))
+        tx = Transaction(submission["teacher"], submission["student"], "GRADE", {
+            "submission_id": submission["id"],
+            "assignment_id": submission["assignment_id"],
+            "grade": round(min(20.0, max(0.0, self.rng.gauss(12, 3.5))), 1),
+            "comment": self.rng.choice(["Bien", "Peut mieux faire", "Très bien", "Insuffisant"])
+        }, timestamp=self._tick())
+        self._finalize(tx, submission["teacher"])
+
+    def _add_announcement(self):
+        teacher = self.rng.choice(self.teachers)
+        data = {"title": "Annonce", "message": "Rappel: rendu des devoirs avant la date limite"}
+        receiver = "ALL"
+        if self.rng.random() < 0.3:
+            data["recipients"] = self.rng.sample(self.students, min(len(self.students), self.rng.randint(2, 30)))
+            receiver = "MULTIPLE"
+        tx = Transaction(teacher, receiver, "ANNOUNCEMENT", data, timestamp=self._tick())
+        self._finalize(tx, teacher)
+
+    def _finalize(self, tx: Transaction, signer: str):
+        """Signe si demandé et ajoute au mempool"""
+        if self.sign:
+            private_key = self.wallet_manager.get_wallet(signer)["private_key"]
+            sign = self.signers.get(private_key)
+            if sign is None:
+                # Clés partagées: chacune n'est importée qu'une fois
+                sign = self.signers[private_key] = transaction_signer(private_key)
+            tx.signature = sign(tx.transaction_id)
+        self.blockchain.add_transaction(tx)
+
+    def _mine(self):
+        """Mine le mempool dans un bloc horodaté par l'horloge simulée (sans récompense)"""
+        blockchain = self.blockchain
+        block = Block(
+            len(blockchain.chain),
+            self.clock,
+            [tx.to_dict() for tx in blockchain.pending_transactions],
+            blockchain.get_latest_block().hash
+        )
+        block.mine_block(self.difficulty)
+        blockchain.append_block(block)
+        blockchain.pending_transactions = []
+        blockchain.pending_ids = set()
+        self.clock += self.block_interval
+
+
+def save_chain(path: str, blockchain: Blockchain, wallet_manager: WalletManager,
+               params: Optional[Dict] = None, include_private_keys: bool = False):
+    """Sauvegarde une chaîne et ses portefeuilles (gzip si le chemin finit par .gz)
+
+    Les clés privées ne sont écrites, en clair, que si include_private_keys est vrai.
+    """
+    wallets = {
+        address: wallet if include_private_keys else {k: v for k, v in wallet.items() if k != "private_key"}
+        for address, wallet in wallet_manager.wallets.items()
+    }
+    payload = {
+        "format": FORMAT_VERSION,
+        "params": params or {},
+        "difficulty": blockchain.difficulty,
+        "participants": blockchain.participants,
+        "wallets": wallets,
+        "chain": blockchain.export_chain()
+    }
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        json.dump(payload, f)
+
+
+def load_chain(path: str) -> Tuple[Blockchain, WalletManager]:
+    """Recharge une chaîne sauvegardée par save_chain, sans re-miner"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        payload = json.load(f)
+
+    if payload.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported chain file format: {payload.get('format')}")
+
+    blocks = []
+    for block_data in payload["chain"]:
+        block = Block.from_dict(block_data)
+        if block.hash != block_data["hash"]:
+            raise ValueError(f"Block {block.index} hash mismatch")
+        blocks.append(block)
+
+    blockchain = Blockchain(difficulty=payload["difficulty"], genesis_block=blocks[0])
+    for block in blocks[1:]:
+        blockchain.append_block(block)
+
+    blockchain.participants = payload["participants"]
+    blockchain.participants_version += 1
+
+    wallet_manager = WalletManager()
+    wallet_manager.wallets = payload["wallets"]
+    return blockchain, wallet_manager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère une chaîne synthétique déterministe")
+    parser.add_argument("--blocks", type=int, default=1000)
+    parser.add_argument("--teachers", type=int, default=20)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--tx-per-block", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--difficulty", type=int, default=1)
+    parser.add_argument("--sign", action="store_true", help="Signer les transactions")
+    parser.add_argument("--include-private-keys", action="store_true",
+                        help="Écrire les clés privées (en clair) dans le fichier de sortie")
+    parser.add_argument("--output", required=True, help="Fichier de sortie (.json ou .json.gz)")
+    args = parser.parse_args(argv)
+
+    params = {
+        "blocks": args.blocks,
+        "teachers": args.teachers,
+        "students": args.students,
+        "tx_per_block": args.tx_per_block,
+        "seed": args.seed,
+        "difficulty": args.difficulty,
+        "sign": args.sign
+    }
+    started = time.perf_counter()
+    blockchain, wallet_manager = SyntheticChainGenerator(**params).generate()
+    save_chain(args.output, blockchain, wallet_manager, params, include_private_keys=args.include_private_keys)
+    print(f"Generated {len(blockchain.chain)} blocks in {time.perf_counter() - started:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+Établissements et cours servis par un même processus (tenants)
+
+Chaque tenant a sa propre chaîne (avec sa file de transactions en attente et
+ses index), ses portefeuilles, son cache de réponses et son flux d'événements.
+Le pool de processus, les voies d'exécution et la limitation de débit restent
+partagés par l'application.
+
+Les tenants inactifs sont sauvegardés dans TENANT_DATA_DIR (un fichier gzip
+par tenant) puis retirés de la mémoire; ils sont rechargés à la requête
+suivante. Le tenant "default", construit à partir de la configuration de
+l'application (amorçage, genesis, élagage, miroir SQLite), reste en mémoire.
+"""
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.analytics import GradeAnalytics
+from app.blockchain import Block, Blockchain, Transaction
+from app.bootstrap import validate_headers
+from app.cache import ResponseCache
+from app.crypto import WalletManager
+from app.events import EventBroker
+from app.querystore import QueryStore
+from app.search import SearchIndex
+
+DEFAULT_TENANT = "default"
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+FORMAT_VERSION = 1
+MIN_IDLE_SECONDS = 300.0  # Inactivité minimale avant une éviction pour dépassement de max_loaded
+
+
+class TenantNotFound(Exception):
+    """Tenant inconnu (converti en 404)"""
+
+    def __init__(self, tenant_id: str):
+        super().__init__(f"Unknown tenant: {tenant_id}")
+        self.tenant_id = tenant_id
+
+
+class Tenant:
+    """Chaîne, portefeuilles et index d'un établissement ou d'un cours"""
+
+    def __init__(self, tenant_id: str, blockchain: Blockchain, wallet_manager: WalletManager,
+                 query_store=None):
+        self.tenant_id = tenant_id
+        self.blockchain = blockchain
+        self.wallet_manager = wallet_manager
+        self.response_cache = ResponseCache(namespace=tenant_id)
+        self.event_broker = EventBroker()
+        self.analytics = GradeAnalytics()
+        self.search_index = SearchIndex()
+        self.query_store = query_store
+        self.active = 0  # Requêtes en cours
+        self.last_used = time.monotonic()
+
+        blockchain.add_listener(self.event_broker.publish)
+        self.analytics.load(blockchain)
+        blockchain.add_listener(self.analytics.listener(blockchain))
+        self.search_index.load(blockchain)
+        blockchain.add_listener(self.search_index.listener())
+        if query_store is not None:
+            blockchain.add_listener(query_store.listener(blockchain))
+
+    def get_blockchain(self):
+        return self.blockchain
+
+    def get_wallet_manager(self):
+        return self.wallet_manager
+
+    def get_response_cache(self):
+        return self.response_cache
+
+    def get_event_broker(self):
+        return self.event_broker
+
+    def get_queries(self):
+        """Source des requêtes de lecture: le miroir SQLite s'il est configuré, sinon la chaîne"""
+        return self.query_store or self.blockchain
+
+    def get_analytics(self):
+        return self.analytics
+
+    def get_search_index(self):
+        return self.search_index
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def is_idle(self, idle_seconds: float, now: float) -> bool:
+        """Aucune requête en cours, aucun abonné au flux et inactif depuis idle_seconds"""
+        return (self.active == 0 and self.event_broker.get_stats()["subscribers"] == 0
+                and now - self.last_used >= idle_seconds)
+
+    def get_stats(self) -> Dict:
+        return {
+            "tenant_id": self.tenant_id,
+            "loaded": True,
+            "height": len(self.blockchain.chain),
+            "pending_transactions": len(self.blockchain.pending_transactions),
+            "participants": len(self.blockchain.participants),
+            "persistent_keys": self.wallet_manager.is_persistent(),
+            "active_requests": self.active,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1)
+        }
+
+    def close(self):
+        if self.query_store is not None:
+            self.query_store.close()
+        self.wallet_manager.close()
+
+
+class TenantRegistry:
+    """Tenants chargés en mémoire et leur sauvegarde sur disque
+
+    Sans data_dir, les tenants ne vivent qu'en mémoire et ne sont jamais évincés.
+    Le verrou du registre ne protège que les dictionnaires: lecture, rejeu et
+    écriture des fichiers se font hors du verrou. Un tenant en cours de
+    chargement, de création ou de sauvegarde a une entrée dans transitions; les
+    requêtes qui le demandent attendent la fin de l'opération.
+    """
+
+    def __init__(self, data_dir: Optional[str], create_blockchain: Callable[[str], Blockchain],
+                 max_loaded: int = 32, idle_seconds: float = 600.0,
+                 create_wallet_manager: Callable[[str], WalletManager] = lambda tenant_id: WalletManager(),
+                 create_query_store: Callable[[str], Optional[QueryStore]] = lambda tenant_id: None):
+        self.data_dir = data_dir
+        self.create_blockchain = create_blockchain  # Chaîne vide configurée (élagage, compression)
+        self.create_wallet_manager = create_wallet_manager
+        self.create_query_store = create_query_store
+        self.max_loaded = max_loaded
+        self.idle_seconds = idle_seconds
+        self.tenants: Dict[str, Tenant] = {}
+        self.transitions: Dict[str, Future] = {}  # tenant_id -> chargement, création ou sauvegarde en cours
+        self.pinned = set()  # Jamais évincés
+        self.evictions = 0
+        self.loads = 0
+        self._lock = threading.RLock()
+
+    def add(self, tenant: Tenant, pinned: bool = False):
+        """Enregistre un tenant déjà construit (tenant par défaut)"""
+        with self._lock:
+            self.tenants[tenant.tenant_id] = tenant
+            if pinned:
+                self.pinned.add(tenant.tenant_id)
+
+    def get(self, tenant_id: str) -> Tenant:
+        """Retourne un tenant, rechargé depuis le disque s'il a été évincé"""
+        return self._get(tenant_id, acquire=False)
+
+    def acquire(self, tenant_id: str) -> Tenant:
+        """Comme get, en marquant le tenant utilisé (non évinçable) jusqu'à release"""
+        return self._get(tenant_id, acquire=True)
+
+    def release(self, tenant: Tenant):
+        with self._lock:
+            tenant.active -= 1
+            tenant.touch()
+
+    def _get(self, tenant_id: str, acquire: bool) -> Tenant:
+        while True:
+            with self._lock:
+                tenant = self.tenants.get(tenant_id)
+                if tenant is not None:
+                    tenant.touch()
+                    if acquire:
+                        tenant.active += 1
+                    return tenant
+                transition = self.transitions.get(tenant_id)
+                if transition is None:
+                    if not self._exists_on_disk(tenant_id):
+                        raise TenantNotFound(tenant_id)
+                    transition = self.transitions[tenant_id] = Future()
+                    break
+            # Chargement ou sauvegarde par un autre thread: attendre puis réessayer
+            # (un chargement en échec est retenté par le thread suivant)
+            transition.exception()
+
+        try:
+            tenant = self._load(tenant_id)
+        except BaseException as e:
+            with self._lock:
+                del self.transitions[tenant_id]
+            transition.set_exception(e)
+            raise
+
+        with self._lock:
+            self.tenants[tenant_id] = tenant
+            del self.transitions[tenant_id]
+            self.loads += 1
+            tenant.touch()
+            if acquire:
+                tenant.active += 1
+            evicted = self._evict_over_capacity()
+        transition.set_result(tenant)
+        self._finish_evictions(evicted)
+        return tenant
+
+    def create(self, tenant_id: str) -> Tenant:
+        """Crée un tenant vide (chaîne réduite au genesis) et le sauvegarde"""
+        if not TENANT_ID_PATTERN.match(tenant_id):
+            raise ValueError("Tenant id must match [a-z0-9][a-z0-9_-]{0,63}")
+        with self._lock:
+            if (tenant_id == DEFAULT_TENANT or tenant_id in self.tenants or tenant_id in self.transitions
+                    or self._exists_on_disk(tenant_id)):
+                raise ValueError(f"Tenant already exists: {tenant_id}")
+            transition = self.transitions[tenant_id] = Future()
+
+        try:
+            tenant = self._build(tenant_id, self.create_blockchain(tenant_id))
+            self._save(tenant)
+        except BaseException as e:
+            with self._lock:
+                del self.transitions[tenant_id]
+            transition.set_exception(e)
+            raise
+
+        with self._lock:
+            self.tenants[tenant_id] = tenant
+            del self.transitions[tenant_id]
+            evicted = self._evict_over_capacity()
+        transition.set_result(tenant)
+        self._finish_evictions(evicted)
+        return tenant
+
+    def loaded(self) -> List[Tenant]:
+        """Tenants actuellement en mémoire"""
+        with self._lock:
+            return list(self.tenants.values())
+
+    def list(self) -> List[Dict]:
+        """Tenants connus (chargés ou sur disque)"""
+        with self._lock:
+            loaded = {tenant_id: tenant.get_stats() for tenant_id, tenant in self.tenants.items()}
+        stored = []
+        if self.data_dir and os.path.isdir(self.data_dir):
+            stored = [name[:-len(".json.gz")] for name in os.listdir(self.data_dir) if name.endswith(".json.gz")]
+        unloaded = [{"tenant_id": tenant_id, "loaded": False} for tenant_id in stored if tenant_id not in loaded]
+        return sorted(list(loaded.values()) + unloaded, key=lambda entry: entry["tenant_id"])
+
+    # --- Éviction ---
+
+    def evict_idle(self) -> List[str]:
+        """Évince les tenants inactifs depuis idle_seconds; retourne leurs identifiants"""
+        now = time.monotonic()
+        with self._lock:
+            evicted = [
+                self._detach(tenant_id) for tenant_id, tenant in list(self.tenants.items())
+                if self._evictable(tenant_id) and tenant.is_idle(self.idle_seconds, now)
+            ]
+        self._finish_evictions(evicted)
+        return [tenant.tenant_id for tenant, _ in evicted]
+
+    def evict(self, tenant_id: str) -> bool:
+        """Évince un tenant s'il n'est pas utilisé; False sinon"""
+        with self._lock:
+            tenant = self.tenants.get(tenant_id)
+            if tenant is None or not self._evictable(tenant_id) or not tenant.is_idle(0, time.monotonic()):
+                return False
+            evicted = [self._detach(tenant_id)]
+        self._finish_evictions(evicted)
+        return True
+
+    def _evict_over_capacity(self) -> List[Tuple[Tenant, Future]]:
+        """Au-delà de max_loaded, détache les moins récemment utilisés (s'ils sont inactifs)
+
+        À appeler sous le verrou; la sauvegarde se fait ensuite par _finish_evictions.
+        """
+        excess = len(self.tenants) - self.max_loaded
+        if excess <= 0:
+            return []
+        now = time.monotonic()
+        candidates = sorted(
+            (tenant for tenant_id, tenant in self.tenants.items()
+             if self._evictable(tenant_id) and tenant.is_idle(MIN_IDLE_SECONDS, now)),
+            key=lambda tenant: tenant.last_used
+        )
+        return [self._detach(tenant.tenant_id) for tenant in candidates[:excess]]
+
+    def _evictable(self, tenant_id: str) -> bool:
+        return self.data_dir is not None and tenant_id not in self.pinned
+
+    def _detach(self, tenant_id: str) -> Tuple[Tenant, Future]:
+        """Retire un tenant de la mémoire (sous le verrou); il reste en transition jusqu'à sa sauvegarde"""
+        tenant = self.tenants.pop(tenant_id)
+        transition = self.transitions[tenant_id] = Future()
+        return tenant, transition
+
+    def _finish_evictions(self, evicted: List[Tuple[Tenant, Future]]):
+        """Sauvegarde et ferme les tenants détachés, hors du verrou
+
+        Un tenant dont la sauvegarde échoue est remis en mémoire; la première
+        erreur est levée une fois tous les tenants traités.
+        """
+        error = None
+        for tenant, transition in evicted:
+            try:
+                self._save(tenant)
+            except Exception as e:
+                error = error or e
+                with self._lock:
+                    self.tenants[tenant.tenant_id] = tenant
+                    del self.transitions[tenant.tenant_id]
+                transition.set_result(None)
+                continue
+            tenant.close()
+            with self._lock:
+                del self.transitions[tenant.tenant_id]
+                self.evictions += 1
+            transition.set_result(None)
+        if error is not None:
+            raise error
+
+    # --- Sauvegarde ---
+
+    def _path(self, tenant_id: str) -> str:
+        return os.path.join(self.data_dir, f"{tenant_id}.json.gz")
+
+    def _exists_on_disk(self, tenant_id: str) -> bool:
+        return (self.data_dir is not None and TENANT_ID_PATTERN.match(tenant_id) is not None
+                and os.path.exists(self._path(tenant_id)))
+
+    def _save(self, tenant: Tenant):
+        """Écrit la chaîne, la file d'attente et les portefeuilles d'un tenant (remplacement atomique)
+
+        Les clés déjà conservées dans une base chiffrée ne sont pas recopiées. Si la
+        chaîne est élaguée, l'état dérivé des blocs élagués est sauvegardé (snapshot).
+        """
+        if self.data_dir is None:
+            return
+        blockchain = tenant.blockchain
+        payload = {
+            "format": FORMAT_VERSION,
+            "tenant_id": tenant.tenant_id,
+            "difficulty": blockchain.difficulty,
+            "participants": blockchain.participants,
+            "pending": [tx.to_dict() for tx in blockchain.pending_transactions],
+            "chain": blockchain.export_chain()
+        }
+        if blockchain.pruned_height > 1:
+            payload["snapshot"] = blockchain.create_snapshot(blockchain.pruned_height - 1)
+        if not tenant.wallet_manager.is_persistent():
+            payload["wallets"] = tenant.wallet_manager.wallets
+            payload["encryption_keys"] = tenant.wallet_manager.encryption_keys
+        os.makedirs(self.data_dir, exist_ok=True)
+        path = self._path(tenant.tenant_id)
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(path + ".tmp", path)
+
+    def _load(self, tenant_id: str) -> Tenant:
+        """Relit un tenant sauvegardé dans une chaîne configurée par create_blockchain
+
+        Les blocs sont vérifiés comme à l'amorçage (hash, liaison, preuve de travail)
+        et le genesis doit être celui de la configuration.
+        """
+        with gzip.open(self._path(tenant_id), "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported tenant file format: {payload.get('format')}")
+
+        blockchain = self.create_blockchain(tenant_id)
+        if payload["difficulty"] != blockchain.difficulty:
+            raise ValueError(f"Tenant {tenant_id}: difficulty {payload['difficulty']} does not match "
+                             f"the configured difficulty {blockchain.difficulty}")
+
+        blocks = []
+        for block_data in payload["chain"]:
+            block = Block.from_dict(block_data)
+            if block.hash != block_data["hash"]:
+                raise ValueError(f"Tenant {tenant_id}: block {block.index} hash mismatch")
+            blocks.append(block)
+        if blocks[0].hash != blockchain.chain[0].hash:
+            raise ValueError(f"Tenant {tenant_id}: unexpected genesis block")
+        validate_headers(blocks, blockchain.difficulty)
+
+        # Blocs élagués: en-têtes seuls et état dérivé sauvegardé, puis rejeu des blocs complets
+        snapshot = payload.get("snapshot")
+        if snapshot is not None:
+            blockchain.chain.extend(blocks[1:snapshot["height"] + 1])
+            blockchain.restore_snapshot(snapshot)
+        for block in blocks[len(blockchain.chain):]:
+            blockchain.append_block(block)
+        blockchain.participants = payload["participants"]
+        blockchain.participants_version += 1
+        blockchain.add_transactions([Transaction.from_dict(tx) for tx in payload["pending"]])
+
+        # Clés sauvegardées en clair: reprises telles quelles, ou importées dans la base chiffrée
+        wallet_manager = self.create_wallet_manager(tenant_id)
+        wallet_manager.wallets.update(payload.get("wallets", {}))
+        wallet_manager.encryption_keys.update(payload.get("encryption_keys", {}))
+        return self._build(tenant_id, blockchain, wallet_manager)
+
+    def _build(self, tenant_id: str, blockchain: Blockchain,
+               wallet_manager: Optional[WalletManager] = None) -> Tenant:
+        """Construit un tenant et son miroir SQLite (s'il est configuré), synchronisé avec la chaîne"""
+        query_store = self.create_query_store(tenant_id)
+        if query_store is not None:
+            query_store.sync(blockchain)
+        return Tenant(tenant_id, blockchain, wallet_manager or self.create_wallet_manager(tenant_id), query_store)
+
+    def shutdown(self):
+        """Sauvegarde les tenants chargés (hors tenants épinglés) et libère leurs ressources"""
+        with self._lock:
+            tenants = list(self.tenants.items())
+        for tenant_id, tenant in tenants:
+            if tenant_id not in self.pinned:
+                self._save(tenant)
+            tenant.close()
+
+    def get_stats(self) -> Dict:
+        return {
+            "loaded": len(self.tenants),
+            "max_loaded": self.max_loaded,
+            "idle_seconds": self.idle_seconds,
+            "persistent": self.data_dir is not None,
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
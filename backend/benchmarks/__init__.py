@@ -0,0 +1,6 @@
+"""
+Benchmarks du moteur blockchain, de la cryptographie et de l'API
+
+Usage (depuis backend/):
+    python -m benchmarks --quick --output bench.json
+"""
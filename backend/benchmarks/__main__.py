@@ -0,0 +1,74 @@
+"""
+Point d'entrée: python -m benchmarks [--quick] [--suite core crypto http] [--output fichier.json]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_core import bench_chain, bench_mining
+from benchmarks.bench_crypto import bench_crypto
+
+
+def git_commit() -> str:
+    """Retourne le commit courant, s'il est disponible"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du système blockchain éducatif")
+    parser.add_argument("--suite", nargs="+", choices=["mining", "chain", "crypto", "http"],
+                        default=["mining", "chain", "crypto", "http"])
+    parser.add_argument("--quick", action="store_true", help="Tailles réduites (vérification rapide)")
+    parser.add_argument("--output", help="Fichier JSON de sortie (stdout par défaut)")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        difficulties, mined_blocks, sizes, repeat, requests, concurrency = [1, 2, 3], 3, [200, 1000], 3, 50, 5
+    else:
+        difficulties, mined_blocks, sizes, repeat, requests, concurrency = [2, 3, 4, 5], 5, [1000, 10000, 100000], 10, 500, 20
+
+    results = []
+    suites = {
+        "mining": lambda: bench_mining(difficulties, mined_blocks),
+        "chain": lambda: bench_chain(sizes, repeat),
+        "crypto": lambda: bench_crypto(repeat),
+        "http": lambda: _bench_http(requests, concurrency)
+    }
+    for suite in args.suite:
+        print(f"Running {suite}...", file=sys.stderr)
+        for result in suites[suite]():
+            results.append({"suite": suite, **result})
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick
+        },
+        "results": results
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+def _bench_http(requests: int, concurrency: int):
+    from benchmarks.bench_http import bench_http
+    return bench_http(requests, concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmarks du moteur: preuve de travail, validation de chaîne et requêtes
+"""
+import time
+from typing import Dict, List
+
+from app.analytics import GradeAnalytics
+from app.blockchain import Block
+from app.search import SearchIndex
+from benchmarks.common import build_chain, measure
+
+
+def bench_mining(difficulties: List[int], blocks_per_difficulty: int) -> List[Dict]:
+    """Mesure le débit de hachage de Block.mine_block"""
+    results = []
+    transactions = [{"type": "GRADE", "data": {"grade": i}} for i in range(20)]
+
+    for difficulty in difficulties:
+        attempts = 0
+        elapsed = 0.0
+        for i in range(blocks_per_difficulty):
+            block = Block(i, time.time(), transactions, "0" * 64)
+            t0 = time.perf_counter()
+            block.mine_block(difficulty)
+            elapsed += time.perf_counter() - t0
+            attempts += block.nonce + 1
+
+        results.append({
+            "name": "mine_block",
+            "params": {"difficulty": difficulty, "blocks": blocks_per_difficulty},
+            "hashes_per_sec": attempts / elapsed if elapsed else None,
+            "mean_block_ms": elapsed / blocks_per_difficulty * 1000
+        })
+    return results
+
+
+def bench_chain(sizes: List[int], repeat: int) -> List[Dict]:
+    """Mesure is_chain_valid et chaque méthode get_* sur des chaînes de tailles croissantes"""
+    results = []
+
+    for size in sizes:
+        t0 = time.perf_counter()
+        blockchain, fixtures = build_chain(size)
+        build_seconds = time.perf_counter() - t0
+
+        student = fixtures["students"][0]
+        teacher = fixtures["teachers"][0]
+        assignment_id = fixtures["assignments"][len(fixtures["assignments"]) // 2]
+        submission_id = fixtures["submissions"][-1]
+        analytics = GradeAnalytics()
+        analytics.load(blockchain)
+        search_index = SearchIndex()
+        search_index.load(blockchain)
+
+        def grade_distributions():
+            analytics._invalidate()  # Mesurer le calcul et non le cache
+            return analytics.distributions("assignment"), analytics.distributions("student")
+
+        queries = {
+            "is_chain_valid": blockchain.is_chain_valid,
+            "get_transactions_by_address": lambda: blockchain.get_transactions_by_address(student),
+            "get_assignments": lambda: blockchain.get_assignments(student),
+            "get_submissions": lambda: blockchain.get_submissions(assignment_id),
+            "get_submission_by_id": lambda: blockchain.get_submission_by_id(submission_id),
+            "get_grades": lambda: blockchain.get_grades(student),
+            "get_announcements": lambda: blockchain.get_announcements(student),
+            "has_student_submitted": lambda: blockchain.has_student_submitted(student, assignment_id),
+            "has_teacher_graded": lambda: blockchain.has_teacher_graded(teacher, student, assignment_id),
+            "export_chain": blockchain.export_chain,
+            "get_chain_info": blockchain.get_chain_info,
+            "grade_distributions": grade_distributions,
+            "search": lambda: search_index.search("chapitre 7 devo", student_address=student)
+        }
+
+        results.append({
+            "name": "build_chain",
+            "params": {"blocks": size},
+            "seconds": build_seconds
+        })
+        for name, query in queries.items():
+            results.append({
+                "name": name,
+                "params": {"blocks": size},
+                **measure(query, repeat=repeat)
+            })
+    return results
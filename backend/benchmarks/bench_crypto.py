@@ -0,0 +1,53 @@
+"""
+Benchmarks des opérations RSA du WalletManager
+"""
+from typing import Dict, List
+
+from app.crypto import WalletManager
+from benchmarks.common import measure
+
+
+def bench_crypto(repeat: int) -> List[Dict]:
+    """Mesure génération de clés, signature, vérification, chiffrement et déchiffrement"""
+    wallet_manager = WalletManager()
+    wallet = wallet_manager.create_wallet("STUDENT", "Bench", "bench@example.com")
+    keypair = wallet_manager.generate_encryption_keypair("bench")
+
+    transaction = {
+        "transaction_id": "0" * 64,
+        "sender": wallet["address"],
+        "receiver": "SYSTEM",
+        "type": "SUBMISSION",
+        "data": {"assignment_id": "1" * 64, "encrypted_content": "x" * 344},
+        "timestamp": 0.0,
+        "signature": None
+    }
+    signature = wallet_manager.sign_transaction(transaction, wallet["private_key"])
+    id_signature = wallet_manager.sign_transaction_id(transaction["transaction_id"], wallet["private_key"])
+    ciphertext = wallet_manager.encrypt_with_public_key("Réponse au devoir", keypair["public_key"])
+
+    operations = {
+        "create_wallet": (lambda: wallet_manager.create_wallet("STUDENT", "Bench", "bench@example.com"),
+                          max(1, repeat // 5)),
+        "sign_transaction": (lambda: wallet_manager.sign_transaction(transaction, wallet["private_key"]),
+                             repeat),
+        "verify_signature": (lambda: wallet_manager.verify_signature(transaction, signature, wallet["public_key"]),
+                             repeat),
+        "sign_transaction_id": (lambda: wallet_manager.sign_transaction_id(transaction["transaction_id"],
+                                                                           wallet["private_key"]),
+                                repeat),
+        "verify_transaction_id": (lambda: wallet_manager.verify_transaction_id(transaction["transaction_id"],
+                                                                               id_signature, wallet["public_key"]),
+                                  repeat),
+        "encrypt_with_public_key": (lambda: wallet_manager.encrypt_with_public_key("Réponse au devoir",
+                                                                                    keypair["public_key"]),
+                                    repeat),
+        "decrypt_with_private_key": (lambda: wallet_manager.decrypt_with_private_key(ciphertext,
+                                                                                     keypair["private_key"]),
+                                     repeat)
+    }
+
+    return [
+        {"name": name, "params": {"key_bits": 2048}, **measure(operation, repeat=runs)}
+        for name, (operation, runs) in operations.items()
+    ]
@@ -0,0 +1,106 @@
+"""
+Générateur de charge HTTP en processus (transport ASGI, sans réseau)
+
+Nécessite httpx (voir requirements-dev.txt).
+"""
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.main import app, AppState
+from benchmarks.common import percentile
+
+
+async def _load(client, method: str, url: str, total: int, concurrency: int,
+                request_kwargs: Optional[Callable[[int], Dict]] = None, **kwargs) -> Dict:
+    """Envoie total requêtes avec concurrency requêtes simultanées
+
+    request_kwargs(i), s'il est fourni, donne les arguments de la i-ème requête.
+    Lève RuntimeError si la majorité des réponses ne sont pas des 2xx: on
+    mesurerait alors des refus, pas la route.
+    """
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    remaining = iter(range(total))
+
+    async def worker():
+        for i in remaining:
+            t0 = time.perf_counter()
+            response = await client.request(method, url, **(request_kwargs(i) if request_kwargs else kwargs))
+            latencies.append(time.perf_counter() - t0)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    failures = sum(count for status, count in statuses.items() if not 200 <= status < 300)
+    if failures * 2 > total:
+        raise RuntimeError(f"{method} {url}: {failures}/{total} non-2xx responses {statuses}")
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "requests_per_sec": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "statuses": statuses
+    }
+
+
+async def _run(total: int, concurrency: int) -> List[Dict]:
+    import httpx
+
+    app.state = AppState()
+    app.state.get_rate_limiter().rules.clear()  # On mesure les routes, pas les refus 429
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Données minimales: un enseignant, un étudiant, un devoir, une soumission
+        teacher = (await client.post("/api/blockchain/register", json={
+            "name": "Prof", "email": "prof@example.com", "role": "TEACHER"})).json()
+        student = (await client.post("/api/blockchain/register", json={
+            "name": "Etudiant", "email": "etudiant@example.com", "role": "STUDENT"})).json()
+        assignment = (await client.post("/api/teacher/assignments", json={
+            "title": "Devoir", "description": "...", "due_date": "2026-06-30",
+            "teacher_address": teacher["address"]})).json()
+        await client.post("/api/blockchain/mine", json={"miner_address": teacher["address"]})
+
+        endpoints = [
+            ("GET", "/api/blockchain/info", {}),
+            ("GET", "/api/blockchain/chain", {}),
+            ("GET", "/api/blockchain/statistics", {}),
+            ("GET", "/api/blockchain/participants", {}),
+            ("GET", f"/api/blockchain/transactions/{student['address']}", {}),
+            ("GET", "/api/student/assignments", {"params": {"student_address": student["address"]}}),
+            ("GET", f"/api/student/grades/{student['address']}", {}),
+            ("GET", "/api/student/announcements", {"params": {"student_address": student["address"]}}),
+            ("GET", f"/api/teacher/submissions/{assignment['transaction_id']}", {}),
+        ]
+
+        results = []
+        for method, url, kwargs in endpoints:
+            stats = await _load(client, method, url, total, concurrency, **kwargs)
+            results.append({"name": f"{method} {url.split('/')[2]}/{url.split('/')[3]}",
+                            "params": {"url": url}, **stats})
+
+        # Un devoir par soumission: une seconde soumission au même devoir serait refusée (400)
+        submissions = max(1, total // 10)
+        assignment_ids = []
+        for i in range(submissions):
+            created = (await client.post("/api/teacher/assignments", json={
+                "title": f"Devoir {i}", "description": "...", "due_date": "2026-06-30",
+                "teacher_address": teacher["address"]})).json()
+            assignment_ids.append(created["transaction_id"])
+
+        submit = await _load(client, "POST", "/api/student/submit", submissions, concurrency,
+                             request_kwargs=lambda i: {"json": {
+                                 "assignment_id": assignment_ids[i], "student_address": student["address"],
+                                 "encrypted_content": "x" * 344, "student_name": "Etudiant"}})
+        results.append({"name": "POST student/submit", "params": {}, **submit})
+        return results
+
+
+def bench_http(total: int, concurrency: int) -> List[Dict]:
+    """Mesure latence et débit des principales routes"""
+    return asyncio.run(_run(total, concurrency))
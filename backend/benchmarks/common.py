@@ -0,0 +1,57 @@
+"""
+Outils communs aux benchmarks: mesure, percentiles et chaînes de test
+"""
+import statistics
+import time
+from typing import Callable, Dict, List, Tuple
+
+from app.blockchain import Blockchain
+from app.synthetic import SyntheticChainGenerator
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Percentile par rang le plus proche (samples non vide)"""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: List[float]) -> Dict:
+    """Résume une série de durées (secondes) en millisecondes"""
+    return {
+        "runs": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "min_ms": min(samples) * 1000,
+        "max_ms": max(samples) * 1000
+    }
+
+
+def measure(func: Callable, repeat: int = 5, min_time: float = 0.0) -> Dict:
+    """Exécute func plusieurs fois et retourne le résumé des durées"""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+
+def build_chain(blocks: int, tx_per_block: int = 10, difficulty: int = 1,
+                seed: int = 0) -> Tuple[Blockchain, Dict]:
+    """Construit une chaîne synthétique non signée: seul le coût des parcours est mesuré
+
+    Retourne la chaîne et les identifiants utiles aux requêtes (étudiants, devoirs, soumissions).
+    """
+    generator = SyntheticChainGenerator(
+        blocks=blocks,
+        teachers=max(2, blocks // 200),
+        students=max(10, blocks // 2),
+        tx_per_block=tx_per_block,
+        seed=seed,
+        difficulty=difficulty
+    )
+    blockchain, _ = generator.generate()
+    return blockchain, generator.fixtures()
@@ -0,0 +1,78 @@
+import pytest
+
+from app import analytics
+from app.analytics import DIMENSIONS, GradeAnalytics
+from app.synthetic import SyntheticChainGenerator
+
+
+@pytest.fixture(scope="module")
+def chain():
+    blockchain, _ = SyntheticChainGenerator(blocks=40, teachers=3, students=25, tx_per_block=15, seed=7).generate()
+    return blockchain
+
+
+def loaded(blockchain):
+    grades = GradeAnalytics()
+    grades.load(blockchain)
+    return grades
+
+
+def assert_same_distributions(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, row in expected.items():
+        other = actual[key]
+        assert other["count"] == row["count"]
+        assert other["histogram"] == row["histogram"]
+        for field in ("mean", "std", "min", "max"):
+            assert other[field] == pytest.approx(row[field], abs=1e-3), (key, field)
+        for label, value in row["percentiles"].items():
+            assert other["percentiles"][label] == pytest.approx(value, abs=1e-3), (key, label)
+
+
+def test_python_distribution_of_known_grades():
+    grades = GradeAnalytics()
+    for value, student in [(8.0, "alice"), (12.0, "alice"), (19.5, "alice"), (20.0, "bob")]:
+        grades.grades.append(value)
+        grades.codes["assignment"].append(grades._code("assignment", "devoir"))
+        grades.codes["teacher"].append(grades._code("teacher", "prof"))
+        grades.codes["student"].append(grades._code("student", student))
+
+    rows = analytics._describe_python(grades.grades, grades.codes["student"], len(grades.keys["student"]))
+
+    alice = rows[0]
+    assert alice["count"] == 3
+    assert alice["mean"] == pytest.approx(13.167)
+    assert (alice["min"], alice["max"]) == (8.0, 19.5)
+    assert alice["percentiles"]["p50"] == 12.0
+    assert alice["percentiles"]["p25"] == 10.0
+    assert alice["histogram"][4] == 1 and alice["histogram"][6] == 1 and alice["histogram"][9] == 1
+    assert rows[1]["histogram"][9] == 1  # 20/20 tombe dans le dernier intervalle
+
+
+def test_numpy_and_python_paths_agree(chain, monkeypatch):
+    pytest.importorskip("numpy")
+    with_numpy = {dimension: loaded(chain).distributions(dimension) for dimension in DIMENSIONS}
+
+    monkeypatch.setattr(analytics, "np", None)
+    for dimension in DIMENSIONS:
+        assert_same_distributions(loaded(chain).distributions(dimension), with_numpy[dimension])
+
+
+def test_blocks_merged_into_sorted_grades_match_a_full_load(chain):
+    grades = GradeAnalytics()
+    for block in chain.chain:
+        grades.apply_block(block, chain)
+        grades.distributions("assignment")  # Tri (ou fusion) après chaque bloc
+
+    reference = loaded(chain)
+    if analytics.np is not None:
+        values, value_order, ordered = grades._sorted
+        assert (value_order == analytics.np.argsort(values, kind="stable")).all()
+        assert (ordered == values[value_order]).all()
+    for dimension in DIMENSIONS:
+        assert_same_distributions(grades.distributions(dimension), reference.distributions(dimension))
+    assert grades.student_summary(chain_student(chain)) == reference.student_summary(chain_student(chain))
+
+
+def chain_student(blockchain):
+    return next(tx["receiver"] for block in blockchain.chain for tx in block.transactions if tx["type"] == "GRADE")
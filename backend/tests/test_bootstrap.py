@@ -0,0 +1,111 @@
+import copy
+import json
+
+import pytest
+
+from app.blockchain import Block, Blockchain
+from app.bootstrap import SnapshotMismatch, backfill_bodies, export_bootstrap, load_bootstrap, state_digest
+
+DIFFICULTY = 2
+
+
+@pytest.fixture(scope="module")
+def chain():
+    blockchain = Blockchain(difficulty=DIFFICULTY)
+    for i in range(3):
+        blockchain.register_participant(f"student-{i}", "STUDENT", f"public-key-{i}", f"Student {i}",
+                                        f"student{i}@example.com")
+        blockchain.mine_pending_transactions("miner")
+    return blockchain
+
+
+@pytest.fixture
+def bundle(chain):
+    return json.loads(json.dumps(export_bootstrap(chain)))
+
+
+def bodies(chain):
+    return [(block.index, json.loads(json.dumps(block.transactions))) for block in chain.chain]
+
+
+def tamper_public_key(bundle):
+    """Remplace la clé d'un participant et recalcule l'empreinte du paquet, comme le ferait un attaquant"""
+    bundle["snapshot"]["participants"]["student-1"]["public_key"] = "attacker-key"
+    bundle["state_digest"] = state_digest(bundle["snapshot"])
+    return bundle
+
+
+def test_trusted_bundle_loads_and_backfill_verifies_state(chain, bundle):
+    blockchain = load_bootstrap(copy.deepcopy(bundle), trusted_hash=chain.get_latest_block().hash,
+                                trusted_state_digest=bundle["state_digest"])
+
+    report = backfill_bodies(blockchain, bodies(chain), bundle["snapshot"])
+
+    assert report["state"] == "verified"
+    assert report["rejected"] == []
+    assert blockchain.participants["student-1"]["public_key"] == "public-key-1"
+
+
+def test_tampered_snapshot_is_rejected_by_trusted_digest(chain, bundle):
+    trusted_digest = bundle["state_digest"]
+    tampered = tamper_public_key(bundle)
+
+    with pytest.raises(ValueError, match="trusted state digest"):
+        load_bootstrap(tampered, trusted_hash=chain.get_latest_block().hash, trusted_state_digest=trusted_digest)
+
+
+def test_tampered_snapshot_fails_backfill(chain, bundle):
+    tampered = tamper_public_key(bundle)
+    blockchain = load_bootstrap(copy.deepcopy(tampered), trusted_hash=chain.get_latest_block().hash)
+
+    with pytest.raises(SnapshotMismatch) as excinfo:
+        backfill_bodies(blockchain, bodies(chain), tampered["snapshot"])
+    assert excinfo.value.sections == ["participants"]
+
+
+def test_backfill_with_missing_bodies_is_incomplete(chain, bundle):
+    blockchain = load_bootstrap(copy.deepcopy(bundle))
+
+    report = backfill_bodies(blockchain, bodies(chain)[:-1], bundle["snapshot"])
+
+    assert report["state"] == "incomplete"
+
+
+def test_snapshot_edited_without_digest_is_rejected(bundle):
+    bundle["snapshot"]["participants"]["student-1"]["public_key"] = "attacker-key"
+
+    with pytest.raises(ValueError, match="digest mismatch"):
+        load_bootstrap(bundle)
+
+
+def test_tampered_header_is_rejected(bundle):
+    bundle["headers"][2]["merkle_root"] = "0" * 64
+
+    with pytest.raises(ValueError, match="header hash mismatch"):
+        load_bootstrap(bundle)
+
+
+def test_rehashed_header_breaks_the_link(bundle):
+    header = bundle["headers"][1]
+    header["merkle_root"] = "0" * 64
+    header["hash"] = Block.from_header(header).hash
+
+    with pytest.raises(ValueError, match="not linked|proof of work"):
+        load_bootstrap(bundle)
+
+
+def test_header_without_proof_of_work_is_rejected(bundle):
+    header = bundle["headers"][-1]
+    while True:
+        header["nonce"] += 1
+        header["hash"] = Block.from_header(header).hash
+        if not header["hash"].startswith("0" * DIFFICULTY):
+            break
+
+    with pytest.raises(ValueError, match="proof of work"):
+        load_bootstrap(bundle)
+
+
+def test_untrusted_tip_is_rejected(bundle):
+    with pytest.raises(ValueError, match="trusted hash"):
+        load_bootstrap(bundle, trusted_hash="0" * 64)
@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.blockchain import Blockchain, Transaction, parse_due_date
+
+END_OF_JUNE_30 = datetime(2026, 7, 1, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2026-06-30", END_OF_JUNE_30),  # Date seule: fin de la journée
+    ("20260630", END_OF_JUNE_30),
+    (" 2026-06-30 ", END_OF_JUNE_30),
+    ("2026-06-30T18:00", datetime(2026, 6, 30, 18, tzinfo=timezone.utc).timestamp()),
+    ("2026-06-30T18:00+02:00", datetime(2026, 6, 30, 16, tzinfo=timezone.utc).timestamp()),
+    ("2026-06-30 00:00", datetime(2026, 6, 30, tzinfo=timezone.utc).timestamp()),  # Heure explicite
+    (1782864000, 1782864000.0),
+    ("demain", None),
+    (True, None),
+    (None, None),
+])
+def test_parse_due_date(value, expected):
+    assert parse_due_date(value) == expected
+
+
+def submit(blockchain, student, assignment_id, timestamp):
+    blockchain.add_transaction(Transaction(student, "SYSTEM", "SUBMISSION", {"assignment_id": assignment_id},
+                                           timestamp=timestamp))
+
+
+def test_submission_is_late_only_after_the_end_of_the_due_day():
+    blockchain = Blockchain(difficulty=1)
+    assignment = Transaction("teacher", "ALL", "ASSIGNMENT", {"title": "Devoir", "due_date": "2026-06-30"},
+                             timestamp=END_OF_JUNE_30 - 7 * 86400)
+    blockchain.add_transaction(assignment)
+    blockchain.mine_pending_transactions("miner")
+    assert blockchain.get_deadline(assignment.transaction_id) == END_OF_JUNE_30
+
+    submit(blockchain, "evening", assignment.transaction_id, END_OF_JUNE_30 - 60)  # 23:59 le jour même
+    submit(blockchain, "midnight", assignment.transaction_id, END_OF_JUNE_30)
+    submit(blockchain, "late", assignment.transaction_id, END_OF_JUNE_30 + 0.5)
+    blockchain.mine_pending_transactions("miner")
+
+    late = blockchain.get_late_submissions(assignment.transaction_id)
+    assert [submission["student_address"] for submission in late] == ["late"]
+    assert late[0]["late_by"] == pytest.approx(0.5)
@@ -0,0 +1,92 @@
+import os
+import sqlite3
+
+import pytest
+
+from app.keystore import InvalidMasterKey, KeyStore
+
+MASTER_KEY = "correct horse battery staple"
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = str(tmp_path / "tenant.keys.db")
+    store = KeyStore(path, MASTER_KEY)
+    store.put("wallet", "alice", {"address": "alice", "private_key": "PEM-ALICE", "role": "STUDENT"})
+    store.put("wallet", "bob", {"address": "bob", "private_key": "PEM-BOB", "role": "TEACHER"})
+    store.put("encryption", "bob", {"address": "bob", "private_key": "PEM-BOB-ENC"})
+    store.close()
+    return path
+
+
+def copy_secret(path, source, target):
+    """Recopie le secret chiffré d'une ligne sur une autre, directement dans la base"""
+    conn = sqlite3.connect(path)
+    nonce, ciphertext, tag = conn.execute(
+        "SELECT nonce, ciphertext, tag FROM keys WHERE kind = ? AND address = ?", source
+    ).fetchone()
+    conn.execute("UPDATE keys SET nonce = ?, ciphertext = ?, tag = ? WHERE kind = ? AND address = ?",
+                 (nonce, ciphertext, tag, *target))
+    conn.commit()
+    conn.close()
+
+
+def test_entries_survive_reopening(store_path):
+    store = KeyStore(store_path, MASTER_KEY)
+
+    assert store.get("wallet", "alice") == {"address": "alice", "private_key": "PEM-ALICE", "role": "STUDENT"}
+    assert store.get("encryption", "bob")["private_key"] == "PEM-BOB-ENC"
+    assert store.get("wallet", "carol") is None
+
+
+def test_private_keys_are_not_stored_in_clear(store_path):
+    raw = b""
+    for path in (store_path, store_path + "-wal"):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                raw += f.read()
+
+    assert b"STUDENT" in raw  # Champs publics en clair: la base a bien été lue
+
+    assert b"PEM-ALICE" not in raw
+    assert b"PEM-BOB" not in raw
+
+
+def test_wrong_master_key_is_rejected(store_path):
+    with pytest.raises(InvalidMasterKey):
+        KeyStore(store_path, "wrong passphrase")
+
+
+def test_empty_master_key_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        KeyStore(str(tmp_path / "keys.db"), "")
+
+
+def test_entry_swapped_between_addresses_does_not_decrypt(store_path):
+    copy_secret(store_path, ("wallet", "alice"), ("wallet", "bob"))
+    store = KeyStore(store_path, MASTER_KEY)
+
+    with pytest.raises(ValueError):
+        store.get("wallet", "bob")
+    assert store.get("wallet", "alice")["private_key"] == "PEM-ALICE"
+
+
+def test_entry_swapped_between_kinds_does_not_decrypt(store_path):
+    copy_secret(store_path, ("wallet", "bob"), ("encryption", "bob"))
+    store = KeyStore(store_path, MASTER_KEY)
+
+    with pytest.raises(ValueError):
+        store.get("encryption", "bob")
+
+
+def test_tampered_ciphertext_does_not_decrypt(store_path):
+    conn = sqlite3.connect(store_path)
+    ciphertext = conn.execute("SELECT ciphertext FROM keys WHERE kind = 'wallet' AND address = 'alice'").fetchone()[0]
+    conn.execute("UPDATE keys SET ciphertext = ? WHERE kind = 'wallet' AND address = 'alice'",
+                 (bytes([ciphertext[0] ^ 1]) + ciphertext[1:],))
+    conn.commit()
+    conn.close()
+    store = KeyStore(store_path, MASTER_KEY)
+
+    with pytest.raises(ValueError):
+        store.get("wallet", "alice")
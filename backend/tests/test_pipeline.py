@@ -0,0 +1,138 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.pipeline import ExecutionPipeline, FairLane, Overloaded
+
+
+def make_pipeline(**options):
+    pipeline = ExecutionPipeline(lambda: None, scan_threads=1, **options)
+    pipeline.lanes["scan"].queue_limit = 1
+    return pipeline
+
+
+def test_full_queue_is_rejected_with_503():
+    async def scenario():
+        pipeline = make_pipeline()
+        release = threading.Event()
+        try:
+            running = asyncio.ensure_future(pipeline.scan(release.wait))
+            await asyncio.sleep(0.05)
+            queued = asyncio.ensure_future(pipeline.scan(lambda: "queued"))
+            await asyncio.sleep(0.05)
+
+            with pytest.raises(Overloaded) as rejected:
+                await pipeline.scan(lambda: "rejected")
+        finally:
+            release.set()
+
+        assert await running is True
+        assert await queued == "queued"
+        pipeline.shutdown()
+        return rejected.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.lane == "scan"
+
+
+def test_fair_lane_rejects_beyond_per_key_limit():
+    async def scenario():
+        lane = FairLane("mining", 1, queue_limit=10, per_key_limit=1)
+        await lane.acquire(1.0, "a")
+        waiter = asyncio.ensure_future(lane.acquire(1.0, "a"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(Overloaded):
+            await lane.acquire(1.0, "a")
+        other = asyncio.ensure_future(lane.acquire(1.0, "b"))  # Une autre clé reste admise
+        await asyncio.sleep(0)
+        assert lane.waiting == 2
+
+        lane.release()
+        await waiter
+        lane.release()
+        await other
+        lane.release()
+        assert lane.available == 1
+
+    asyncio.run(scenario())
+
+
+def test_fair_lane_alternates_between_keys():
+    async def scenario():
+        lane = FairLane("mining", 1, queue_limit=10, per_key_limit=10)
+        gate = asyncio.Event()
+        order = []
+
+        async def job(key, n):
+            await lane.acquire(1.0, key)
+            order.append(f"{key}{n}")
+            await gate.wait()
+            lane.release()
+
+        # "a" enchaîne quatre demandes avant que "b" n'arrive
+        jobs = [asyncio.ensure_future(job("a", n)) for n in range(4)]
+        await asyncio.sleep(0)
+        jobs += [asyncio.ensure_future(job("b", n)) for n in range(2)]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*jobs)
+        return order, lane
+
+    order, lane = asyncio.run(scenario())
+    assert order == ["a0", "a1", "b0", "a2", "b1", "a3"]
+    assert lane.available == 1 and lane.waiting == 0 and not lane._queues
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        lane = FairLane("mining", 1, queue_limit=10, per_key_limit=10)
+        await lane.acquire(1.0, "a")
+        cancelled = asyncio.ensure_future(lane.acquire(1.0, "b"))
+        waiter = asyncio.ensure_future(lane.acquire(1.0, "c"))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert lane.waiting == 1 and list(lane._queues) == ["c"]
+
+        lane.release()
+        await asyncio.wait_for(waiter, 1.0)  # La place va au suivant, pas au demandeur annulé
+        lane.release()
+        return lane
+
+    lane = asyncio.run(scenario())
+    assert lane.available == 1 and lane.in_flight == 0
+
+
+def test_cancelled_request_frees_its_place_in_the_queue():
+    async def scenario():
+        pipeline = make_pipeline()
+        release = threading.Event()
+        try:
+            running = asyncio.ensure_future(pipeline.scan(release.wait))
+            await asyncio.sleep(0.05)
+            cancelled = asyncio.ensure_future(pipeline.scan(lambda: "cancelled"))
+            await asyncio.sleep(0.05)
+            cancelled.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+
+            # La file est de nouveau libre: la requête suivante est admise
+            queued = asyncio.ensure_future(pipeline.scan(lambda: "queued"))
+            await asyncio.sleep(0.05)
+        finally:
+            release.set()
+
+        assert await running is True
+        assert await queued == "queued"
+        await asyncio.sleep(0.05)
+        stats = pipeline.get_stats()["scan"]
+        pipeline.shutdown()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["waiting"] == 0 and stats["in_flight"] == 0
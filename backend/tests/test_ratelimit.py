@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import ratelimit
+from app.ratelimit import MAX_RETRY_AFTER, RateLimited, RateLimiter, parse_rules
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_burst_then_rejection_with_retry_after(clock):
+    limiter = RateLimiter({"submission": (0.5, 3)})
+    for _ in range(3):
+        limiter.check("submission", "alice")
+
+    with pytest.raises(RateLimited) as rejected:
+        limiter.check("submission", "alice")
+    assert rejected.value.route_class == "submission"
+    assert rejected.value.retry_after == pytest.approx(2.0)  # Un jeton manquant à 0,5 jeton/s
+
+    limiter.check("submission", "bob")  # Un seau par adresse
+
+
+def test_bucket_refills_with_time(clock):
+    limiter = RateLimiter({"submission": (0.5, 3)})
+    for _ in range(3):
+        limiter.check("submission", "alice")
+
+    clock.now += 1.0
+    with pytest.raises(RateLimited) as rejected:
+        limiter.check("submission", "alice")
+    assert rejected.value.retry_after == pytest.approx(1.0)
+
+    clock.now += 1.0
+    limiter.check("submission", "alice")
+
+    clock.now += 3600
+    for _ in range(3):  # Jamais plus que la capacité
+        limiter.check("submission", "alice")
+    with pytest.raises(RateLimited):
+        limiter.check("submission", "alice")
+
+
+def test_zero_rate_blocks_once_burst_is_consumed(clock):
+    limiter = RateLimiter(parse_rules("announcement=0:2"))
+    limiter.check("announcement", "alice")
+    limiter.check("announcement", "alice")
+
+    clock.now += 10 * MAX_RETRY_AFTER
+    with pytest.raises(RateLimited) as rejected:
+        limiter.check("announcement", "alice")
+    assert rejected.value.retry_after == MAX_RETRY_AFTER
+
+
+def test_negative_rate_is_refused():
+    with pytest.raises(ValueError):
+        parse_rules("submission=-1:5")
+
+
+def test_unknown_route_class_is_not_limited(clock):
+    limiter = RateLimiter({})
+    for _ in range(100):
+        limiter.check("search", "alice")
+
+
+def test_stats_report_rules_and_buckets(clock):
+    limiter = RateLimiter({"submission": (1.0, 2)})
+    limiter.check("submission", "alice")
+    limiter.check("submission", "bob")
+
+    stats = limiter.get_stats()
+    assert stats["rules"]["submission"] == {"rate": 1.0, "burst": 2}
+    assert stats["buckets"] == 2
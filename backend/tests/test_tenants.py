@@ -0,0 +1,131 @@
+import gzip
+import json
+import threading
+
+import pytest
+
+from app.blockchain import Blockchain, Transaction, make_genesis_block
+from app.tenants import TenantRegistry
+
+DIFFICULTY = 1
+
+
+def make_registry(data_dir, **options):
+    created = []
+
+    def create_blockchain(tenant_id):
+        created.append(tenant_id)
+        return Blockchain(difficulty=DIFFICULTY, **options)
+
+    registry = TenantRegistry(str(data_dir), create_blockchain)
+    registry.created = created
+    return registry
+
+
+def populate(tenant, blocks=3):
+    blockchain = tenant.blockchain
+    blockchain.register_participant("teacher", "TEACHER", "public-key", "Prof", "prof@example.com")
+    for i in range(blocks):
+        blockchain.add_transaction(Transaction("teacher", "ALL", "ASSIGNMENT", {"title": f"Devoir {i}"}))
+        blockchain.mine_pending_transactions("miner")
+    blockchain.add_transaction(Transaction("teacher", "ALL", "ANNOUNCEMENT", {"title": "En attente"}))
+
+
+def rewrite(registry, tenant_id, change):
+    path = registry._path(tenant_id)
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        payload = json.load(f)
+    change(payload)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(payload, f)
+
+
+def test_reloaded_tenant_keeps_chain_state_and_configuration(tmp_path):
+    registry = make_registry(tmp_path / "tenants", retention_blocks=100, block_codec="zlib")
+    populate(registry.create("alpha"))
+    expected = registry.get("alpha").blockchain.create_snapshot()
+    pending = [tx.transaction_id for tx in registry.get("alpha").blockchain.pending_transactions]
+    assert registry.evict("alpha")
+
+    blockchain = registry.get("alpha").blockchain
+    assert registry.created == ["alpha", "alpha"]  # Chaîne rechargée par la fabrique configurée
+    assert (blockchain.retention_blocks, blockchain.block_codec) == (100, "zlib")
+    assert blockchain.is_chain_valid()
+    assert [tx.transaction_id for tx in blockchain.pending_transactions] == pending
+    snapshot = blockchain.create_snapshot()
+    for section in ("participants", "assignments", "announcements", "transaction_counts"):
+        assert snapshot[section] == expected[section]
+
+
+def test_pruned_tenant_keeps_the_state_of_pruned_blocks(tmp_path):
+    registry = make_registry(tmp_path / "tenants")
+    tenant = registry.create("alpha")
+    populate(tenant, blocks=5)
+    tenant.blockchain.prune(4)
+    expected = tenant.blockchain.create_snapshot()
+    assert registry.evict("alpha")
+
+    blockchain = registry.get("alpha").blockchain
+    assert blockchain.pruned_height == 4
+    assert blockchain.create_snapshot()["assignments"] == expected["assignments"]
+    assert len(blockchain.get_assignments()) == 5
+
+
+@pytest.mark.parametrize("tamper, message", [
+    (lambda payload: payload["chain"].pop(2), "Unexpected block index"),
+    (lambda payload: payload["chain"][1].update(previous_hash=payload["chain"][2]["hash"]), "hash mismatch"),
+    (lambda payload: payload.update(difficulty=DIFFICULTY + 1), "difficulty"),
+])
+def test_tampered_tenant_file_is_rejected(tmp_path, tamper, message):
+    registry = make_registry(tmp_path / "tenants")
+    populate(registry.create("alpha"))
+    assert registry.evict("alpha")
+    rewrite(registry, "alpha", tamper)
+
+    with pytest.raises(ValueError, match=message):
+        registry.get("alpha")
+    assert "alpha" not in registry.tenants and "alpha" not in registry.transitions
+
+
+def test_tenant_with_another_genesis_is_rejected(tmp_path):
+    registry = make_registry(tmp_path / "tenants")
+    populate(registry.create("alpha"))
+    assert registry.evict("alpha")
+
+    other = TenantRegistry(str(tmp_path / "tenants"), lambda tenant_id: Blockchain(
+        difficulty=DIFFICULTY, genesis_block=make_genesis_block(DIFFICULTY, timestamp=1.0)))
+    with pytest.raises(ValueError, match="genesis"):
+        other.get("alpha")
+
+
+def test_loading_does_not_hold_the_registry_lock(tmp_path):
+    registry = make_registry(tmp_path / "tenants")
+    populate(registry.create("slow"))
+    registry.create("fast")
+    assert registry.evict("slow")
+
+    loading, resume = threading.Event(), threading.Event()
+
+    def create_wallet_manager(tenant_id, default=registry.create_wallet_manager):
+        if tenant_id == "slow":
+            loading.set()
+            resume.wait(5)
+        return default(tenant_id)
+    registry.create_wallet_manager = create_wallet_manager
+
+    results = {}
+    readers = [threading.Thread(target=lambda: results.setdefault(len(results), registry.get("slow")))
+               for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    assert loading.wait(5)
+    try:
+        assert registry.get("fast").tenant_id == "fast"  # Pendant le chargement de "slow"
+        assert registry.list()
+    finally:
+        resume.set()
+    for reader in readers:
+        reader.join(5)
+
+    assert registry.loads == 1  # Un seul chargement pour les requêtes concurrentes
+    assert len({id(tenant) for tenant in results.values()}) == 1